@@ -0,0 +1,186 @@
+"""
+Finds duplicate "Record ID" values in an export, without holding the records (or even a set of every Record ID) in memory.
+
+For multi-million-row historical exports, where the converter's `_dictify_data()` -- which keeps every item -- is too big.
+Streams just the `Record ID` column and each row's `RECORDID` attribute, from a raw xml export (or a converted json file, read item-by-item; a NUMBER-typed Record ID's int values are compared as their decimal strings).
+Record IDs are normalized with the converter's `TextNormalizer` (see `hh_xml/text_normalizer.py`), so both report the same groups -- eg `A 1` and `A  1` are one value.
+
+Two passes:
+1. Numeric Record IDs (canonical decimals, eg `1234` but not `01234`, below MAX_BITMAP_ID) each set a bit in a `seen` bitmap; a bit already set marks the value in a `duplicate` bitmap. c.1.25MB per bitmap covers Record IDs up to 10M.
+   Any other Record ID (including a numeric one of MAX_BITMAP_ID or more) is spilled, with its RECORDID, to one of `--partitions` temp-files, chosen by a hash of the value -- so all rows with the same value land in the same file.
+2. The input is streamed again, and only rows whose numeric Record ID is marked duplicate are collected; then each spill-file is loaded, one at a time, and grouped.
+Memory holds the bitmaps, the duplicate groups, and one spill-partition -- not the rows.
+
+Output json: `{'__meta__': {counts}, 'duplicate_groups': {Record ID: [RECORDID, ...]}}`, groups in Record ID order, RECORDIDs in row order.
+
+Usage:
+(venv) $ python ./analyze_duplicates.py --input_path "/path/to/source.xml" --output_path "/path/to/duplicates.json"
+"""
+
+import argparse, datetime, logging, os, tempfile, zlib
+
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.records import XML_FORMAT, detect_format, iter_records
+from hh_xml.serializer import dump_to_path, dumps, loads
+from hh_xml.text_normalizer import TextNormalizer
+
+
+log = logging.getLogger( __name__ )
+
+
+RECORD_ID_FIELD: str = 'Record ID'
+MAX_BITMAP_ID: int = 10_000_000  # c.1.25MB per bitmap; real Record IDs are far below this. Larger numeric values take the spill path, so a stray huge value can't balloon the bitmap
+DEFAULT_PARTITIONS: int = 64
+
+
+## manager function -------------------------------------------------
+
+
+def analyze_duplicates( input_path: str, output_path: str, partitions: int = DEFAULT_PARTITIONS ) -> dict:
+    """ Finds duplicate Record ID values; saves and returns the report.
+        Called by dundermain. """
+    counts: dict = { 'rows': 0, 'rows_without_record_id': 0, 'numeric_record_ids': 0, 'spilled_record_ids': 0 }
+    seen = Bitmap()
+    duplicate = Bitmap()
+    with tempfile.TemporaryDirectory() as spill_dir:
+        spill_files: list = [ open(os.path.join(spill_dir, f'partition_{i:03d}.jsonl'), 'wb') for i in range( partitions ) ]
+        ## pass 1: mark numeric duplicates; spill the rest ----------
+        progress = ProgressReporter( 'pass 1: marking record-ids', logger=log )
+        for ( row_record_id, record_id ) in iter_record_ids( input_path ):
+            progress.update()
+            counts['rows'] += 1
+            if record_id is None:
+                counts['rows_without_record_id'] += 1
+            elif is_bitmap_id( record_id ):
+                counts['numeric_record_ids'] += 1
+                number = int( record_id )
+                if seen.test_and_set( number ):
+                    duplicate.set( number )
+            else:
+                counts['spilled_record_ids'] += 1
+                partition = zlib.crc32( record_id.encode('utf-8') ) % partitions  # stable across runs, unlike hash()
+                spill_files[partition].write( dumps([record_id, row_record_id]) + b'\n' )
+        progress.finish()
+        for spill_file in spill_files:
+            spill_file.close()
+        ## pass 2: collect the numeric groups -----------------------
+        numeric_groups: dict = {}
+        if duplicate.any():
+            progress = ProgressReporter( 'pass 2: collecting duplicate groups', total=counts['rows'], logger=log )
+            for ( row_record_id, record_id ) in iter_record_ids( input_path ):
+                progress.update()
+                if record_id is not None and is_bitmap_id( record_id ) and duplicate.test( int(record_id) ):
+                    numeric_groups.setdefault( int(record_id), [] ).append( row_record_id )
+            progress.finish()
+        ## group each spill-partition -------------------------------
+        other_groups: dict = {}
+        for spill_file in spill_files:
+            other_groups.update( group_spill_partition(spill_file.name) )
+    duplicate_groups: dict = { str(number): numeric_groups[number] for number in sorted(numeric_groups) }
+    duplicate_groups.update( (record_id, other_groups[record_id]) for record_id in sorted(other_groups) )
+    counts['duplicate_record_ids'] = len( duplicate_groups )
+    counts['rows_in_duplicate_groups'] = sum( len(group) for group in duplicate_groups.values() )
+    counts['bitmap_bytes'] = len( seen.bits ) + len( duplicate.bits )
+    report = {
+        '__meta__': dict( counts, input_path=input_path, timestamp=str(datetime.datetime.now()) ),
+        'duplicate_groups': duplicate_groups }
+    dump_to_path( report, output_path )
+    log.info( f'counts, ``{counts}``; report saved to ``{output_path}``' )
+    return report
+
+
+## bitmap -----------------------------------------------------------
+
+
+class Bitmap:
+    """ A growable bit-set of non-negative ints, one bit per possible value. """
+
+    def __init__( self ):
+        self.bits = bytearray()
+
+    def test( self, number: int ) -> bool:
+        ( byte_index, mask ) = ( number >> 3, 1 << (number & 7) )
+        return byte_index < len( self.bits ) and bool( self.bits[byte_index] & mask )
+
+    def set( self, number: int ) -> None:
+        byte_index = number >> 3
+        if byte_index >= len( self.bits ):
+            self.bits.extend( bytes(max(byte_index + 1 - len(self.bits), len(self.bits))) )  # at least doubles, so growth is amortized
+        self.bits[byte_index] |= 1 << ( number & 7 )
+
+    def test_and_set( self, number: int ) -> bool:
+        """ Sets the bit; returns whether it was already set. """
+        was_set = self.test( number )
+        if not was_set:
+            self.set( number )
+        return was_set
+
+    def any( self ) -> bool:
+        return any( self.bits )
+
+    ## end class Bitmap()
+
+
+## helper functions -------------------------------------------------
+
+
+def is_bitmap_id( record_id: str ) -> bool:
+    """ Returns True for a canonical decimal (no sign, no leading zero) below MAX_BITMAP_ID.
+        '01234' isn't numeric here, so it's grouped apart from '1234' (via the spill path), as the converter groups a TEXT-typed Record ID's values.
+        Called by analyze_duplicates() """
+    return record_id.isdigit() and record_id.isascii() and ( record_id == '0' or record_id[0] != '0' ) and int( record_id ) < MAX_BITMAP_ID
+
+
+def group_spill_partition( spill_path: str ) -> dict:
+    """ Returns {Record ID: [RECORDID, ...]} for the values in one spill-partition that occur more than once.
+        Called by analyze_duplicates() """
+    groups: dict = {}
+    with open( spill_path, 'rb' ) as f:
+        for line in f:
+            ( record_id, row_record_id ) = loads( line )
+            groups.setdefault( record_id, [] ).append( row_record_id )
+    return { record_id: group for (record_id, group) in groups.items() if len(group) > 1 }
+
+
+def iter_record_ids( input_path: str ):
+    """ Yields ( row RECORDID, normalized Record ID string or None ) for each row of a raw xml export, or each item of a converted json file.
+        Normalizes as the converter does, so a value is None only where the converter's would be: a whitespace-only Record ID is the value ''.
+        A converted json's Record ID is an int when the field is typed NUMBER; it's yielded as its string.
+        Called by analyze_duplicates(), once per pass. """
+    normalize = TextNormalizer().normalize
+    if detect_format( input_path ) != XML_FORMAT:
+        for ( _key, item ) in iter_records( input_path ):
+            value = item.get( RECORD_ID_FIELD )
+            record_id = normalize( str(value) ) if value is not None else None  # already normalized by a current converter; not by an older one
+            yield ( item['row_RECORDID'], record_id )
+        return
+    from hh_xml.fm_xml import FIELD_TAG, ROW_TAG, clear_element, iterparse
+    field_names: list = []
+    column_index = None
+    for _event, elem in iterparse( input_path, tag=(FIELD_TAG, ROW_TAG) ):
+        if elem.tag == FIELD_TAG:
+            field_names.append( elem.get('NAME') )
+            continue
+        if column_index is None:
+            column_index = field_names.index( RECORD_ID_FIELD )  # raises ValueError if the export has no Record ID field
+        column = elem[column_index]  # the row's COL elements are its children, in field order
+        text = column[0].text if len( column ) else None
+        record_id = normalize( text ) if text else None  # as the converter's _makeDataDict()
+        row_record_id = elem.get( 'RECORDID' )
+        clear_element( elem )
+        yield ( row_record_id, record_id )
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Reports duplicate Record ID values, in bounded memory.' )
+    parser.add_argument( '--input_path', type=str, help='path to the raw xml export (or a converted json file)' )
+    parser.add_argument( '--output_path', type=str, help='path to the output json report' )
+    parser.add_argument( '--partitions', type=int, default=DEFAULT_PARTITIONS, help=f'spill-files for non-numeric Record IDs (default {DEFAULT_PARTITIONS})' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    analyze_duplicates( args.input_path, args.output_path, args.partitions )
+    log.debug( 'done' )
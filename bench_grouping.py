@@ -0,0 +1,63 @@
+"""
+Compares org-grouping of rows: the old full `sorted()` of rows (make_csv's `sort_dicts_by_key()`) vs bucketed grouping (`record_grouping.group_rows_by_key()`).
+
+Uses a real converted json file if given; otherwise synthetic items (see `synthetic_export.py`).
+Checks both give the same row-order, and reports the best-of-N time for each; also times bucketing with a `Box Number`, `Box Number 3` secondary sort (see `box_numbers.py`).
+The old sort is make_csv's original, unchanged; since it can't order a None org-id, rows without one are left out of all three timings.
+
+Usage:
+(venv) $ python ./bench_grouping.py --input_path "/path/to/output.json"
+(venv) $ python ./bench_grouping.py --row_count 177000
+"""
+
+import argparse, logging, time
+
+from hh_xml.converted_data import load_items
+from hh_xml.logging_setup import configure_logging
+from make_csv_100 import sort_dicts_by_key
+from record_grouping import group_rows_by_key
+from synthetic_export import make_synthetic_items
+
+
+log = logging.getLogger( __name__ )
+
+
+def best_time( function, repeats: int ) -> tuple:
+    """ Returns ( best seconds, last result ) of calling `function` `repeats` times.
+        Called by run_benchmark() """
+    times = []
+    result = None
+    for _ in range( repeats ):
+        start = time.perf_counter()
+        result = function()
+        times.append( time.perf_counter() - start )
+    return ( min(times), result )
+
+
+def run_benchmark( input_path: str, row_count: int, repeats: int ) -> dict:
+    """ Times sorted() vs bucketed grouping on the same rows.
+        Called by dundermain. """
+    items: dict = load_items( input_path ) if input_path else make_synthetic_items( row_count )['items']
+    rows: list = [ row for row in items.values() if row['Organization ID'] is not None ]  # the old sort can't order a None org-id against a string, so it never got them
+    log.info( f'rows with an org-id, ``{len(rows)}`` (of ``{len(items)}``); distinct orgs, ``{len(set(row["Organization ID"] for row in rows))}``' )
+    ## silence per-call debug-logging, which would skew the timings
+    logging.getLogger( 'make_csv_100' ).setLevel( logging.WARNING )
+    logging.getLogger( 'record_grouping' ).setLevel( logging.WARNING )
+    ( sorted_seconds, sorted_rows ) = best_time( lambda: sort_dicts_by_key(rows, 'Organization ID'), repeats )
+    ( bucketed_seconds, bucketed_rows ) = best_time( lambda: group_rows_by_key(rows, 'Organization ID'), repeats )
+    ( secondary_seconds, _ ) = best_time( lambda: group_rows_by_key(rows, 'Organization ID', secondary_key=['Box Number', 'Box Number 3']), repeats )
+    assert [ id(row) for row in sorted_rows ] == [ id(row) for row in bucketed_rows ], 'bucketed order differs from sorted() order'
+    results = { 'sorted': sorted_seconds, 'bucketed': bucketed_seconds, 'bucketed_with_box_sort': secondary_seconds }
+    log.info( f'sorted(), ``{sorted_seconds:.3f}s``; bucketed, ``{bucketed_seconds:.3f}s`` (``{sorted_seconds / bucketed_seconds:.1f}x``); bucketed + box-sort, ``{secondary_seconds:.3f}s``' )
+    return results
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Compares sorted() vs bucketed org-grouping.' )
+    parser.add_argument( '--input_path', type=str, help='optional converted json file (or snapshot); synthetic data is used if omitted' )
+    parser.add_argument( '--row_count', type=int, default=177000, help='synthetic row-count, when no input_path (default 177000)' )
+    parser.add_argument( '--repeats', type=int, default=5, help='runs per method; the best time is reported (default 5)' )
+    args = parser.parse_args()
+    run_benchmark( args.input_path, args.row_count, args.repeats )
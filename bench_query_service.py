@@ -0,0 +1,146 @@
+"""
+Load-tests `query_service.py` on localhost: requests/s, and p50/p99 latency.
+
+Either targets a running service (`--base_url`), or starts one in a subprocess from `--input_path` (and optional `--rollup_path`).
+Request-paths are sampled from the service itself: `/orgs/top`, then `/org/<id>` for record-keys. Client threads each hold one keep-alive connection and request random paths for `--seconds`.
+
+Usage:
+(venv) $ python ./bench_query_service.py --input_path "/path/to/output.json" --rollup_path "/path/to/rollups.json"
+(venv) $ python ./bench_query_service.py --base_url "http://127.0.0.1:8765" --threads 8 --seconds 20
+"""
+
+import argparse, http.client, logging, os, random, subprocess, sys, threading, time
+from urllib.parse import quote, urlsplit
+
+from hh_xml.logging_setup import configure_logging
+from hh_xml.serializer import loads
+
+
+log = logging.getLogger( __name__ )
+
+
+SAMPLE_ORG_COUNT: int = 200
+STARTUP_TIMEOUT_SECONDS: float = 120.0
+
+
+def run_benchmark( base_url: str, thread_count: int, seconds: float, seed: int = 1 ) -> dict:
+    """ Runs the load-test against a running service; returns and logs the results.
+        Called by dundermain. """
+    url = urlsplit( base_url )
+    paths: list = sample_paths( url.hostname, url.port, seed )  # type: ignore
+    log.info( f'``{len(paths)}`` distinct request-paths; ``{thread_count}`` threads for ``{seconds}s``' )
+    latencies: list = []
+    errors: list = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client( client_seed: int ) -> None:
+        rng = random.Random( client_seed )
+        connection = http.client.HTTPConnection( url.hostname, url.port )  # type: ignore
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            path = rng.choice( paths )
+            start = time.perf_counter()
+            connection.request( 'GET', path )
+            response = connection.getresponse()
+            response.read()
+            local_latencies.append( time.perf_counter() - start )
+            if response.status != 200:
+                local_errors += 1
+        connection.close()
+        with lock:
+            latencies.extend( local_latencies )
+            errors.append( local_errors )
+
+    threads = [ threading.Thread(target=client, args=(seed + i,)) for i in range( thread_count ) ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    results = {
+        'requests': len( latencies ),
+        'errors': sum( errors ),
+        'requests_per_second': round( len(latencies) / elapsed, 1 ),
+        'p50_ms': round( percentile(latencies, 50) * 1000, 2 ),
+        'p99_ms': round( percentile(latencies, 99) * 1000, 2 ) }
+    log.info( f'results, ``{results}``' )
+    return results
+
+
+def sample_paths( host: str, port: int, seed: int ) -> list:
+    """ Returns a mix of /orgs/top, /org/<id>, and /record/<key> paths, sampled from the service.
+        Called by run_benchmark() """
+    connection = http.client.HTTPConnection( host, port )
+    connection.request( 'GET', f'/orgs/top?k={SAMPLE_ORG_COUNT}' )
+    top_orgs: list = loads( connection.getresponse().read() )
+    rng = random.Random( seed )
+    paths: list = [ '/orgs/top?k=10', '/orgs/top?k=100' ]
+    for org in top_orgs:
+        org_path = f'/org/{quote(org["org_id"])}'
+        connection.request( 'GET', org_path )
+        record_ids: list = loads( connection.getresponse().read() )['record_ids']
+        paths.append( org_path )
+        paths.extend( f'/record/{quote(key)}' for key in rng.sample(record_ids, min(5, len(record_ids))) )
+    connection.close()
+    return paths
+
+
+def percentile( sorted_values: list, pct: float ) -> float:
+    """ Returns the nearest-rank percentile of already-sorted values.
+        Called by run_benchmark() """
+    if not sorted_values:
+        return 0.0
+    rank = max( 0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1) )
+    return sorted_values[rank]
+
+
+def start_service( input_path: str, rollup_path: str, port: int ) -> subprocess.Popen:
+    """ Starts query_service.py in a subprocess, and waits until it answers /health.
+        Called by dundermain. """
+    command = [ sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_service.py'), '--input_path', input_path, '--port', str(port) ]
+    if rollup_path:
+        command.extend( ['--rollup_path', rollup_path] )
+    process = subprocess.Popen( command, env=dict(os.environ, LOGLEVEL='INFO') )
+    deadline = time.perf_counter() + STARTUP_TIMEOUT_SECONDS
+    while time.perf_counter() < deadline:
+        try:
+            connection = http.client.HTTPConnection( '127.0.0.1', port, timeout=1 )
+            connection.request( 'GET', '/health' )
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise Exception( f'query_service exited with ``{process.returncode}``' )
+            time.sleep( 0.2 )
+    process.terminate()
+    raise Exception( f'query_service did not answer within ``{STARTUP_TIMEOUT_SECONDS}s``' )
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Load-tests query_service.py: requests/s, p50/p99 latency.' )
+    parser.add_argument( '--base_url', type=str, help='url of a running service; if omitted, one is started from --input_path' )
+    parser.add_argument( '--input_path', type=str, help='converted json (or snapshot), for a service started by this script' )
+    parser.add_argument( '--rollup_path', type=str, help='optional org-rollups json, for a service started by this script' )
+    parser.add_argument( '--port', type=int, default=8766, help='port for a service started by this script (default 8766)' )
+    parser.add_argument( '--threads', type=int, default=4, help='concurrent client connections (default 4)' )
+    parser.add_argument( '--seconds', type=float, default=10.0, help='test duration (default 10)' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    if args.base_url:
+        run_benchmark( args.base_url, args.threads, args.seconds )
+    else:
+        service = start_service( args.input_path, args.rollup_path, args.port )
+        try:
+            run_benchmark( f'http://127.0.0.1:{args.port}', args.threads, args.seconds )
+        finally:
+            service.terminate()
+            service.wait()
+    log.debug( 'done' )
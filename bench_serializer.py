@@ -0,0 +1,75 @@
+"""
+Reports json encode/decode throughput (MB/s) for each serializer backend and mode (see `hh_xml/serializer.py`).
+
+Cases:
+- `canonical`: the converter's older `indent=2, sort_keys=True` output (stdlib).
+- `stdlib`: stdlib, compact, unsorted.
+- `stdlib-pretty`, and the same two for `orjson`, if installed.
+Also checks that every case decodes back to the same data. MB/s is of the encoded size.
+
+Uses a real converted json file if given; otherwise synthetic items (see `synthetic_export.py`).
+
+Usage:
+(venv) $ python ./bench_serializer.py --input_path "/path/to/output.json"
+(venv) $ python ./bench_serializer.py --row_count 177000
+"""
+
+import argparse, json, logging, time
+
+from hh_xml.logging_setup import configure_logging
+from hh_xml.serializer import OrjsonBackend, StdlibBackend, load_from_path
+from synthetic_export import make_synthetic_items
+
+
+log = logging.getLogger( __name__ )
+
+
+def make_cases() -> dict:
+    """ Returns case-label -> ( encode-function, decode-function ), for the installed backends.
+        Called by run_benchmark() """
+    stdlib = StdlibBackend()
+    cases: dict = {
+        'canonical': ( lambda data: json.dumps(data, indent=2, sort_keys=True).encode('utf-8'), stdlib.loads ),
+        'stdlib': ( lambda data: stdlib.dumps(data), stdlib.loads ),
+        'stdlib-pretty': ( lambda data: stdlib.dumps(data, pretty=True), stdlib.loads ) }
+    try:
+        import orjson
+        fast = OrjsonBackend( orjson )
+        cases['orjson'] = ( lambda data: fast.dumps(data), fast.loads )
+        cases['orjson-pretty'] = ( lambda data: fast.dumps(data, pretty=True), fast.loads )
+    except ImportError:
+        log.info( 'orjson not installed; timing stdlib only' )
+    return cases
+
+
+def run_benchmark( input_path: str, row_count: int, repeats: int ) -> dict:
+    """ Times encode and decode for each case; returns case -> {MB, encode_MB_s, decode_MB_s}.
+        Called by dundermain. """
+    data: dict = load_from_path( input_path ) if input_path else make_synthetic_items( row_count )
+    results: dict = {}
+    for ( label, (encode, decode) ) in make_cases().items():
+        encode_times, decode_times = [], []
+        encoded = b''
+        for _ in range( repeats ):
+            start = time.perf_counter()
+            encoded = encode( data )
+            encode_times.append( time.perf_counter() - start )
+            start = time.perf_counter()
+            decoded = decode( encoded )
+            decode_times.append( time.perf_counter() - start )
+        assert decoded == data, f'``{label}`` did not round-trip'
+        megabytes: float = len( encoded ) / 1e6
+        results[label] = { 'MB': round(megabytes, 1), 'encode_MB_s': round(megabytes / min(encode_times), 1), 'decode_MB_s': round(megabytes / min(decode_times), 1) }
+        log.info( f'{label}: ``{results[label]}``' )
+    return results
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Reports json encode/decode MB/s per serializer backend.' )
+    parser.add_argument( '--input_path', type=str, help='optional converted json file; synthetic data is used if omitted' )
+    parser.add_argument( '--row_count', type=int, default=50000, help='synthetic row-count, when no input_path (default 50000)' )
+    parser.add_argument( '--repeats', type=int, default=3, help='runs per case; the best time is reported (default 3)' )
+    args = parser.parse_args()
+    run_benchmark( args.input_path, args.row_count, args.repeats )
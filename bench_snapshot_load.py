@@ -0,0 +1,62 @@
+"""
+Compares load-times of the converter's json output vs its binary snapshot (see `hh_xml/converted_data.py`).
+
+Uses a real converted json file if given; otherwise generates synthetic items (see `synthetic_export.py`).
+Reports the best-of-N time for each format, and the speedup.
+
+Usage:
+(venv) $ python ./bench_snapshot_load.py --input_path "/path/to/output.json"
+(venv) $ python ./bench_snapshot_load.py --row_count 177000
+"""
+
+import argparse, logging, os, tempfile, time
+
+from hh_xml.converted_data import load_converted_data, save_snapshot
+from hh_xml.logging_setup import configure_logging
+from hh_xml.serializer import dump_to_path
+from synthetic_export import make_synthetic_items
+
+
+log = logging.getLogger( __name__ )
+
+
+def run_benchmark( input_path: str, row_count: int, repeats: int ) -> dict:
+    """ Times load_converted_data() on the json and snapshot forms of the same data.
+        Returns dict of best times, in seconds.
+        Called by dundermain. """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ## prepare both formats -------------------------------------
+        if input_path:
+            json_path = input_path
+            data = load_converted_data( input_path )
+        else:
+            json_path = os.path.join( temp_dir, 'synthetic.json' )
+            data = make_synthetic_items( row_count )
+            dump_to_path( data, json_path )  # same layout as the converter's (default) output
+        snapshot_path = os.path.join( temp_dir, 'snapshot.pickle' )
+        save_snapshot( data, snapshot_path )
+        log.info( f'items, ``{len(data["items"])}``; json MB, ``{os.path.getsize(json_path) / 1e6:.1f}``; snapshot MB, ``{os.path.getsize(snapshot_path) / 1e6:.1f}``' )
+        del data
+        ## time loads -----------------------------------------------
+        results = {}
+        for ( label, path ) in ( ('json', json_path), ('snapshot', snapshot_path) ):
+            times = []
+            for _ in range( repeats ):
+                start = time.perf_counter()
+                loaded = load_converted_data( path )
+                times.append( time.perf_counter() - start )
+                del loaded
+            results[label] = min( times )
+    log.info( f'json load, ``{results["json"]:.3f}s``; snapshot load, ``{results["snapshot"]:.3f}s``; speedup, ``{results["json"] / results["snapshot"]:.1f}x``' )
+    return results
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Compares json vs binary-snapshot load times.' )
+    parser.add_argument( '--input_path', type=str, help='optional converted json file; synthetic data is used if omitted' )
+    parser.add_argument( '--row_count', type=int, default=177000, help='synthetic row-count, when no input_path (default 177000)' )
+    parser.add_argument( '--repeats', type=int, default=3, help='loads per format; the best time is reported (default 3)' )
+    args = parser.parse_args()
+    run_benchmark( args.input_path, args.row_count, args.repeats )
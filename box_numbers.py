@@ -0,0 +1,55 @@
+"""
+Natural-order collation for box-number values (`Box Number`, `Box Number 2`, `Box Number 3`).
+
+Lexicographic order puts '213B' before '78B', and mixes lettered series ('M-47') in with plain boxes. Archivists expect:
+- plain numbered boxes first, by number, then by any suffix: '9', '78', '78B', '213B'.
+- then lettered series, grouped by prefix, then by number: 'M-2', 'M-39', 'M-47', 'OS 3'.
+- then values with no number at all, alphabetically; then empty values.
+Any further digits in a suffix compare numerically too ('12-9' before '12-10').
+
+`box_sort_key()` parses a value into one tuple sort-key. Box values repeat heavily (many items per box), so keys are cached: each distinct value is parsed once, and sorting compares ready-made tuples with no per-comparison parsing.
+A repeating box-field's value is a list; it sorts by its first non-empty box (and isn't itself cached, being unhashable).
+
+Usage:
+    rows.sort( key=lambda row: box_sort_key(row['Box Number']) )
+"""
+
+import functools, re
+
+
+BOX_RE = re.compile( r'^(?P<prefix>[^\W\d_]*)[\s\-_.#]*(?P<number>\d+)(?P<suffix>.*)$' )
+DIGITS_RE = re.compile( r'(\d+)' )
+
+PLAIN, PREFIXED, NO_NUMBER, EMPTY = 0, 1, 2, 3  # collation classes, in output order
+
+
+def box_sort_key( value ) -> tuple:
+    """ Returns the collation tuple for a box-number value; None/empty values sort last.
+        A list (a repeating field's values) sorts by its first non-empty value.
+        Called by record_grouping.group_rows_by_key() and org_rollups.OrgRollupBuilder.to_dict() """
+    if type( value ) in ( list, tuple ):
+        value = next( (part for part in value if part is not None and str(part).strip()), None )
+    return scalar_box_sort_key( value )
+
+
+@functools.lru_cache( maxsize=65536 )
+def scalar_box_sort_key( value ) -> tuple:
+    """ Returns the collation tuple for a single (hashable) box-number value; cached per distinct value.
+        Called by box_sort_key() """
+    if value is None:
+        return ( EMPTY, '', 0, () )
+    text = str( value ).strip().casefold()
+    if not text:
+        return ( EMPTY, '', 0, () )
+    match = BOX_RE.match( text )
+    if match is None:
+        return ( NO_NUMBER, text, 0, () )
+    prefix = match.group( 'prefix' )
+    return ( PREFIXED if prefix else PLAIN, prefix, int(match.group('number')), suffix_key(match.group('suffix')) )
+
+
+def suffix_key( suffix: str ) -> tuple:
+    """ Returns a natural-order key for the part after the box's number, ignoring separator characters.
+        Called by box_sort_key() """
+    parts = DIGITS_RE.split( suffix.strip(' -_.#') )
+    return tuple( (0, int(part), '') if part.isdigit() else (1, 0, part) for part in parts if part )
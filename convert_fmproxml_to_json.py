@@ -1,72 +1,66 @@
-import argparse, datetime, json, logging, os, pprint, random
-import lxml
-from lxml import etree
+import argparse, datetime, glob, hashlib, logging, os, pprint, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from hh_xml.compressed_io import CODECS, strip_codec_extension
+from hh_xml.converted_data import CHECKPOINT_FILENAME, iter_part_items, load_checkpoint_manifest, save_snapshot
+from hh_xml.fm_rows import RowConverter
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.serializer import dump_to_path, load_from_path
+from org_rollups import OrgRollupBuilder, save_rollups
+from row_filters import RowFilter, parse_record_id_range
+from validate_fmpro_export import load_schema, validate_export
 
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
 log = logging.getLogger( '__name__' )
 
 
-class SourceDictMaker:
+DEFAULT_CHUNK_SIZE: int = 20000  # rows per part-file, in the checkpointing mode
+BATCH_STAMP_SUFFIX: str = '.stamp.json'  # batch-mode sidecar: the source-hash and converter-hash an output was made from
+## globs, relative to this file's directory, of every module that shapes the converter's output; batch mode regenerates outputs when any changes
+CONVERTER_SOURCE_PATTERNS: tuple = ( 'convert_fmproxml_to_json.py', 'row_filters.py', 'validate_fmpro_export.py', 'hh_xml/*.py' )
+
+
+class SourceDictMaker( RowConverter ):
     """ Handles creation of an accession_number-to-item-info dict, saved as a json file.
         Purpose: This is one of the essential files that should exist before doing almost any bell processing.
                  It converts the raw filemaker-pro xml into json data for easy processing and viewing.
         if __name__... at bottom indicates how to run this script. """
 
     def __init__( self ):
-        self.NAMESPACE = { 'default': 'http://www.filemaker.com/fmpxmlresult' }
-        self.expected_column_count = 24  # as of 2023-11-10 export 
+        super().__init__()  # the row-parse settings: fields, row_filter, text_normalizer, expected_column_count (see hh_xml/fm_rows.py)
         self.instantiation_datetime = datetime.datetime.now()
+        self.validation_schema = None  # None uses validate_fmpro_export.DEFAULT_SCHEMA
+        self.validation_max_rows = 1000  # rows whose column-count is pre-checked; None checks all
+        self.org_rollup = None  # optional OrgRollupBuilder; fed each item by _dictify_data()
+        self.canonical_json = False  # True writes the older indent=2, sort_keys=True layout; see hh_xml/serializer.py
+        self.compress_level = None  # for outputs with a .gz/.bz2/.xz extension; None uses compressed_io's default
 
     def convert_fmproxml_to_json(
-        self, FMPRO_XML_PATH, JSON_OUTPUT_PATH ):
+        self, FMPRO_XML_PATH, JSON_OUTPUT_PATH, SNAPSHOT_OUTPUT_PATH=None, ROLLUP_OUTPUT_PATH=None ):
         """ CONTROLLER
-            Produces accession-number dict, and saves to a json file.
+            Produces accession-number dict, and saves to a json file (and optionally to a fast-loading binary snapshot; see hh_xml/converted_data.py).
+            Optionally saves per-org rollups (see org_rollups.py), computed in the same pass.
+            Returns the item-count.
             Example: { count:5000,
                    #   datetime: 2013...,
                    #   items:{ accnum_1:{artist:abc, title:def}, accnum_2:{etc.}, etc. }
                    # } """
-        #Get data
-        #Purpose: gets raw filemaker-pro xml unicode-string from gist
-        log.info( 'getting data' )
-        unicode_xml_string = self._get_data( FMPRO_XML_PATH )
-        #
-        #Docify xml string
-        #Purpose: converts unicode-string to <type 'lxml.etree._Element'>
-        log.info( 'docifying xml' )
-        XML_DOC = self._docify_xml( unicode_xml_string)
-        #
-        #Make key list
-        #Purpose: creates list of keys that will be used for each item-dict
-        #Example returned data: [ 'object_id', 'object_title', 'object_date', etc. ]
-        log.info( 'making dict-keys' )
-        dict_keys = self._make_dict_keys( XML_DOC, self.NAMESPACE )
+        #Validate source
+        #Purpose: fails in seconds on an export whose fields or column-counts don't match the declared schema
+        log.info( 'validating source' )
+        validate_export( FMPRO_XML_PATH, schema=self.validation_schema, max_rows=self.validation_max_rows )
         #
-        #Make list of doc-items
-        #Purpose: creates list of xml-doc items
-        log.info( 'making xml-doc rows' )
-        xml_doc_rows = self._get_xml_doc_rows( XML_DOC, self.NAMESPACE )
-        #
-        #Make initial dict-list
-        #Purpose: creates initial list of dict-items. For a given key, the value-type may vary by item.
-        #Example returned data: [ {'artist_alias': 'abc', 'artist_birth_country_id': '123', etc.}, {etc.}, ... ]
-        log.info( 'making initial dict-list' )
-        result_list = self._process_rows( xml_doc_rows, self.NAMESPACE, dict_keys )
-        #
-        #Make key-type dict
-        #Purpose: creats dict of key-name:key-type; all data examined to see which keys should have list vs unicode-string values.
-        #Example returned data: [  {'ARTISTS::calc_nationality': <type 'list'>, 'ARTISTS::use_alias_flag': <type 'unicode'>, etc.} ]
-        log.info( 'making key-type dict' )
-        key_type_dict = self._make_key_type_dict( result_list )
-        #
-        #Normalize dict-values
-        #Purpose: creates final list of dict-items. For a given key, the value-type will _not_ vary by item.
-        #Example returned data: [ {'artist_alias': ['abc'], 'artist_birth_country_id': ['123'], etc.}, {etc.}, ... ]
-        log.info( 'normalizing dict-values' )
-        result_list = self._normalize_value_types( key_type_dict, result_list )
+        #Make dict-list
+        #Purpose: streams the xml, creating a dict-item per <ROW>. The METADATA <FIELD> attributes (read first) fix each key's value-type up front, so no item needs re-typing afterwards.
+        #Example returned data: [ {'Item': 'abc', 'Number of Folders': 3, 'Organization::Name': ['def'], etc.}, {etc.}, ... ]
+        log.info( 'making dict-list' )
+        result_list = list( self.iter_item_dicts(FMPRO_XML_PATH) )
+        return self._finish_conversion( result_list, JSON_OUTPUT_PATH, SNAPSHOT_OUTPUT_PATH, ROLLUP_OUTPUT_PATH )
+
+    def _finish_conversion( self, result_list, JSON_OUTPUT_PATH, SNAPSHOT_OUTPUT_PATH=None, ROLLUP_OUTPUT_PATH=None ):
+        ''' Dictifies the item-list, and saves the json (and optional snapshot and rollups); returns the item-count.
+            Called by convert_fmproxml_to_json() and convert_fmproxml_to_json_chunked() '''
         #
         #Dictify item-list
         #Purpose: creates accession-number to item-data-dict dictionary, adds count & datestamp
@@ -74,183 +68,122 @@ class SourceDictMaker:
                               #   items:{ accnum_1:{artist:abc, title:def}, accnum_2:{etc.}, etc. }
                               # }
         log.info( 'dictifying data' )
+        self.org_rollup = OrgRollupBuilder() if ROLLUP_OUTPUT_PATH else None  # reset per conversion, so a reused maker (eg batch mode) doesn't accumulate counts
         dictified_data = self._dictify_data( result_list )
         #
         #Output json
         log.info( 'saving json' )
         self._save_json( dictified_data, JSON_OUTPUT_PATH )
+        if SNAPSHOT_OUTPUT_PATH:
+            log.info( 'saving snapshot' )
+            save_snapshot( dictified_data, SNAPSHOT_OUTPUT_PATH, self.compress_level )
+        if ROLLUP_OUTPUT_PATH:
+            log.info( 'saving org rollups' )
+            save_rollups( self.org_rollup.to_dict(), ROLLUP_OUTPUT_PATH, self.compress_level )  # type: ignore
+        return dictified_data['__meta__']['count']
 
-    def _get_data( self, FMPRO_XML_PATH ):
-        """ Reads and returns source filemaker pro xml. """
-        with open( FMPRO_XML_PATH, 'rt' ) as f:
-          unicode_data = f.read()
-        assert type(unicode_data) == str
-        return unicode_data
-
-    def _docify_xml( self, unicode_xml_string):
-        ''' Returns xml-doc. '''
-        byte_string = unicode_xml_string.encode('utf-8', 'replace')
-        parser = etree.XMLParser()
-        XML_DOC = etree.fromstring( byte_string, parser )  # str required because xml contains an encoding declaration
-        assert type(XML_DOC) == lxml.etree._Element, type(XML_DOC)  # type: ignore
-        return XML_DOC
-
-    def _make_dict_keys( self, XML_DOC, NAMESPACE ):
-        ''' Returns list of field names; they'll later become keys in each item-dict. '''
-        assert type(XML_DOC) == lxml.etree._Element, type(XML_DOC)  # type: ignore
-        xpath = '/default:FMPXMLRESULT/default:METADATA/default:FIELD'
-        elements = XML_DOC.xpath( xpath, namespaces=(NAMESPACE) )
-        dict_keys = []
-        for e in elements:
-          dict_keys.append( e.attrib['NAME'] )
-        assert type(dict_keys) == list, type(dict_keys)
-        return dict_keys
-
-    def _get_xml_doc_rows( self, XML_DOC, NAMESPACE ):
-        ''' Returns list of item docs. '''
-        assert type(XML_DOC) == lxml.etree._Element, type(XML_DOC)  # type: ignore
-        xpath = '/default:FMPXMLRESULT/default:RESULTSET/default:ROW'
-        rows = XML_DOC.xpath( xpath, namespaces=(NAMESPACE) )
-        assert type(rows) == list, type(rows)
-        sample_element = rows[0]
-        log.debug( f'sample_element, ``{pprint.pformat(sample_element)}``' )
-        ## print the xml for the first row
-        log.debug( etree.tostring(sample_element, pretty_print=True) )  # type: ignore
-        assert type(sample_element) == lxml.etree._Element, type(sample_element)  # type: ignore
-        return rows
-
-    def _process_rows( self, xml_doc_rows, NAMESPACE, dict_keys ):
-        ''' Returns list of item dictionaries.
-            Calls _make_data_dict() helper. '''
-        result_list = []
-        for i,row in enumerate(xml_doc_rows):
-            # log.debug( f'row, ``{pprint.pformat(row)}``' )
-            ## pull out the <ROW MODID and RECORDID attributes
-            # log.debug( f'row.attrib, ``{pprint.pformat(row.attrib)}``' )
-            row_MODID = row.attrib['MODID']
-            row_RECORDID = row.attrib['RECORDID']
-            # log.debug( f'row.attrib["RECORDID"], ``{pprint.pformat(row.attrib["RECORDID"])}' )
-            # log.debug( f'row.attrib["MODID"], ``{pprint.pformat(row.attrib["MODID"])}' )
-            # 1/0
-            ## get columns (fixed number of columns per row)
-            xpath = 'default:COL'
-            columns = row.xpath( xpath, namespaces=(NAMESPACE) )
-            assert len(columns) == self.expected_column_count, len(columns)
-            ## get data_elements (variable number per column)
-            item_dict = self._makeDataDict( columns, NAMESPACE, dict_keys, row_MODID, row_RECORDID )
-            result_list.append( item_dict )  # if i > 5: break
-        return result_list
-
-    def _makeDataDict( self, columns, NAMESPACE, keys, row_MODID: str, row_RECORDID: str ):
-        ''' Returns info-dict for a single item; eg { 'artist_first_name': 'andy', 'artist_last_name': 'warhol' }
-            Called by: _process_rows()
-            Calls: self.__run_asserts(), self.__handle_single_element(), self.__handle_multiple_elements() '''
-        self.__run_asserts( columns, keys )
-        ## setup ----------------------------------------------------
-        xpath = 'default:DATA'
-        d_dict = { 'row_MODID': row_MODID, 'row_RECORDID': row_RECORDID }  
-        for i,column in enumerate(columns):
-            data = column.xpath( xpath, namespaces=(NAMESPACE) )  # type(data) always a list, but of an empty, a single or multiple elements?
-            if len(data) == 0:    # eg <COL(for artist-firstname)></COL>
-                d_dict[ keys[i] ] = None  # type: ignore
-            elif len(data) == 1:  # eg <COL(for artist-firstname)><DATA>'artist_firstname'</DATA></COL>
-                d_dict[ keys[i] ] = self.__handle_single_element( data, keys[i] )  # type: ignore
-            else:                 # eg <COL(for artist-firstname)><DATA>'artist_a_firstname'</DATA><DATA>'artist_b_firstname'</DATA></COL>
-                d_dict[ keys[i] ] = self.__handle_multiple_elements( data, keys[i] )  # type: ignore
-        # log.debug( f'd_dict, ``{pprint.pformat(d_dict)}``' )
-        return d_dict
-
-    def __run_asserts( self, columns, keys ):
-        ''' Documents the inputs.
-            Called by _makeDataDict() '''
-        assert type(columns) == list, type(columns)
-        assert type(columns[0]) == lxml.etree._Element, type(columns[0])  # type: ignore
-        assert type(keys) == list, type(keys)
+    def convert_fmproxml_to_json_chunked(
+        self, FMPRO_XML_PATH, PARTS_DIR, JSON_OUTPUT_PATH=None, SNAPSHOT_OUTPUT_PATH=None, ROLLUP_OUTPUT_PATH=None, chunk_size=DEFAULT_CHUNK_SIZE ):
+        """ CONTROLLER, for the resumable checkpointing mode.
+            Converts the rows in chunks of `chunk_size`, saving each finished chunk's item-list to a part-file in PARTS_DIR, and recording it in PARTS_DIR's checkpoint manifest.
+            A re-run after a crash resumes at the first unfinished chunk: the finished chunks' rows are parsed past, without being converted.
+            Once every chunk is done, the parts are merged into the usual json output (and the parts removed); with no JSON_OUTPUT_PATH they're left as a sharded dataset, readable with converted_data.iter_part_items(). """
+        if self.row_filter is not None:  # resuming counts converted rows; a filter would make that differ from the rows parsed past
+            raise Exception( 'a row-filter is not supported in the chunked mode' )
+        log.info( 'validating source' )
+        validate_export( FMPRO_XML_PATH, schema=self.validation_schema, max_rows=self.validation_max_rows )
+        os.makedirs( PARTS_DIR, exist_ok=True )
+        manifest: dict = self._load_or_start_checkpoint( FMPRO_XML_PATH, PARTS_DIR, chunk_size )
+        if not manifest['complete']:
+            done_rows: int = sum( part['row_count'] for part in manifest['parts'] )
+            if done_rows:
+                log.info( f'resuming at chunk ``{len(manifest["parts"])}``; skipping ``{done_rows}`` already-converted rows' )
+            chunk: list = []
+            for item_dict in self.iter_item_dicts( FMPRO_XML_PATH, skip_rows=done_rows ):
+                chunk.append( item_dict )
+                if len( chunk ) == chunk_size:
+                    self._save_part( chunk, PARTS_DIR, manifest )
+                    chunk = []
+            if chunk:
+                self._save_part( chunk, PARTS_DIR, manifest )
+            manifest['complete'] = True
+            save_checkpoint_manifest( manifest, PARTS_DIR )
+        log.info( f'all ``{len(manifest["parts"])}`` parts done' )
+        if JSON_OUTPUT_PATH:
+            log.info( 'merging parts' )
+            result_list = list( iter_part_items(PARTS_DIR) )
+            self._finish_conversion( result_list, JSON_OUTPUT_PATH, SNAPSHOT_OUTPUT_PATH, ROLLUP_OUTPUT_PATH )
+            for part in manifest['parts']:
+                os.remove( os.path.join(PARTS_DIR, part['file_name']) )
+            os.remove( os.path.join(PARTS_DIR, CHECKPOINT_FILENAME) )
+            log.debug( f'parts removed from ``{PARTS_DIR}``' )
         return
 
-    def __handle_single_element( self, data, the_key ):
-        ''' Stores either None or the single unicode value to the key.
-            Called by _makeDataDict() '''
-        return_val = None
-        if data[0].text:
-            if type( data[0].text ) == str:
-                return_val = data[0].text.strip()
-            else:
-                return_val = data[0].text.decode( 'utf-8', 'replace' ).strip()
-        return return_val
-
-    def __handle_multiple_elements( self, data, the_key ):
-        ''' Stores list of unicode values to the key.
-            Called by _makeDataDict() '''
-        d_list = []
-        for data_element in data:
-            if data_element.text:
-                if type( data_element.text ) == str:
-                    d_list.append( data_element.text.strip() )
-                else:
-                    d_list.append( data_element.text.decode('utf-8', 'replace').strip() )
-            else:
-                d_list.append( None )
-        return d_list
-
-    def _make_key_type_dict( self, result_list ):
-        ''' Determines whether value of given key should be a unicode-string or a list.
-            Called by convert_fmproxml_to_json()
-            TODO: look into this more. '''
-        key_type_dict = {}
-        for entry_dict in result_list:
-          for (key,value) in entry_dict.items():
-            if not key in key_type_dict.keys():
-              key_type_dict[key] = str
-            if type(value) == list and len(value) > 0:
-              key_type_dict[key] = list
-        return key_type_dict
-
-    def _normalize_value_types( self, key_type_dict, result_list ):
-        ''' Determines stable type for each field. '''
-        updated_result_list = []
-        assert len( key_type_dict.keys() ) == self.expected_column_count + 2, len( key_type_dict.keys() )  # +2 for row_MODID and row_RECORDID
-        for entry_dict in result_list:
-          assert len( entry_dict.keys() ) == self.expected_column_count +2, len( entry_dict.keys() )  # +2 for row_MODID and row_RECORDID
-          for key, val in entry_dict.items():
-            if key_type_dict[key] == list and ( type(val) == str or val == None ) :
-              entry_dict[key] = [ val ]
-          updated_result_list.append( entry_dict )
-        return updated_result_list
+    def _load_or_start_checkpoint( self, FMPRO_XML_PATH, PARTS_DIR, chunk_size ):
+        ''' Returns the checkpoint manifest in PARTS_DIR if it matches this source-file and chunk-size; otherwise clears any stale parts and returns a fresh manifest.
+            Called by convert_fmproxml_to_json_chunked() '''
+        stat = os.stat( FMPRO_XML_PATH )
+        source = { 'source_path': os.path.abspath(FMPRO_XML_PATH), 'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns, 'chunk_size': chunk_size, 'fields': self.fields }
+        manifest = load_checkpoint_manifest( PARTS_DIR )
+        if manifest is not None:
+            if all( manifest.get(key) == value for (key, value) in source.items() ):
+                return manifest
+            log.warning( f'checkpoint in ``{PARTS_DIR}`` is for a different source-file, chunk-size, or field-projection; starting over' )
+            for part in manifest['parts']:
+                part_path = os.path.join( PARTS_DIR, part['file_name'] )
+                if os.path.exists( part_path ):
+                    os.remove( part_path )
+        manifest = dict( source, complete=False, parts=[] )
+        save_checkpoint_manifest( manifest, PARTS_DIR )
+        return manifest
+
+    def _save_part( self, chunk, PARTS_DIR, manifest ):
+        ''' Saves a finished chunk's item-list as the next part-file, then records it in the manifest.
+            Both writes go to a temp-file that's then renamed into place, so a crash never leaves a half-written part or manifest.
+            Called by convert_fmproxml_to_json_chunked() '''
+        file_name = f'part_{len(manifest["parts"]):05d}.json'
+        part_path = os.path.join( PARTS_DIR, file_name )
+        dump_to_path( chunk, f'{part_path}.tmp' )
+        os.replace( f'{part_path}.tmp', part_path )
+        manifest['parts'].append( {'file_name': file_name, 'row_count': len(chunk), 'first_row_RECORDID': chunk[0]['row_RECORDID'], 'last_row_RECORDID': chunk[-1]['row_RECORDID']} )
+        save_checkpoint_manifest( manifest, PARTS_DIR )
+        log.info( f'saved ``{file_name}`` (``{len(chunk)}`` rows)' )
+        return
 
     def _dictify_data( self, source_list ):
-        """ Takes raw bell list of dict_data, returns accession-number dict. """
+        """ Takes raw bell list of dict_data, returns accession-number dict.
+            Duplicate `row_RECORDID` keys and duplicate "Record ID" values are both detected in this single pass. """
         rec_num_dict = {}
+        first_key_by_record_id = {}     # "Record ID" value -> items-dict-key of the first entry having it
+        duplicate_groups = {}           # "Record ID" value -> all items-dict-keys having it (only for duplicated values)
+        duplicates = []
+        duplicate_rec_nums = []
+        progress = ProgressReporter( 'dictifying data', total=len(source_list), logger=log )
         for i, entry in enumerate( source_list ):
-            if i % 1000 == 0:
-                log.debug(f'i, `{i}`')
+            progress.update()
             if entry['row_RECORDID']:  # handles a null entry
                 rec_num = entry['row_RECORDID'].strip()
                 if rec_num in rec_num_dict:
                     #print out the error, with the information about what's duplicated
                     #don't raise an exception, because we want to find all the duplicates in one run
                     print(f'duplicate accession number: "{rec_num}"')
-                    # print(f'  object_id: {entry["object_id"]}; title: {entry["object_title"]}')
-                    # print(f'  object_id: {rec_num_dict[rec_num]["object_id"]}; title: {rec_num_dict[rec_num]["object_title"]}')
-                    random_num = random.randint(1000, 9999)
-                    temp_rec_num = f'{rec_num}___{random_num}'
-                    rec_num_dict[temp_rec_num] = entry
-                else:
-                    rec_num_dict[rec_num] = entry
+                    duplicate_rec_nums.append( rec_num )
+                    rec_num = self._make_duplicate_key( rec_num, rec_num_dict )
+                rec_num_dict[rec_num] = entry
+                if self.org_rollup is not None:
+                    self.org_rollup.add( rec_num, entry )
+                ## track "Record ID" duplicates
+                record_id = entry.get( 'Record ID' )
+                if record_id is not None:
+                    first_key = first_key_by_record_id.setdefault( record_id, rec_num )
+                    if first_key != rec_num:
+                        duplicates.append( record_id )
+                        duplicate_groups.setdefault( record_id, [first_key] ).append( rec_num )
             else:
-                log.info( f'no rec_num for entry, ``{pprint.pformat(entry)}``' )
-
-        ## capture duplicates
-        seen = set()
-        duplicates = []
-        for key, value in rec_num_dict.items():
-            record_id = value.get("Record ID")
-            if record_id is not None:
-                if record_id in seen:
-                    duplicates.append(record_id)
-                else:
-                    seen.add(record_id)
-        log.debug( f'duplicates, ``{duplicates}``' )
+                if log.isEnabledFor( logging.INFO ):
+                    log.info( f'no rec_num for entry, ``{pprint.pformat(entry)}``' )
+        progress.finish()
+        log.debug( 'duplicates, ``%s``', duplicates )
         
         final_dict = {
             '__meta__': {
@@ -258,6 +191,10 @@ class SourceDictMaker:
                 'duplicates': duplicates,
                 'duplicates_count': len(duplicates),
                 'duplicates_explanation': 'Duplicates are from the data field "Record ID". Not from the unique "RECORDID" <ROW> attribute. This attribute is used as the items-dict-key, and is visible in the item-dict as "row_RECORDID")',
+                'duplicate_groups': duplicate_groups,
+                'duplicate_groups_explanation': 'Each duplicated "Record ID" value, with the items-dict-keys of all the items having it.',
+                'duplicate_row_RECORDIDs': duplicate_rec_nums,
+                'duplicate_row_RECORDIDs_explanation': 'Non-unique "RECORDID" <ROW> attributes (not expected). Each repeat is stored under the key "RECORDID___n", n counting up from 2.',
                 'timestamp': str( datetime.datetime.now() ),
                 'time_elapsed': str( datetime.datetime.now() - self.instantiation_datetime )
             },
@@ -266,7 +203,7 @@ class SourceDictMaker:
         log.debug( f'Total records in DB: {len(rec_num_dict.items())}' )
         log.debug( f'number of non-unique `Record ID` values: {len(duplicates)}' )
         return final_dict
-    
+
 
 
 
@@ -334,27 +271,184 @@ class SourceDictMaker:
     #     return final_dict
 
     def _save_json( self, result_list, JSON_OUTPUT_PATH ):
-        ''' Saves the list of item-dicts to .json file. '''
-        json_string = json.dumps( result_list, indent=2, sort_keys=True )
-        with open( JSON_OUTPUT_PATH, 'wt' ) as f:
-            f.write( json_string )
+        ''' Saves the list of item-dicts to .json file -- compact, via the fastest serializer backend; or, with self.canonical_json, in the older indent=2, sort_keys=True layout. '''
+        dump_to_path( result_list, JSON_OUTPUT_PATH, canonical=self.canonical_json, level=self.compress_level )
         return
 
   # end class SourceDictMaker()
+
+
+## batch mode -------------------------------------------------------
+
+
+def convert_batch( input_pattern: str, output_dir: str, workers: int = 1, up_to_date_check: str = 'mtime', canonical_json: bool = False, force: bool = False ) -> dict:
+    """ Converts every xml export matching `input_pattern` (a glob, or a directory's *.xml files, compressed or not) to `<output_dir>/<name>.json`, on a process-pool.
+        Files are submitted largest-first, so the biggest export never starts last and leaves the other workers idle.
+        An output is skipped if up to date -- by `mtime` (newer than its source and every converter module), or by `hash` (its stamp-file's source- and converter-hashes match).
+        Prints an aggregate throughput summary; returns it.
+        Called by dundermain. """
+    if os.path.isdir( input_pattern ):
+        extensions: list = [ '' ] + [ extension for (_module, _magic, extension, _level) in CODECS.values() ]
+        patterns: list = [ os.path.join(input_pattern, f'*.xml{extension}') for extension in extensions ]
+    else:
+        patterns = [ input_pattern ]
+    pattern: str = ', '.join( patterns )
+    source_paths: list = sorted( [path for glob_pattern in patterns for path in glob.glob(glob_pattern)], key=os.path.getsize, reverse=True )  # for compressed exports, file-size is a rough proxy
+    os.makedirs( output_dir, exist_ok=True )
+    converter_paths: list = converter_source_paths()
+    converter_hash: str = hash_converter( converter_paths )
+    converter_mtime: float = max( os.path.getmtime(path) for path in converter_paths )
+    tasks: list = []
+    skipped: list = []
+    for source_path in source_paths:
+        output_path = os.path.join( output_dir, f'{os.path.splitext(os.path.basename(strip_codec_extension(source_path)))[0]}.json' )
+        if not force and is_output_up_to_date( source_path, output_path, up_to_date_check, converter_hash, converter_mtime ):
+            skipped.append( source_path )
+        else:
+            tasks.append( (source_path, output_path, canonical_json, converter_hash) )
+    log.info( f'``{len(source_paths)}`` exports match ``{pattern}``; converting ``{len(tasks)}``, skipping ``{len(skipped)}`` up-to-date' )
+    start = time.perf_counter()
+    results: list = []
+    with ProcessPoolExecutor( max_workers=workers ) as executor:
+        futures = [ executor.submit(convert_batch_file, task) for task in tasks ]  # submission order is largest-first
+        for future in as_completed( futures ):
+            result = future.result()
+            results.append( result )
+            log.info( f'finished ``{result["source_path"]}``; ``{result}``' )
+    wall_seconds: float = time.perf_counter() - start
+    converted: list = [ result for result in results if result['error'] is None ]
+    summary = {
+        'converted': len( converted ),
+        'skipped': len( skipped ),
+        'failed': len( results ) - len( converted ),
+        'source_MB': round( sum(result['source_bytes'] for result in converted) / 1e6, 1 ),
+        'items': sum( result['items'] for result in converted ),
+        'wall_seconds': round( wall_seconds, 1 ),
+        'MB_per_second': round( sum(result['source_bytes'] for result in converted) / 1e6 / wall_seconds, 1 ) if converted else 0.0,
+        'items_per_second': round( sum(result['items'] for result in converted) / wall_seconds, 1 ) if converted else 0.0 }
+    print( f'batch summary ({workers} workers):' )
+    for result in sorted( results, key=lambda result: result['source_path'] ):
+        status = f'FAILED: {result["error"]}' if result['error'] else f'{result["items"]} items, {result["source_bytes"] / 1e6:.1f} MB, {result["seconds"]:.1f}s'
+        print( f'  {result["source_path"]}: {status}' )
+    for source_path in skipped:
+        print( f'  {source_path}: up to date; skipped' )
+    print( f'  total: {summary}' )
+    return summary
+
+
+def convert_batch_file( task: tuple ) -> dict:
+    """ Converts one export, in a pool-worker; writes the output's stamp-file on success.
+        Errors are returned, not raised, so one bad export doesn't stop the batch.
+        Called by convert_batch() """
+    ( source_path, output_path, canonical_json, converter_hash ) = task
+    result = { 'source_path': source_path, 'source_bytes': os.path.getsize(source_path), 'items': 0, 'seconds': 0.0, 'error': None }
+    start = time.perf_counter()
+    try:
+        maker = SourceDictMaker()
+        maker.canonical_json = canonical_json
+        result['items'] = maker.convert_fmproxml_to_json( source_path, output_path )
+        dump_to_path( {'source_sha256': hash_file(source_path), 'converter_sha256': converter_hash}, f'{output_path}{BATCH_STAMP_SUFFIX}' )
+    except Exception as e:
+        log.exception( f'problem converting ``{source_path}``' )
+        result['error'] = repr( e )
+    result['seconds'] = round( time.perf_counter() - start, 2 )
+    return result
+
+
+def is_output_up_to_date( source_path: str, output_path: str, up_to_date_check: str, converter_hash: str, converter_mtime: float ) -> bool:
+    """ Returns True if the output needn't be regenerated.
+        `mtime`: the output is newer than both the source and the newest converter module. `hash`: the output's stamp-file records the source's and the converter modules' current sha256.
+        Called by convert_batch() """
+    stamp_path = f'{output_path}{BATCH_STAMP_SUFFIX}'
+    if not os.path.exists( output_path ) or not os.path.exists( stamp_path ):  # no stamp: the output didn't come from a finished batch-conversion
+        return False
+    if up_to_date_check == 'mtime':
+        return os.path.getmtime( output_path ) >= max( os.path.getmtime(source_path), converter_mtime )
+    stamp: dict = load_from_path( stamp_path )
+    return stamp.get( 'converter_sha256' ) == converter_hash and stamp.get( 'source_sha256' ) == hash_file( source_path )
+
+
+def converter_source_paths() -> list:
+    """ Returns the sorted paths of the modules matching CONVERTER_SOURCE_PATTERNS.
+        Called by convert_batch() """
+    base_dir: str = os.path.dirname( os.path.abspath(__file__) )
+    return sorted( set(path for pattern in CONVERTER_SOURCE_PATTERNS for path in glob.glob(os.path.join(base_dir, pattern))) )
+
+
+def hash_converter( paths: list ) -> str:
+    """ Returns one sha256 hex-digest over the converter modules' names and contents; changes if any module is edited, added, or removed.
+        Called by convert_batch() """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update( f'{os.path.basename(path)}:{hash_file(path)}\n'.encode('utf-8') )
+    return digest.hexdigest()
+
+
+def hash_file( path: str ) -> str:
+    """ Returns the file's sha256 hex-digest, reading it in 1MB blocks.
+        Called by convert_batch() and its helpers. """
+    digest = hashlib.sha256()
+    with open( path, 'rb' ) as f:
+        for block in iter( lambda: f.read(1024 * 1024), b'' ):
+            digest.update( block )
+    return digest.hexdigest()
+
+
+## checkpoint manifest ----------------------------------------------
+
+
+def save_checkpoint_manifest( manifest: dict, PARTS_DIR: str ) -> None:
+    """ Saves the checkpoint manifest, via a temp-file renamed into place.
+        Called by SourceDictMaker's checkpointing mode. """
+    manifest_path = os.path.join( PARTS_DIR, CHECKPOINT_FILENAME )
+    dump_to_path( manifest, f'{manifest_path}.tmp', pretty=True )
+    os.replace( f'{manifest_path}.tmp', manifest_path )
+    return
     
 
 if __name__ == '__main__':
+    configure_logging()
     log.info( 'starting dundermain' )
     start_time = datetime.datetime.now()
     ## get args -----------------------------------------------------
     parser = argparse.ArgumentParser( description='expects source-xml-path, and output-json-path.' )
     parser.add_argument( '--source_path', type=str, help='path to source xml file' )
     parser.add_argument( '--output_path', type=str, help='path to output json file' )
+    parser.add_argument( '--snapshot_path', type=str, help='optional path for a binary snapshot of the output, for fast reloading' )
+    parser.add_argument( '--rollup_path', type=str, help='optional path for per-org rollups json, computed during conversion' )
+    parser.add_argument( '--schema_path', type=str, help='optional schema json file (see validate_fmpro_export.py) for the pre-conversion check' )
+    parser.add_argument( '--canonical_json', action='store_true', help='write the older, byte-comparable, indent=2 sort_keys=True json layout (slower)' )
+    parser.add_argument( '--parts_dir', type=str, help='optional directory for resumable, checkpointed conversion: finished row-chunks are saved there as part-files; a re-run resumes after the last finished chunk' )
+    parser.add_argument( '--chunk_size', type=int, default=DEFAULT_CHUNK_SIZE, help=f'rows per part-file, with --parts_dir (default {DEFAULT_CHUNK_SIZE})' )
+    parser.add_argument( '--fields', type=str, nargs='+', help='optional field-names to keep (eg "Organization ID" "Item" "Box Number"); the other columns are skipped, not read. Duplicate-"Record ID" detection needs "Record ID" kept' )
+    parser.add_argument( '--batch_input', type=str, help='batch mode: a directory of xml exports, or a quoted glob (eg "exports/*_items_xml_export.xml"); each is converted to --batch_output_dir/<name>.json' )
+    parser.add_argument( '--batch_output_dir', type=str, help='batch mode: output directory' )
+    parser.add_argument( '--workers', type=int, default=os.cpu_count() or 1, help='batch mode: worker processes (default: cpu-count)' )
+    parser.add_argument( '--up_to_date_check', type=str, choices=['mtime', 'hash'], default='mtime', help='batch mode: how to tell an output is current (default mtime)' )
+    parser.add_argument( '--force', action='store_true', help='batch mode: convert every export, even up-to-date ones' )
+    parser.add_argument( '--include_orgs', type=str, nargs='+', help='optional row-filter: keep only rows with these "Organization ID" values' )
+    parser.add_argument( '--exclude_orgs', type=str, nargs='+', help='optional row-filter: skip rows with these "Organization ID" values' )
+    parser.add_argument( '--record_id_range', type=parse_record_id_range, action='append', help='optional row-filter: keep only rows whose numeric "Record ID" is in this inclusive range, eg 1000-1999 (repeatable)' )
+    parser.add_argument( '--types', type=str, nargs='+', help='optional row-filter: keep only rows with these "Type" values' )
+    parser.add_argument( '--compress_level', type=int, help='compression level for outputs whose path ends in .gz/.bz2/.xz (default: COMPRESS_LEVEL env-var, else gzip 6, bzip2 9, xz 6); the source may be compressed too, detected automatically' )
     args = parser.parse_args()
     FMPRO_XML_PATH = args.source_path
     JSON_OUTPUT_PATH = args.output_path
     ## run converter ------------------------------------------------
+    if args.batch_input:
+        convert_batch( args.batch_input, args.batch_output_dir, args.workers, args.up_to_date_check, args.canonical_json, args.force )
+        raise SystemExit( 0 )
     maker = SourceDictMaker()
-    maker.convert_fmproxml_to_json( FMPRO_XML_PATH, JSON_OUTPUT_PATH )
+    maker.canonical_json = args.canonical_json
+    maker.fields = args.fields
+    maker.compress_level = args.compress_level
+    if args.include_orgs or args.exclude_orgs or args.record_id_range or args.types:
+        maker.row_filter = RowFilter( args.include_orgs, args.exclude_orgs, args.record_id_range, args.types )
+    if args.schema_path:
+        maker.validation_schema = load_schema( args.schema_path )
+    if args.parts_dir:  # with no --output_path, the parts are left as a sharded dataset
+        maker.convert_fmproxml_to_json_chunked( FMPRO_XML_PATH, args.parts_dir, JSON_OUTPUT_PATH, args.snapshot_path, args.rollup_path, args.chunk_size )
+    else:
+        maker.convert_fmproxml_to_json( FMPRO_XML_PATH, JSON_OUTPUT_PATH, args.snapshot_path, args.rollup_path )
     elapsed_time = datetime.datetime.now() - start_time
     log.info( 'ending dundermain; elapsed_time, ``%s``' % elapsed_time )
@@ -0,0 +1,196 @@
+"""
+Record-level change feed between two exports -- eg last month's and this month's.
+
+Takes two converted json files, or two raw xml exports (or one of each), and writes a jsonl change-feed, one line per changed record:
+    {"change": "added", "key": "188135", "item": {...}}
+    {"change": "removed", "key": "188136"}
+    {"change": "modified", "key": "188137", "fields": {"Item": {"old": "...", "new": "..."}}}
+
+Both sides are streamed in `row_RECORDID` order (numeric, with any `RECORDID___n` repeat-keys right after their RECORDID), and merge-joined in one linear pass:
+- json input is read through `converted_data.open_lazy_items()`, so only the current item from each side is decoded.
+- xml input is streamed with the converter's parser, and externally sorted: sorted runs of `--run_size` items are spilled to temp files, then heap-merged. (An export that fits in one run is never spilled.)
+So memory holds the item-keys, plus (for xml) one run of items -- never both full exports.
+
+`row_MODID` (FileMaker's edit-counter) is ignored by default, so records that were touched but not changed aren't reported; see `--ignore_fields`.
+
+Usage:
+(venv) $ python ./diff_exports.py --old_path "/path/to/old.json" --new_path "/path/to/new.xml" --output_path "/path/to/changes.jsonl"
+"""
+
+import argparse, heapq, logging, tempfile
+
+from hh_xml.converted_data import load_items, open_lazy_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.records import SNAPSHOT_FORMAT, XML_FORMAT, detect_format, iter_xml_records
+from hh_xml.serializer import dumps, loads
+
+
+log = logging.getLogger( __name__ )
+
+
+DEFAULT_IGNORED_FIELDS: list = [ 'row_MODID' ]
+RUN_SIZE: int = 50000  # xml items per external-sort run
+
+
+## manager function -------------------------------------------------
+
+
+def diff_exports( old_path: str, new_path: str, output_path: str, ignore_fields: list = DEFAULT_IGNORED_FIELDS, run_size: int = RUN_SIZE ) -> dict:
+    """ Writes the jsonl change-feed between the two exports; returns the change-counts.
+        Called by dundermain. """
+    ignored: set = set( ignore_fields )
+    counts: dict = { 'added': 0, 'removed': 0, 'modified': 0, 'unchanged': 0 }
+    with tempfile.TemporaryDirectory() as temp_dir, open( output_path, 'wb' ) as output_file:
+        old_records = iter_sorted_records( old_path, temp_dir, run_size )
+        new_records = iter_sorted_records( new_path, temp_dir, run_size )
+        progress = ProgressReporter( 'comparing records', logger=log )
+        for ( key, old_item, new_item ) in merge_join( old_records, new_records ):
+            progress.update()
+            if old_item is None:
+                change = { 'change': 'added', 'key': key, 'item': new_item }
+            elif new_item is None:
+                change = { 'change': 'removed', 'key': key }
+            else:
+                field_changes: dict = diff_items( old_item, new_item, ignored )
+                if not field_changes:
+                    counts['unchanged'] += 1
+                    continue
+                change = { 'change': 'modified', 'key': key, 'fields': field_changes }
+            counts[change['change']] += 1
+            output_file.write( dumps(change) + b'\n' )
+        progress.finish()
+    log.info( f'changes written to ``{output_path}``; counts, ``{counts}``' )
+    return counts
+
+
+## merge-join -------------------------------------------------------
+
+
+def merge_join( old_records, new_records ):
+    """ Yields ( key, old-item-or-None, new-item-or-None ) for every key on either side.
+        Both inputs must yield ( key, item ) in record_sort_key() order.
+        Called by diff_exports() """
+    old_next = next( old_records, None )
+    new_next = next( new_records, None )
+    while old_next is not None or new_next is not None:
+        if new_next is None or ( old_next is not None and record_sort_key(old_next[0]) < record_sort_key(new_next[0]) ):
+            yield ( old_next[0], old_next[1], None )
+            old_next = next( old_records, None )
+        elif old_next is None or record_sort_key( new_next[0] ) < record_sort_key( old_next[0] ):
+            yield ( new_next[0], None, new_next[1] )
+            new_next = next( new_records, None )
+        else:
+            yield ( old_next[0], old_next[1], new_next[1] )
+            old_next = next( old_records, None )
+            new_next = next( new_records, None )
+
+
+def diff_items( old_item: dict, new_item: dict, ignored: set ) -> dict:
+    """ Returns {field: {'old': ..., 'new': ...}} for each differing field; a field missing on one side shows as None.
+        Called by diff_exports() """
+    field_changes: dict = {}
+    for field in old_item.keys() | new_item.keys():
+        if field in ignored:
+            continue
+        ( old_value, new_value ) = ( old_item.get(field), new_item.get(field) )
+        if old_value != new_value:
+            field_changes[field] = { 'old': old_value, 'new': new_value }
+    return dict( sorted(field_changes.items()) )
+
+
+def record_sort_key( key: str ) -> tuple:
+    """ Returns the merge-order for an items-dict-key: numeric RECORDID, then repeat-number (`188135___2` right after `188135`).
+        Non-numeric keys (not expected) sort after the numeric ones.
+        Called by merge_join(), and to sort each side. """
+    ( record_id, _separator, repeat ) = key.partition( '___' )
+    repeat_number = int( repeat ) if repeat.isdigit() else 1
+    return ( 0, int(record_id), '', repeat_number ) if record_id.isdigit() else ( 1, 0, key, repeat_number )
+
+
+## sorted record-streams --------------------------------------------
+
+
+def iter_sorted_records( path: str, temp_dir: str, run_size: int ):
+    """ Yields ( items-dict-key, item ) in record_sort_key() order, from a converted json/snapshot file or a raw xml export.
+        Called by diff_exports() """
+    data_format: str = detect_format( path )
+    if data_format == XML_FORMAT:
+        return iter_sorted_xml_records( path, temp_dir, run_size )
+    elif data_format == SNAPSHOT_FORMAT:
+        return iter_sorted_mapping( load_items(path) )  # a snapshot loads whole; json or xml input keeps memory bounded
+    return iter_sorted_json_records( path )
+
+
+def iter_sorted_mapping( items ):
+    """ Yields ( key, item ) from an items-mapping, in record_sort_key() order.
+        Called by iter_sorted_records() and iter_sorted_json_records() """
+    for key in sorted( items, key=record_sort_key ):
+        yield ( key, items[key] )
+
+
+def iter_sorted_json_records( json_path: str ):
+    """ Yields ( key, item ) from a converted json file, decoding one item at a time.
+        Called by iter_sorted_records() """
+    lazy_items = open_lazy_items( json_path )
+    try:
+        yield from iter_sorted_mapping( lazy_items )
+    finally:
+        lazy_items.close()
+
+
+def iter_sorted_xml_records( xml_path: str, temp_dir: str, run_size: int ):
+    """ Yields ( key, item ) from a raw xml export, in record_sort_key() order.
+        Items get the same keys the converter gives them (`RECORDID`, then `RECORDID___n` for repeats).
+        Sorted runs of `run_size` items are spilled to jsonl files in `temp_dir`, then heap-merged.
+        Called by iter_sorted_records() """
+    from hh_xml.fm_rows import RowConverter  # imported here, so json-only diffs don't need lxml
+    run: list = []
+    run_paths: list = []
+    for ( key, item ) in iter_xml_records( xml_path, RowConverter() ):
+        run.append( (key, item) )
+        if len( run ) >= run_size:
+            run_paths.append( write_run(run, temp_dir) )
+            run = []
+    run.sort( key=lambda pair: record_sort_key(pair[0]) )
+    if not run_paths:
+        yield from run
+        return
+    run_paths.append( write_run(run, temp_dir) )
+    log.debug( f'merging ``{len(run_paths)}`` sorted runs of ``{xml_path}``' )
+    yield from heapq.merge( *[read_run(run_path) for run_path in run_paths], key=lambda pair: record_sort_key(pair[0]) )
+
+
+def write_run( run: list, temp_dir: str ) -> str:
+    """ Sorts a run of ( key, item ) pairs and writes it as jsonl; returns the run's path.
+        Called by iter_sorted_xml_records() """
+    run.sort( key=lambda pair: record_sort_key(pair[0]) )
+    with tempfile.NamedTemporaryFile( 'wb', dir=temp_dir, suffix='.jsonl', delete=False ) as f:
+        for pair in run:
+            f.write( dumps(pair) + b'\n' )
+    return f.name
+
+
+def read_run( run_path: str ):
+    """ Yields the ( key, item ) pairs of a run-file, in order.
+        Called by iter_sorted_xml_records() """
+    with open( run_path, 'rb' ) as f:
+        for line in f:
+            ( key, item ) = loads( line )
+            yield ( key, item )
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Writes a jsonl change-feed (added/removed/modified records) between two exports.' )
+    parser.add_argument( '--old_path', type=str, help='path to the older export: converted json (or snapshot), or raw xml' )
+    parser.add_argument( '--new_path', type=str, help='path to the newer export: converted json (or snapshot), or raw xml' )
+    parser.add_argument( '--output_path', type=str, help='path to the output jsonl change-feed' )
+    parser.add_argument( '--ignore_fields', type=str, nargs='*', default=DEFAULT_IGNORED_FIELDS, help='fields left out of the comparison (default: row_MODID)' )
+    parser.add_argument( '--run_size', type=int, default=RUN_SIZE, help=f'xml items held in memory per external-sort run (default {RUN_SIZE})' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    diff_exports( args.old_path, args.new_path, args.output_path, args.ignore_fields, args.run_size )
+    log.debug( 'done' )
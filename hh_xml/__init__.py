@@ -0,0 +1,48 @@
+"""
+Shared primitives for the hall-hoag scripts: logging-setup, compressed i/o, json-serialization, text-normalization, progress-logging, filemaker-xml parsing and row-conversion, and record-streams.
+The package imports nothing from outside itself; the scripts import it.
+
+Importing the package does nothing but define names: each primitive is imported from its module on first use (PEP 562 `__getattr__`), and lxml only when xml is actually parsed. So a short-lived command (eg `python -m hh_xml lookup ...`) pays only for what it touches.
+
+Usage:
+    import hh_xml
+    hh_xml.configure_logging()
+    for ( key, item ) in hh_xml.iter_records( '/path/to/output.json.gz' ):
+        ...
+"""
+
+import importlib
+
+
+## public-name -> module it's imported from, on first access
+_LAZY_NAMES: dict = {
+    'configure_logging': 'hh_xml.logging_setup',
+    'open_input': 'hh_xml.compressed_io',
+    'open_output': 'hh_xml.compressed_io',
+    'dumps': 'hh_xml.serializer',
+    'loads': 'hh_xml.serializer',
+    'dump_to_path': 'hh_xml.serializer',
+    'load_from_path': 'hh_xml.serializer',
+    'load_items': 'hh_xml.converted_data',
+    'open_lazy_items': 'hh_xml.converted_data',
+    'NAMESPACE': 'hh_xml.fm_xml',
+    'iterparse': 'hh_xml.fm_xml',
+    'clear_element': 'hh_xml.fm_xml',
+    'detect_format': 'hh_xml.records',
+    'iter_records': 'hh_xml.records' }
+
+__all__ = list( _LAZY_NAMES )
+
+
+def __getattr__( name: str ):
+    """ Imports and returns a public name's object on first access; caches it as a module attribute. """
+    module_name = _LAZY_NAMES.get( name )
+    if module_name is None:
+        raise AttributeError( f'module {__name__!r} has no attribute {name!r}' )
+    value = getattr( importlib.import_module(module_name), name )
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted( set(globals()) | set(__all__) )
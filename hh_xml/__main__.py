@@ -0,0 +1,8 @@
+""" Runs the cli: `python -m hh_xml <command> [args]` (see `cli.py`). """
+
+import sys
+
+from hh_xml.cli import main
+
+
+sys.exit( main() )
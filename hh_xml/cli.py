@@ -0,0 +1,108 @@
+"""
+One entry-point for every script, as subcommands: `python -m hh_xml <command> [args]`.
+
+Script-commands (eg `convert`, `make-csv-100`) hand their remaining args to the script, run as if called directly -- same flags, same `--help`.
+Only the chosen script is imported, so eg `validate` never loads the converter, and `lookup` never loads lxml.
+
+`lookup` is built in: it prints the given items (one json object per line, `{key: item}`) from a converted json, snapshot, or raw xml export.
+A json file is read through its index, so a lookup takes milliseconds rather than a full load (see `converted_data.open_lazy_items()`).
+
+Usage:
+(venv) $ python -m hh_xml convert --source_path "/path/to/source.xml" --output_path "/path/to/output.json"
+(venv) $ python -m hh_xml lookup --input_path "/path/to/output.json" 188135 188136
+(venv) $ python -m hh_xml --help  # lists the commands
+"""
+
+import argparse, logging, runpy, sys
+from typing import Optional
+
+from hh_xml.logging_setup import configure_logging
+
+
+log = logging.getLogger( __name__ )
+
+
+## command -> ( script-module, help )
+SCRIPT_COMMANDS: dict = {
+    'convert': ( 'convert_fmproxml_to_json', 'convert an xml export to json' ),
+    'validate': ( 'validate_fmpro_export', 'pre-flight check of an xml export' ),
+    'unique-orgs': ( 'unique_orgs', 'list unique org-ids, with counts' ),
+    'make-csv-100': ( 'make_csv_100', 'tsv of the preset orgs\' items' ),
+    'make-csv-rest': ( 'make_csv_rest', 'tsv of all other orgs\' items' ),
+    'pretty-print': ( 'pretty_print', 'format an xml export' ),
+    'pipeline': ( 'run_pipeline', 'the nightly chain, from a single parse' ),
+    'diff': ( 'diff_exports', 'record-level change feed between two exports' ),
+    'duplicates': ( 'analyze_duplicates', 'report duplicate Record IDs, in bounded memory' ),
+    'join-scans': ( 'join_scan_manifest', 'link page-scans to items' ),
+    'search': ( 'search_index', 'build, or query, the full-text index' ),
+    'serve': ( 'query_service', 'local http lookups' ),
+    'synthetic': ( 'synthetic_export', 'write a synthetic xml export' ) }
+
+
+## manager function -------------------------------------------------
+
+
+def main( argv: Optional[list] = None ) -> int:
+    """ Runs a subcommand; returns the exit-status.
+        Called by hh_xml/__main__.py """
+    argv = sys.argv[1:] if argv is None else list( argv )
+    if argv and argv[0] in SCRIPT_COMMANDS:
+        run_script( SCRIPT_COMMANDS[argv[0]][0], argv[1:] )
+        return 0
+    args = make_parser().parse_args( argv )
+    configure_logging()
+    from hh_xml.serializer import dumps  # imported here, so script-commands import only their script
+    log.debug( f'args: {args}' )
+    found: dict = lookup( args.input_path, args.keys )
+    for key in args.keys:
+        if key in found:
+            print( dumps({key: found[key]}).decode('utf-8') )
+        else:
+            log.warning( f'key ``{key}`` not found' )
+    return 0 if len( found ) == len( set(args.keys) ) else 1
+
+
+## helper functions -------------------------------------------------
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """ Returns the argparser; script-commands are listed for --help, but their args are the script's own.
+        Called by main() """
+    parser = argparse.ArgumentParser( prog='python -m hh_xml', description='Hall-hoag export tools.' )
+    subparsers = parser.add_subparsers( dest='command', required=True )
+    for ( command, (_module_name, help_text) ) in SCRIPT_COMMANDS.items():
+        subparsers.add_parser( command, help=help_text, add_help=False )
+    lookup_parser = subparsers.add_parser( 'lookup', help='print items by items-dict-key' )
+    lookup_parser.add_argument( '--input_path', type=str, required=True, help='path to the converted json (or snapshot), or raw xml export; may be .gz/.bz2/.xz' )
+    lookup_parser.add_argument( 'keys', nargs='+', help='items-dict-keys (RECORDIDs)' )
+    return parser
+
+
+def run_script( module_name: str, script_args: list ) -> None:
+    """ Runs a script-module as `__main__`, with `script_args` as its command-line; the script configures its own logging.
+        Called by main() """
+    sys.argv = [ f'{module_name}.py' ] + script_args
+    runpy.run_module( module_name, run_name='__main__', alter_sys=True )
+    return
+
+
+def lookup( input_path: str, keys: list ) -> dict:
+    """ Returns {key: item} for each of `keys` found in the data file.
+        A converted json is read through its index; other formats are streamed until every key is found.
+        Called by main() """
+    from hh_xml.records import JSON_FORMAT, detect_format, iter_records
+    wanted: set = set( keys )
+    if detect_format( input_path ) == JSON_FORMAT:
+        from hh_xml.converted_data import open_lazy_items
+        items = open_lazy_items( input_path )
+        try:
+            return { key: items[key] for key in wanted if key in items }
+        finally:
+            items.close()
+    found: dict = {}
+    for ( key, item ) in iter_records( input_path ):
+        if key in wanted:
+            found[key] = item
+            if len( found ) == len( wanted ):
+                break
+    return found
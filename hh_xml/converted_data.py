@@ -0,0 +1,219 @@
+"""
+Shared loading (and snapshot-saving) of the converter's output, so every consumer script reads it the same, fast, way.
+
+The converter's json output is convenient to view, but `json.loads` on the full file takes seconds before any real work begins.
+A binary snapshot -- a pickle (protocol 5) of the same `{'__meta__': ..., 'items': ...}` dict -- reloads in a fraction of that time.
+(Protocol 5's out-of-band buffers only help with large binary buffers; this data is all small strings, so the snapshot is written in-band.)
+
+`load_converted_data()` accepts either format, detected by the file's first bytes, so scripts don't need a format flag; either may be gzip/bzip2/xz-compressed (see `compressed_io.py`).
+
+The converter's resumable mode (`--parts_dir`) saves its rows as part-files listed in a checkpoint manifest; `iter_part_items()` reads such a sharded dataset back, in row order.
+
+For workflows that need only some items, `open_lazy_items()` returns a read-only Mapping over the json file that decodes an item only when it's accessed.
+It uses a key-to-byte-offset index of the `items` object, built once (at about the cost of one json load) and saved next to the json file as `<json-path>.idx`; the index is rebuilt automatically if the json file changes.
+A compressed json file can't be memory-mapped, so it's decompressed into memory instead: items are still decoded only on access, but the whole json is held.
+
+Usage:
+    from hh_xml.converted_data import load_items, open_lazy_items
+    items: dict = load_items( '/path/to/output.json' )  # or '/path/to/output.pickle'
+    lazy_items = open_lazy_items( '/path/to/output.json' )
+    item: dict = lazy_items['188135']  # only this item is decoded
+"""
+
+import json, logging, mmap, os, pickle, re
+from collections.abc import Mapping
+from typing import Optional
+
+from hh_xml.compressed_io import detect_codec, open_input, open_output
+from hh_xml.serializer import dump_to_path, load_from_path, loads
+
+
+log = logging.getLogger( __name__ )
+
+
+SNAPSHOT_PROTOCOL: int = 5
+PICKLE_MAGIC: bytes = bytes( [0x80, SNAPSHOT_PROTOCOL] )  # a protocol-5 pickle starts with the PROTO opcode and its version
+
+
+def save_snapshot( data: dict, snapshot_path: str, level: Optional[int] = None ) -> None:
+    """ Saves the converter's output-dict as a binary snapshot; compressed, at `level`, for a compression-extension.
+        Called by SourceDictMaker.convert_fmproxml_to_json() and run_pipeline.py """
+    with open_output( snapshot_path, level=level ) as f:
+        pickle.dump( data, f, protocol=SNAPSHOT_PROTOCOL )
+    log.debug( f'snapshot saved to ``{snapshot_path}``' )
+    return
+
+
+def load_converted_data( path: str ) -> dict:
+    """ Returns the converter's full output-dict, from either a json file or a binary snapshot.
+        Note: only load snapshots this project wrote -- unpickling runs code from the file.
+        Called by load_items() """
+    with open_input( path ) as f:  # a compressed stream's seek(0) just restarts the decompression
+        if f.read( 2 ) == PICKLE_MAGIC:
+            f.seek( 0 )
+            data = pickle.load( f )
+        else:
+            f.seek( 0 )
+            data = loads( f.read() )
+    assert type(data) == dict, type(data)
+    return data
+
+
+def load_items( path: str ) -> dict:
+    """ Returns the converter's `items` dict, from either a json file or a binary snapshot.
+        Called by the make_csv scripts. """
+    items: dict = load_converted_data( path )['items']
+    assert type(items) == dict, type(items)
+    return items
+
+
+## part-files (the converter's checkpointing mode) ------------------
+
+
+CHECKPOINT_FILENAME: str = 'checkpoint.json'
+
+
+def load_checkpoint_manifest( parts_dir: str ):
+    """ Returns the checkpoint manifest in `parts_dir`, or None if there isn't one.
+        Called by iter_part_items(), and by SourceDictMaker's checkpointing mode. """
+    manifest_path = os.path.join( parts_dir, CHECKPOINT_FILENAME )
+    if not os.path.exists( manifest_path ):
+        return None
+    return load_from_path( manifest_path )
+
+
+def iter_part_items( parts_dir: str ):
+    """ Yields the item-dicts of a completed chunked conversion, part by part, in row order.
+        Items aren't yet keyed or de-duplicated -- that happens when the parts are merged.
+        Called by SourceDictMaker.convert_fmproxml_to_json_chunked(); usable by any consumer of a sharded dataset. """
+    manifest = load_checkpoint_manifest( parts_dir )
+    if manifest is None or not manifest['complete']:
+        msg = f'no completed chunked conversion in ``{parts_dir}``'
+        log.error( msg )
+        raise Exception( msg )
+    for part in manifest['parts']:
+        yield from load_from_path( os.path.join(parts_dir, part['file_name']) )
+
+
+## lazy access ------------------------------------------------------
+
+
+INDEX_SUFFIX: str = '.idx'
+WHITESPACE_RE = re.compile( r'[ \t\n\r]*' )
+
+
+class LazyItems( Mapping ):
+    """ Read-only Mapping of items-dict-key -> item-dict, decoding each item from the memory-mapped json file on access.
+        Keys iterate in file order: the export's row order (or, for the converter's --canonical_json output, sorted order). """
+
+    def __init__( self, json_path: str, offsets: dict ):
+        self.json_path = json_path
+        self.offsets = offsets  # key -> [ byte-offset, byte-length ], in the decompressed json
+        if detect_codec( json_path ):
+            with open_input( json_path ) as f:
+                self.mm = f.read()  # bytes slice like the mmap
+        else:
+            with open( json_path, 'rb' ) as f:
+                self.mm = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+
+    def __getitem__( self, key: str ) -> dict:
+        ( offset, length ) = self.offsets[key]
+        return loads( self.mm[offset:offset + length] )
+
+    def __iter__( self ):
+        return iter( self.offsets )
+
+    def __len__( self ) -> int:
+        return len( self.offsets )
+
+    def __contains__( self, key ) -> bool:
+        return key in self.offsets  # avoids the Mapping default, which would decode the item
+
+    def close( self ) -> None:
+        if isinstance( self.mm, mmap.mmap ):
+            self.mm.close()
+
+    ## end class LazyItems()
+
+
+def open_lazy_items( json_path: str ) -> LazyItems:
+    """ Returns a LazyItems mapping over the json file, loading its saved index or (re)building it if missing or stale.
+        Called by consumers needing only some items. """
+    stat = os.stat( json_path )
+    index_path = f'{json_path}{INDEX_SUFFIX}'
+    offsets = None
+    if os.path.exists( index_path ):
+        index = load_from_path( index_path )
+        if index['source_size'] == stat.st_size and index['source_mtime_ns'] == stat.st_mtime_ns:
+            offsets = index['offsets']
+        else:
+            log.info( f'index ``{index_path}`` is stale; rebuilding' )
+    if offsets is None:
+        offsets = build_items_index( json_path )
+        dump_to_path( {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns, 'offsets': offsets}, index_path )
+        log.debug( f'index saved to ``{index_path}``' )
+    return LazyItems( json_path, offsets )
+
+
+def build_items_index( json_path: str ) -> dict:
+    """ Returns dict of items-dict-key -> [ byte-offset, byte-length ] of each item's json-value.
+        Walks the top-level object and the `items` object with the json module's C scanner, one value at a time.
+        The file is decoded as latin-1 so that character-offsets equal byte-offsets, whatever utf-8 it contains; every json structural character is ascii, so the walk is unaffected.
+        Called by open_lazy_items() """
+    with open_input( json_path ) as f:
+        text: str = f.read().decode( 'latin-1' )
+    decoder = json.JSONDecoder()
+    pos = expect_char( text, skip_whitespace(text, 0), '{' )
+    offsets: dict = {}
+    while True:
+        pos = skip_whitespace( text, pos )
+        if text[pos] == '}':
+            break
+        ( key, pos ) = decoder.raw_decode( text, pos )
+        pos = skip_whitespace( text, expect_char(text, skip_whitespace(text, pos), ':') )
+        if key == 'items':
+            pos = index_object( text, pos, decoder, offsets )
+        else:
+            ( _value, pos ) = decoder.raw_decode( text, pos )  # eg `__meta__`; small
+        pos = skip_whitespace( text, pos )
+        if text[pos] == ',':
+            pos += 1
+    log.debug( f'indexed ``{len(offsets)}`` items in ``{json_path}``' )
+    return offsets
+
+
+def index_object( text: str, pos: int, decoder: json.JSONDecoder, offsets: dict ) -> int:
+    """ Records the offset and length of each value of the json object starting at `pos`.
+        Returns the position just after the object.
+        Called by build_items_index() """
+    pos = expect_char( text, pos, '{' )
+    while True:
+        pos = skip_whitespace( text, pos )
+        if text[pos] == '}':
+            return pos + 1
+        key_start = pos
+        ( key, pos ) = decoder.raw_decode( text, pos )
+        if not key.isascii():  # re-decodes the key's utf-8 bytes; handles both raw utf-8 and (canonical-mode) `\uXXXX` escapes
+            key = json.loads( text[key_start:pos].encode('latin-1').decode('utf-8') )
+        value_start = skip_whitespace( text, expect_char(text, skip_whitespace(text, pos), ':') )
+        ( _value, pos ) = decoder.raw_decode( text, value_start )
+        offsets[key] = [ value_start, pos - value_start ]
+        pos = skip_whitespace( text, pos )
+        if text[pos] == ',':
+            pos += 1
+
+
+def skip_whitespace( text: str, pos: int ) -> int:
+    """ Returns the position of the next non-whitespace character.
+        Called by build_items_index() and index_object() """
+    return WHITESPACE_RE.match( text, pos ).end()  # type: ignore
+
+
+def expect_char( text: str, pos: int, char: str ) -> int:
+    """ Returns the position after `char`; raises exception if `char` isn't at `pos`.
+        Called by build_items_index() and index_object() """
+    if text[pos] != char:
+        msg = f'expected ``{char}`` at position ``{pos}``; found ``{text[pos:pos + 20]}``'
+        log.error( msg )
+        raise Exception( msg )
+    return pos + 1
@@ -0,0 +1,261 @@
+"""
+Converts filemaker-pro FMPXMLRESULT rows to item-dicts: the field schema (from the METADATA `<FIELD>` attributes), and a streaming row-converter.
+
+`RowConverter.iter_item_dicts()` is the one row-parse every consumer shares -- the converter script (whose `SourceDictMaker` extends it), `records.iter_xml_records()`, the row-filtered make_csv loads, and the pipeline -- so an item looks the same whichever of them built it.
+Each value is normalized (see `text_normalizer.py`), then typed per its field's schema-entry; with `fields` set, other columns' DATA elements are never read, and with `row_filter` set, failing rows are skipped before their dict is built.
+
+Unlike `fm_xml.py`, this module imports lxml; import it only where xml is actually parsed.
+
+Usage:
+    from hh_xml.fm_rows import RowConverter
+    converter = RowConverter()
+    converter.fields = [ 'Organization ID', 'Item' ]  # optional
+    for item_dict in converter.iter_item_dicts( '/path/to/source.xml.gz' ):
+        ...
+"""
+
+import datetime, logging, pprint, re
+from typing import Optional
+
+from lxml import etree
+
+from hh_xml.fm_xml import COL_TAG, DATA_TAG, DATABASE_TAG, FIELD_TAG, METADATA_TAG, RESULTSET_TAG, ROW_TAG, clear_element, iterparse
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.text_normalizer import TextNormalizer
+
+
+log = logging.getLogger( __name__ )
+
+
+class FieldSpec:
+    """ Type-info for one export-field, from its METADATA <FIELD> attributes.
+        Lets the converter decide list-vs-scalar, and the native value-type, before any row is read. """
+
+    def __init__( self, name: str, field_type: str, max_repeat: int, date_format: Optional[str] = None ):
+        self.name = name
+        self.field_type = field_type  # eg 'TEXT', 'NUMBER', 'DATE'
+        self.max_repeat = max_repeat
+        self.is_list: bool = max_repeat > 1 or '::' in name  # repeating fields, and related-table (portal) fields, can hold multiple values
+        self.date_format = date_format  # strptime-format, from the DATABASE DATEFORMAT attribute
+
+    def convert( self, text: str ):
+        """ Returns the native value for a stripped DATA string.
+            NUMBER -> int or float; DATE -> iso-date string (json has no date type); otherwise the string.
+            Values that don't parse are returned unchanged, since filemaker doesn't enforce field types on import. """
+        if self.field_type == 'NUMBER':
+            try:
+                return int( text )
+            except ValueError:
+                try:
+                    return float( text )
+                except ValueError:
+                    return text
+        elif self.field_type == 'DATE' and self.date_format:
+            try:
+                return datetime.datetime.strptime( text, self.date_format ).date().isoformat()
+            except ValueError:
+                return text
+        return text
+
+    def __repr__( self ):
+        return f'FieldSpec({self.name!r}, {self.field_type!r}, max_repeat={self.max_repeat}, is_list={self.is_list})'
+
+    ## end class FieldSpec()
+
+
+def make_field_schema( field_attribs: list, fm_date_format: Optional[str] = None ) -> list:
+    """ Returns list of FieldSpec objects, in column order, from the <FIELD> attribute-dicts.
+        Called by RowConverter.iter_item_dicts() """
+    date_format = convert_fm_date_format( fm_date_format ) if fm_date_format else None
+    schema = []
+    for attribs in field_attribs:
+        schema.append( FieldSpec(attribs['NAME'], attribs.get('TYPE', 'TEXT'), int(attribs.get('MAXREPEAT', '1')), date_format) )
+    return schema
+
+
+def project_field_schema( field_schema: list, fields: Optional[list] ) -> list:
+    """ Returns the schema with None in place of each FieldSpec whose name isn't in `fields` (or the schema unchanged, if `fields` is None).
+        Raises exception listing any requested field the export doesn't have.
+        Called by RowConverter.iter_item_dicts() """
+    if fields is None:
+        return field_schema
+    unknown: list = [ name for name in fields if name not in {spec.name for spec in field_schema} ]
+    if unknown:
+        msg = f'projected fields not in export, ``{unknown}``'
+        log.error( msg )
+        raise Exception( msg )
+    wanted: set = set( fields )
+    return [ (spec if spec.name in wanted else None) for spec in field_schema ]
+
+
+def make_filter_columns( field_schema: list, row_filter ) -> list:
+    """ Returns ( column-index, field-name ) for each field the row-filter reads.
+        Raises exception if the export lacks one of them.
+        Called by RowConverter.iter_item_dicts() """
+    index_by_name: dict = { spec.name: i for (i, spec) in enumerate(field_schema) }
+    missing: list = [ name for name in row_filter.needed_fields() if name not in index_by_name ]
+    if missing:
+        msg = f'row-filter fields not in export, ``{missing}``'
+        log.error( msg )
+        raise Exception( msg )
+    return [ (index_by_name[name], name) for name in row_filter.needed_fields() ]
+
+
+def convert_fm_date_format( fm_date_format: str ) -> str:
+    """ Converts a filemaker DATEFORMAT (eg 'M/d/yyyy') to a strptime-format (eg '%m/%d/%Y').
+        strptime accepts non-zero-padded values for %m and %d, so 'M' and 'MM' map to the same directive.
+        Called by make_field_schema() """
+    directives = { 'yyyy': '%Y', 'yy': '%y', 'MM': '%m', 'M': '%m', 'dd': '%d', 'd': '%d' }
+    return re.sub( r'yyyy|yy|MM|M|dd|d', lambda m: directives[m.group(0)], fm_date_format )
+
+
+class RowConverter:
+    """ Streams an export's <ROW> elements as item-dicts, per the export's own field schema. """
+
+    def __init__( self ):
+        self.expected_column_count = 24  # as of 2023-11-10 export 
+        self.field_schema = []  # list of FieldSpec objects; set by iter_item_dicts() once the METADATA block is read
+        self.text_normalizer = TextNormalizer()  # any object with a `normalize(text) -> str` method; see text_normalizer.py
+        self.fields = None  # optional list of field-names to keep; the other columns' DATA is never read (row_MODID and row_RECORDID are always kept)
+        self.row_filter = None  # optional row_filters.RowFilter (or any object with `needed_fields()` and `matches(values)`); rows failing it are skipped before their item-dict is built
+
+    def iter_item_dicts( self, FMPRO_XML_PATH, skip_rows=0 ):
+        ''' Yields an item-dict for each <ROW>, streaming the xml so only one row is held in memory at a time.
+            The field schema is built (and saved to self.field_schema) from the METADATA block, which precedes the rows.
+            The first `skip_rows` rows are parsed past without being converted (for a resumed chunked conversion).
+            With self.fields set, only those fields' columns are read (see project_field_schema()).
+            With self.row_filter set, rows failing it are skipped after reading just the filter's columns (see row_filters.py).
+            Called by SourceDictMaker's conversions, and by records.iter_xml_records(); also by run_pipeline.py, which fans the stream out to several consumers. '''
+        fm_date_format = None
+        field_attribs = []
+        field_schema = []
+        progress = None
+        filter_columns = []  # ( column-index, field-name ) for each field the row-filter reads
+        filtered_out_count = 0
+        context = iterparse( FMPRO_XML_PATH, events=('start', 'end'), tag=(DATABASE_TAG, FIELD_TAG, METADATA_TAG, RESULTSET_TAG, ROW_TAG) )  # decompresses a .gz/.bz2/.xz export as it streams
+        for event, elem in context:
+            if event == 'start':
+                if elem.tag == RESULTSET_TAG:  # FOUND is the row-count; known before the rows are read, so progress can show an eta
+                    progress = ProgressReporter( 'processing rows', total=int(elem.get('FOUND', 0)) or None, logger=log )
+                continue
+            if elem.tag == ROW_TAG:
+                if progress.count < skip_rows:  # already converted; skips the costly column-walk
+                    clear_element( elem )
+                    progress.update()
+                    continue
+                if filter_columns and not self._row_passes_filter( elem, filter_columns ):  # skipped before any dict is built
+                    filtered_out_count += 1
+                    clear_element( elem )
+                    progress.update()
+                    continue
+                item_dict = self._process_row( elem, field_schema )
+                if progress.count == skip_rows and log.isEnabledFor( logging.DEBUG ):  # formatting the sample is not free; skip it unless it'll be shown
+                    log.debug( f'first item_dict, ``{pprint.pformat(item_dict)}``' )
+                clear_element( elem )
+                progress.update()
+                yield item_dict
+            elif elem.tag == FIELD_TAG:
+                field_attribs.append( dict(elem.attrib) )
+            elif elem.tag == DATABASE_TAG:
+                fm_date_format = elem.get( 'DATEFORMAT' )
+            elif elem.tag == METADATA_TAG:
+                self.field_schema = make_field_schema( field_attribs, fm_date_format )
+                field_schema = project_field_schema( self.field_schema, self.fields )
+                log.debug( 'field_schema, ``%s``', field_schema )
+                if self.row_filter is not None:
+                    filter_columns = make_filter_columns( self.field_schema, self.row_filter )
+        if progress:
+            progress.finish()
+        if self.row_filter is not None:
+            log.info( f'row-filter ``{self.row_filter}`` skipped ``{filtered_out_count}`` rows' )
+        if hasattr( self.text_normalizer, 'stats' ):
+            log.info( f'text-normalizer stats, ``{self.text_normalizer.stats()}``' )
+
+    def _row_passes_filter( self, row, filter_columns ):
+        ''' Returns True if the <ROW> passes self.row_filter, reading only the first DATA element of each filter-column.
+            Called by iter_item_dicts() '''
+        values = {}
+        for ( i, name ) in filter_columns:
+            column = row[i]  # the row's COL elements are its children, in field order
+            text = column[0].text if len( column ) else None
+            values[name] = self.text_normalizer.normalize( text ) if text else None
+        return self.row_filter.matches( values )  # type: ignore
+
+    def _process_row( self, row, field_schema ):
+        ''' Returns the item dictionary for one <ROW> element.
+            Calls _make_data_dict() helper. '''
+        ## pull out the <ROW MODID and RECORDID attributes
+        row_MODID = row.attrib['MODID']
+        row_RECORDID = row.attrib['RECORDID']
+        ## get columns (fixed number of columns per row)
+        columns = row.findall( COL_TAG )  # a direct child-lookup on the precompiled tag; an xpath() call per row cost more than the rest of the row's conversion
+        if len(columns) != self.expected_column_count:  # not an assert, so the check survives `python -O`
+            msg = f'row RECORDID ``{row_RECORDID}`` has ``{len(columns)}`` columns; expected ``{self.expected_column_count}``'
+            log.error( msg )
+            raise Exception( msg )
+        ## get data_elements (variable number per column)
+        item_dict = self._makeDataDict( columns, field_schema, row_MODID, row_RECORDID )
+        return item_dict
+
+    def _makeDataDict( self, columns, field_schema, row_MODID: str, row_RECORDID: str ):
+        ''' Returns info-dict for a single item; eg { 'artist_first_name': 'andy', 'artist_last_name': 'warhol' }
+            List-fields (per the schema) always get a list -- [None] for an empty column; other fields get a value or None.
+            Columns whose schema-entry is None (projected away) are skipped, without reading their DATA elements.
+            Called by: _process_row()
+            Calls: self.__run_asserts(), self.__handle_single_element(), self.__handle_multiple_elements() '''
+        self.__run_asserts( columns, field_schema )
+        ## setup ----------------------------------------------------
+        d_dict = { 'row_MODID': row_MODID, 'row_RECORDID': row_RECORDID }  
+        for i,column in enumerate(columns):
+            field_spec = field_schema[i]
+            if field_spec is None:
+                continue
+            data = column.findall( DATA_TAG )  # type(data) always a list, but of an empty, a single or multiple elements?
+            if len(data) == 0:    # eg <COL(for artist-firstname)></COL>
+                d_dict[ field_spec.name ] = [ None ] if field_spec.is_list else None  # type: ignore
+            elif len(data) == 1 and not field_spec.is_list:  # eg <COL(for artist-firstname)><DATA>'artist_firstname'</DATA></COL>
+                d_dict[ field_spec.name ] = self.__handle_single_element( data, field_spec )  # type: ignore
+            else:                 # eg <COL(for artist-firstname)><DATA>'artist_a_firstname'</DATA><DATA>'artist_b_firstname'</DATA></COL>
+                if not field_spec.is_list:
+                    log.warning( f'scalar field ``{field_spec.name}`` has ``{len(data)}`` values in row RECORDID ``{row_RECORDID}``; keeping them as a list' )
+                d_dict[ field_spec.name ] = self.__handle_multiple_elements( data, field_spec )  # type: ignore
+        # log.debug( f'd_dict, ``{pprint.pformat(d_dict)}``' )
+        return d_dict
+
+    def __run_asserts( self, columns, field_schema ):
+        ''' Documents the inputs.
+            Called by _makeDataDict() '''
+        assert type(columns) == list, type(columns)
+        assert type(columns[0]) == etree._Element, type(columns[0])  # type: ignore
+        assert type(field_schema) == list, type(field_schema)
+        return
+
+    def __handle_single_element( self, data, field_spec ):
+        ''' Stores either None or the single normalized, native value to the key.
+            Called by _makeDataDict() '''
+        return_val = None
+        if data[0].text:
+            return_val = field_spec.convert( self.text_normalizer.normalize(data[0].text) )
+        return return_val
+
+    def __handle_multiple_elements( self, data, field_spec ):
+        ''' Stores list of normalized, native values to the key.
+            Called by _makeDataDict() '''
+        normalize = self.text_normalizer.normalize
+        d_list = []
+        for data_element in data:
+            if data_element.text:
+                d_list.append( field_spec.convert(normalize(data_element.text)) )
+            else:
+                d_list.append( None )
+        return d_list
+
+    def _make_duplicate_key( self, rec_num: str, rec_num_dict: dict ) -> str:
+        ''' Returns the first unused `RECORDID___n` key, n counting up from 2, so repeated runs produce the same keys.
+            Called by SourceDictMaker._dictify_data(), and by records.iter_xml_records() '''
+        n = 2
+        while f'{rec_num}___{n}' in rec_num_dict:
+            n += 1
+        return f'{rec_num}___{n}'
+
+    ## end class RowConverter()
@@ -0,0 +1,40 @@
+"""
+Parsing primitives for filemaker-pro FMPXMLRESULT exports: the namespace and tag-names, a streaming iterparse, and element-clearing.
+
+lxml is imported on first parse, not at import, so code needing only the constants (or nothing xml at all) starts fast.
+
+Usage:
+    from hh_xml.fm_xml import FIELD_TAG, ROW_TAG, clear_element, iterparse
+    for _event, elem in iterparse( '/path/to/source.xml.gz', tag=(FIELD_TAG, ROW_TAG) ):
+        ...
+        clear_element( elem )
+"""
+
+from hh_xml.compressed_io import open_input
+
+
+NAMESPACE: str = 'http://www.filemaker.com/fmpxmlresult'
+NAMESPACES: dict = { 'fmp': NAMESPACE }  # prefix-map, for find()/findall()/xpath()
+DATABASE_TAG: str = f'{{{NAMESPACE}}}DATABASE'
+FIELD_TAG: str = f'{{{NAMESPACE}}}FIELD'
+METADATA_TAG: str = f'{{{NAMESPACE}}}METADATA'
+RESULTSET_TAG: str = f'{{{NAMESPACE}}}RESULTSET'
+ROW_TAG: str = f'{{{NAMESPACE}}}ROW'
+COL_TAG: str = f'{{{NAMESPACE}}}COL'
+DATA_TAG: str = f'{{{NAMESPACE}}}DATA'
+
+
+def iterparse( path: str, events: tuple = ('end',), tag=None ):
+    """ Yields lxml iterparse ( event, element ) pairs from an export, decompressing a .gz/.bz2/.xz file as it streams.
+        The file is closed when the generator finishes, or is closed early. """
+    from lxml import etree
+    with open_input( path ) as source_file:
+        yield from etree.iterparse( source_file, events=events, tag=tag )
+
+
+def clear_element( elem ) -> None:
+    """ Frees an already-processed element, and its already-processed previous siblings, so iterparse memory stays flat. """
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+    return
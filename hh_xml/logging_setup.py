@@ -0,0 +1,36 @@
+"""
+The one logging configuration every script uses -- applied by each script's dundermain (or the `hh_xml` cli), never at import.
+
+Importing a script's module (eg from a test, or the cli) therefore leaves logging as the importer set it.
+
+Usage:
+    from hh_xml.logging_setup import configure_logging
+    configure_logging()  # level from the LOGLEVEL env-var; default DEBUG
+"""
+
+import logging, os
+from typing import Optional
+
+
+LEVELS: dict = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR }
+DEFAULT_LEVEL: str = 'DEBUG'
+LOG_FORMAT: str = '[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s'
+DATE_FORMAT: str = '%d/%b/%Y %H:%M:%S'
+
+
+def configure_logging( level: Optional[str] = None ) -> None:
+    """ Configures the root logger, at `level`, else the LOGLEVEL env-var's level, else DEBUG.
+        Level-names are case-insensitive; an unrecognized one falls back to DEBUG, with a warning naming the accepted values.
+        A no-op if logging is already configured (as logging.basicConfig() is). """
+    lglvl: str = ( level or os.environ.get('LOGLEVEL') or DEFAULT_LEVEL ).strip().upper()
+    logging.basicConfig(
+        level=LEVELS.get( lglvl, LEVELS[DEFAULT_LEVEL] ),  # assigns the level-object to the level-key
+        format=LOG_FORMAT,
+        datefmt=DATE_FORMAT )
+    if lglvl not in LEVELS:
+        logging.getLogger( __name__ ).warning( f'unrecognized log-level ``{lglvl}``; using ``{DEFAULT_LEVEL}`` (expected one of ``{", ".join(LEVELS)}``)' )
+    return
@@ -0,0 +1,65 @@
+"""
+Rate-limited progress logging for long-running loops.
+
+Replaces the old `if i % 1000 == 0: log.debug(...)` lines. Emits at most one log-line per `interval_seconds`, showing rows-per-second and, when the total is known, an ETA.
+
+Usage:
+    progress = ProgressReporter( 'processing rows', total=len(rows) )
+    for row in rows:
+        ...
+        progress.update()
+    progress.finish()
+"""
+
+import logging, time
+from typing import Callable, Optional
+
+
+log = logging.getLogger( __name__ )
+
+
+class ProgressReporter:
+    """ Tracks a count and logs throughput at a fixed maximum rate. """
+
+    def __init__( self, label: str, total: Optional[int] = None, interval_seconds: float = 5.0, level: int = logging.INFO, logger: Optional[logging.Logger] = None, clock: Callable[[], float] = time.monotonic ):
+        self.label = label
+        self.total = total
+        self.interval_seconds = interval_seconds
+        self.level = level
+        self.log = logger if logger else log
+        self.clock = clock  # injectable, for testing the interval logic
+        self.enabled: bool = self.log.isEnabledFor( level )  # checked once, so disabled reporters cost almost nothing per row
+        self.count: int = 0
+        self.start_time: float = clock()
+        self.next_report_time: float = self.start_time + interval_seconds
+
+    def update( self, n: int = 1 ) -> None:
+        """ Adds `n` to the count; logs if the interval has passed.
+            Called once per row (or per batch) by the loop being tracked. """
+        self.count += n
+        if not self.enabled:
+            return
+        now = self.clock()
+        if now >= self.next_report_time:
+            self.next_report_time = now + self.interval_seconds
+            self.log.log( self.level, self._make_message(now), stacklevel=2 )  # stacklevel so the log-line shows the caller's module/function
+        return
+
+    def finish( self ) -> None:
+        """ Logs the final count and overall rate. """
+        if self.enabled:
+            self.log.log( self.level, f'{self._make_message(self.clock())}; done', stacklevel=2 )
+        return
+
+    def _make_message( self, now: float ) -> str:
+        """ Builds the `label: count/total rows; rate; eta` message.
+            Called by update() and finish() """
+        elapsed = max( now - self.start_time, 1e-9 )
+        rate = self.count / elapsed
+        if self.total:
+            pct = 100.0 * self.count / self.total
+            remaining = ( self.total - self.count ) / rate if rate > 0 else 0.0
+            return f'{self.label}: {self.count}/{self.total} ({pct:.1f}%); {rate:,.0f} rows/s; eta {remaining:.1f}s'
+        return f'{self.label}: {self.count}; {rate:,.0f} rows/s; elapsed {elapsed:.1f}s'
+
+    ## end class ProgressReporter()
@@ -0,0 +1,71 @@
+"""
+Record-stream primitives: format-detection, and `( items-dict-key, item )` streams from any of the project's data files.
+
+Formats (detected from the first bytes, after any decompression -- see `compressed_io.py`):
+- `xml`: a raw filemaker-pro export; converted row by row (lxml is imported only for this format).
+- `snapshot`: the converter's binary (pickle) snapshot; loaded whole.
+- `json`: the converter's json output; read through its lazy, index-backed view, one item at a time.
+Keys are the converter's items-dict-keys (`RECORDID`, then `RECORDID___n` for repeats), whatever the format.
+
+Usage:
+    from hh_xml.records import detect_format, iter_records
+    for ( key, item ) in iter_records( '/path/to/source.xml.gz' ):
+        ...
+"""
+
+import logging
+
+from hh_xml.compressed_io import open_input
+from hh_xml.converted_data import PICKLE_MAGIC
+
+
+log = logging.getLogger( __name__ )
+
+
+XML_FORMAT: str = 'xml'
+SNAPSHOT_FORMAT: str = 'snapshot'
+JSON_FORMAT: str = 'json'
+SNIFF_LENGTH: int = 64
+
+
+def detect_format( path: str ) -> str:
+    """ Returns XML_FORMAT, SNAPSHOT_FORMAT, or JSON_FORMAT for a (optionally compressed) data file. """
+    with open_input( path ) as f:
+        start: bytes = f.read( SNIFF_LENGTH )
+    if start.startswith( PICKLE_MAGIC ):
+        return SNAPSHOT_FORMAT
+    if start.lstrip( b'\xef\xbb\xbf \t\r\n' ).startswith( b'<' ):  # skips any utf-8 BOM, and whitespace
+        return XML_FORMAT
+    return JSON_FORMAT
+
+
+def iter_records( path: str ):
+    """ Yields ( items-dict-key, item ) for every item of an xml export, snapshot, or converted json, in file order. """
+    data_format: str = detect_format( path )
+    if data_format == XML_FORMAT:
+        from hh_xml.fm_rows import RowConverter  # imported here; it loads lxml
+        yield from iter_xml_records( path, RowConverter() )
+    elif data_format == SNAPSHOT_FORMAT:
+        from hh_xml.converted_data import load_items
+        yield from load_items( path ).items()
+    else:
+        from hh_xml.converted_data import open_lazy_items
+        items = open_lazy_items( path )
+        try:
+            yield from items.items()
+        finally:
+            items.close()
+
+
+def iter_xml_records( xml_path: str, maker ):
+    """ Yields ( items-dict-key, item ) from `maker.iter_item_dicts()` (a `fm_rows.RowConverter`) -- so with maker's field-projection and row-filter, if set -- keyed as the converter keys them.
+        Rows with an empty RECORDID are skipped, as the converter skips them. """
+    seen_keys: set = set()
+    for item in maker.iter_item_dicts( xml_path ):
+        if not item['row_RECORDID']:
+            continue
+        key: str = item['row_RECORDID'].strip()
+        if key in seen_keys:
+            key = maker._make_duplicate_key( key, seen_keys )
+        seen_keys.add( key )
+        yield ( key, item )
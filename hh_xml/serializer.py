@@ -0,0 +1,115 @@
+"""
+The json encode/decode layer every script uses, so the fastest available backend is picked in one place.
+
+Backends:
+- `orjson` (if installed): several times faster than the stdlib at both encoding and decoding.
+- `stdlib`: the `json` module with compact `separators` and no `sort_keys` -- the fallback, and still much faster to write than the converter's old `indent=2, sort_keys=True` output.
+The `JSON_BACKEND` env-var (`orjson` or `stdlib`) overrides the choice.
+
+Modes, for `dumps()`:
+- default: compact, keys in insertion order.
+- `pretty=True`: indented, keys in insertion order; for small, human-edited files (eg the validator's schema).
+- `canonical=True`: byte-for-byte today's converter output (stdlib, `indent=2, sort_keys=True`, ascii-escaped), whatever the backend; for diffing against older files.
+Every mode decodes the same, with `loads()`.
+
+`dump_to_path()` compresses when the path ends in `.gz`/`.bz2`/`.xz`, and `load_from_path()` decompresses any such file (see `compressed_io.py`).
+
+`bench_serializer.py` reports encode/decode MB/s for each backend and mode.
+
+Usage:
+    from hh_xml.serializer import dumps, loads
+    data_bytes: bytes = dumps( data )
+    data = loads( data_bytes )
+"""
+
+import json, logging, os
+from typing import Optional
+
+from hh_xml.compressed_io import open_input, open_output
+
+
+log = logging.getLogger( __name__ )
+
+
+class StdlibBackend:
+    """ The stdlib `json` module; always available. """
+
+    name = 'stdlib'
+
+    def dumps( self, data, pretty: bool = False ) -> bytes:
+        if pretty:
+            return json.dumps( data, indent=2, ensure_ascii=False ).encode( 'utf-8' )
+        return json.dumps( data, separators=(',', ':'), ensure_ascii=False ).encode( 'utf-8' )
+
+    def loads( self, data ):
+        return json.loads( data )
+
+    ## end class StdlibBackend()
+
+
+class OrjsonBackend:
+    """ `orjson`; non-str dict keys (eg the int Record IDs of duplicate-groups) are stringified, as the stdlib does.
+        Falls back to the stdlib for the rare value it can't encode (an int beyond 64 bits, from a NUMBER field). """
+
+    name = 'orjson'
+
+    def __init__( self, orjson_module ):
+        self.orjson = orjson_module
+        self.fallback = StdlibBackend()
+        self.options: int = orjson_module.OPT_NON_STR_KEYS
+
+    def dumps( self, data, pretty: bool = False ) -> bytes:
+        try:
+            return self.orjson.dumps( data, option=self.options | (self.orjson.OPT_INDENT_2 if pretty else 0) )
+        except self.orjson.JSONEncodeError as e:
+            log.warning( f'orjson could not encode (``{e}``); using the (slower) stdlib for this whole dump' )
+            return self.fallback.dumps( data, pretty )
+
+    def loads( self, data ):
+        return self.orjson.loads( data )
+
+    ## end class OrjsonBackend()
+
+
+def select_backend( name: str = None ):
+    """ Returns the named backend; or, with no name (and no JSON_BACKEND env-var), the fastest installed one.
+        Called at import, to set BACKEND. """
+    name = name or os.environ.get( 'JSON_BACKEND' )
+    if name in ( None, 'orjson' ):
+        try:
+            import orjson
+            return OrjsonBackend( orjson )
+        except ImportError:
+            if name == 'orjson':
+                raise
+    elif name != 'stdlib':
+        raise Exception( f'unknown JSON_BACKEND ``{name}``; expected ``orjson`` or ``stdlib``' )
+    return StdlibBackend()
+
+
+BACKEND = select_backend()
+
+
+def dumps( data, canonical: bool = False, pretty: bool = False ) -> bytes:
+    """ Returns the utf-8 json bytes for `data`; see the module docstring for the modes. """
+    if canonical:
+        return json.dumps( data, indent=2, sort_keys=True ).encode( 'utf-8' )
+    return BACKEND.dumps( data, pretty )
+
+
+def loads( data ):
+    """ Returns the data decoded from json bytes or str. """
+    return BACKEND.loads( data )
+
+
+def dump_to_path( data, path: str, canonical: bool = False, pretty: bool = False, level: Optional[int] = None ) -> None:
+    """ Writes `data` as json to `path`; compressed, at `level`, for a compression-extension. """
+    with open_output( path, level=level ) as f:
+        f.write( dumps(data, canonical, pretty) )
+    return
+
+
+def load_from_path( path: str ):
+    """ Returns the data decoded from the (optionally compressed) json file at `path`. """
+    with open_input( path ) as f:
+        return loads( f.read() )
@@ -0,0 +1,78 @@
+"""
+Normalizes the converter's DATA text values.
+
+Default steps, in order:
+- `convert_line_separators()`: filemaker stores in-field line-breaks as vertical-tabs (and some values carry `\\r\\n` or `\\r`); all become `\\n`.
+- `normalize_unicode()`: NFC, so eg an `é` typed as `e` + combining-accent matches a precomposed `é`.
+- `collapse_whitespace()`: runs of spaces/tabs become one space; lines are stripped; the value is stripped.
+
+Values repeat heavily across c.4M DATA elements (org-names, box-numbers, record-types), so `TextNormalizer` memoizes the whole step-chain in an LRU cache, and reports its hit-rate.
+
+Usage:
+    normalizer = TextNormalizer()  # or TextNormalizer( steps=[...], cache_size=... )
+    value: str = normalizer.normalize( raw_text )
+    log.info( normalizer.stats() )
+"""
+
+import functools, re, unicodedata
+
+
+DEFAULT_CACHE_SIZE: int = 262144
+LINE_SEPARATOR_RE = re.compile( r'\r\n|[\r\x0b]' )
+HORIZONTAL_WHITESPACE_RE = re.compile( r'[^\S\n]+' )
+
+
+def convert_line_separators( text: str ) -> str:
+    """ Converts filemaker's vertical-tab line-separators (and \\r\\n, \\r) to \\n. """
+    if '\r' not in text and '\x0b' not in text:  # the common case; two substring-scans beat a regex-sub
+        return text
+    return LINE_SEPARATOR_RE.sub( '\n', text )
+
+
+def normalize_unicode( text: str ) -> str:
+    """ Returns the NFC form; ascii text, and already-NFC text, are returned as-is. """
+    if text.isascii() or unicodedata.is_normalized( 'NFC', text ):
+        return text
+    return unicodedata.normalize( 'NFC', text )
+
+
+def collapse_whitespace( text: str ) -> str:
+    """ Collapses runs of non-newline whitespace to one space, and strips each line and the whole value. """
+    if '\n' not in text:
+        return HORIZONTAL_WHITESPACE_RE.sub( ' ', text ).strip()
+    return '\n'.join( HORIZONTAL_WHITESPACE_RE.sub(' ', line).strip() for line in text.split('\n') ).strip()
+
+
+DEFAULT_STEPS: tuple = ( convert_line_separators, normalize_unicode, collapse_whitespace )
+
+
+class TextNormalizer:
+    """ Applies the normalization steps to a value, memoized per distinct value. """
+
+    def __init__( self, steps: tuple = DEFAULT_STEPS, cache_size: int = DEFAULT_CACHE_SIZE ):
+        self.steps = tuple( steps )
+        self.changed_count: int = 0  # distinct values the steps altered (beyond outer whitespace)
+        self.normalize = functools.lru_cache( maxsize=cache_size )( self.normalize_uncached )
+
+    def normalize_uncached( self, text: str ) -> str:
+        """ Runs the steps; called by the cached `normalize()` only on a cache-miss. """
+        value = text
+        for step in self.steps:
+            value = step( value )
+        if value != text.strip():
+            self.changed_count += 1
+        return value
+
+    def stats( self ) -> dict:
+        """ Returns the cache counters, for logging. """
+        info = self.normalize.cache_info()
+        lookups: int = info.hits + info.misses
+        return {
+            'lookups': lookups,
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round( info.hits / lookups, 4 ) if lookups else 0.0,
+            'cached_values': info.currsize,
+            'changed_values': self.changed_count }
+
+    ## end class TextNormalizer()
@@ -0,0 +1,157 @@
+"""
+Links page-scans to items: hash-joins a scan-manifest against the converted items.
+
+There are c.800K scans for c.177K items (see `unique_orgs.py` notes), so nested-loop matching is out.
+Instead, hash-tables of the items' join-keys are built once, from the items streamed one at a time (only the join-keys are kept, not the items), and the manifest is streamed through them row-by-row.
+
+Manifest format: a tsv (or, by `.csv` extension, a csv) file with a header-row, and columns:
+- `scan_id` -- required; the scan's path or identifier.
+- `barcode`, `box_number`, `organization_id` -- optional; a row needs a `barcode` or an `organization_id` to match.
+
+Each manifest row is matched on the most specific key it has:
+1. `barcode` -- against the items' `Barcode 1`, `Barcode 2` and `Barcode 3`.
+2. `organization_id` + `box_number` -- against `Organization ID` + `Box Number`.
+3. `organization_id` alone (no `box_number` given) -- against `Organization ID`.
+A `box_number` without an `organization_id` is reported unmatched: box numbers are only unique within an org, so it would link the scan to every org's box of that number.
+A scan matching several items is listed for each of them.
+
+Outputs:
+- `--output_path`: json of `{'__meta__': {counts, items_without_scans}, 'pages': {items-dict-key: [scan_id, ...]}}`; scans keep manifest order.
+- `--unmatched_path`: tsv of the manifest rows that matched no item (written as they're found).
+
+Usage:
+(venv) $ python ./join_scan_manifest.py --input_path "/path/to/output.json" --manifest_path "/path/to/scans.tsv" --output_path "/path/to/pages.json" --unmatched_path "/path/to/unmatched.tsv"
+"""
+
+import argparse, csv, datetime, logging
+
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.records import iter_records
+from hh_xml.serializer import dump_to_path
+
+
+log = logging.getLogger( __name__ )
+
+
+BARCODE_FIELDS: tuple = ( 'Barcode 1', 'Barcode 2', 'Barcode 3' )
+
+
+## manager function -------------------------------------------------
+def join_scan_manifest( input_path: str, manifest_path: str, output_path: str, unmatched_path: str ) -> dict:
+    """ Builds the join hash-tables, streams the manifest through them, and writes the page-lists and unmatched-report.
+        Returns the summary counts.
+        Called by dundermain. """
+    ## build hash-tables once ---------------------------------------
+    ( tables, all_item_keys ) = build_join_tables( iter_records(input_path) )
+    ## stream the manifest ------------------------------------------
+    pages: dict = {}
+    counts: dict = { 'manifest_rows': 0, 'matched_rows': 0, 'unmatched_rows': 0, 'matched_by': {} }
+    delimiter: str = ',' if manifest_path.lower().endswith( '.csv' ) else '\t'
+    with open( manifest_path, 'r', newline='', encoding='utf-8' ) as manifest_file, \
+         open( unmatched_path, 'w', newline='', encoding='utf-8' ) as unmatched_file:
+        reader = csv.DictReader( manifest_file, delimiter=delimiter )
+        if not reader.fieldnames or 'scan_id' not in reader.fieldnames:
+            msg = f'manifest ``{manifest_path}`` has no `scan_id` column; found ``{reader.fieldnames}``'
+            log.error( msg )
+            raise Exception( msg )
+        unmatched_writer = csv.DictWriter( unmatched_file, fieldnames=reader.fieldnames, delimiter='\t' )
+        unmatched_writer.writeheader()
+        progress = ProgressReporter( 'joining manifest rows', logger=log )
+        for manifest_row in reader:
+            counts['manifest_rows'] += 1
+            ( matched_by, item_keys ) = match_manifest_row( manifest_row, tables )
+            if item_keys:
+                counts['matched_rows'] += 1
+                counts['matched_by'][matched_by] = counts['matched_by'].get( matched_by, 0 ) + 1
+                scan_id: str = manifest_row['scan_id']
+                for item_key in item_keys:
+                    pages.setdefault( item_key, [] ).append( scan_id )
+            else:
+                counts['unmatched_rows'] += 1
+                unmatched_writer.writerow( manifest_row )
+            progress.update()
+        progress.finish()
+    ## write page-lists ---------------------------------------------
+    items_without_scans: list = [ key for key in all_item_keys if key not in pages ]
+    counts['items_with_scans'] = len( pages )
+    counts['items_without_scans'] = len( items_without_scans )
+    output = {
+        '__meta__': dict( counts, items_without_scans_list=items_without_scans, timestamp=str(datetime.datetime.now()) ),
+        'pages': pages }
+    dump_to_path( output, output_path )
+    log.info( f'counts, ``{counts}``' )
+    return counts
+
+
+## helper functions START -------------------------------------------
+
+
+def build_join_tables( records ) -> tuple:
+    """ Returns ( the three join hash-tables, each mapping a join-key to the list of items-dict-keys having it; the list of every items-dict-key ).
+        `records` yields ( items-dict-key, item ) pairs; each item is dropped once its join-keys are read.
+        Called by join_scan_manifest() """
+    by_barcode: dict = {}
+    by_org_box: dict = {}
+    by_org: dict = {}
+    all_item_keys: list = []
+    for ( item_key, item ) in records:
+        all_item_keys.append( item_key )
+        for field in BARCODE_FIELDS:
+            barcode = normalize_key( item.get(field) )
+            if barcode:
+                by_barcode.setdefault( barcode, [] ).append( item_key )
+        org_id = normalize_key( item.get('Organization ID') )
+        box = normalize_key( item.get('Box Number') )
+        if org_id:
+            by_org.setdefault( org_id, [] ).append( item_key )
+        if org_id and box:
+            by_org_box.setdefault( (org_id, box), [] ).append( item_key )
+    log.debug( f'join-keys; items, ``{len(all_item_keys)}``; barcodes, ``{len(by_barcode)}``; org-boxes, ``{len(by_org_box)}``; orgs, ``{len(by_org)}``' )
+    return ( {'barcode': by_barcode, 'org_box': by_org_box, 'org': by_org}, all_item_keys )
+
+
+def match_manifest_row( manifest_row: dict, tables: dict ) -> tuple:
+    """ Returns ( matched-by label, list of items-dict-keys ) for the row's most specific matching key; ( None, [] ) if none match.
+        A box_number is only matched together with its organization_id.
+        Called by join_scan_manifest() """
+    barcode = normalize_key( manifest_row.get('barcode') )
+    box = normalize_key( manifest_row.get('box_number') )
+    org_id = normalize_key( manifest_row.get('organization_id') )
+    if barcode and barcode in tables['barcode']:
+        return ( 'barcode', tables['barcode'][barcode] )
+    if org_id and box and (org_id, box) in tables['org_box']:
+        return ( 'org_box', tables['org_box'][(org_id, box)] )
+    if org_id and not box and org_id in tables['org']:
+        return ( 'org', tables['org'][org_id] )
+    return ( None, [] )
+
+
+def normalize_key( value ):
+    """ Returns a stripped string join-key, or None for an empty value.
+        Item values may be numbers (NUMBER fields) or lists (repeating fields); a list uses its first value.
+        Called by build_join_tables() and match_manifest_row() """
+    if type(value) == list:
+        value = value[0] if value else None
+    if value is None:
+        return None
+    value = str( value ).strip()
+    return value if value else None
+
+
+## helper functions END ---------------------------------------------
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Joins a scan-manifest to the converted items.' )
+    parser.add_argument( '--input_path', type=str, help='path to the converted json file (or its binary snapshot, or the raw xml export)' )
+    parser.add_argument( '--manifest_path', type=str, help='path to the scan-manifest tsv/csv file' )
+    parser.add_argument( '--output_path', type=str, help='path to the output page-lists json file' )
+    parser.add_argument( '--unmatched_path', type=str, help='path to the output unmatched-scans tsv file' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    join_scan_manifest( args.input_path, args.manifest_path, args.output_path, args.unmatched_path )
+    log.debug( 'done' )
@@ -4,61 +4,88 @@ Makes a TSV file from a FileMaker Pro jsonized export.
 Notes:
 - Only includes rows where the `Organization ID` value is in the STARTING_ORGS list.
 - the output file will not overwrite previous output files -- because a timestamp is included in the filename.
-- TODO: the output file is hard-coded to go to a '../created_tsv_files/' dir; add an output-path argument.
+- within each org, rows are ordered by box (see `box_numbers.py`): '9', '78B', '213B', 'M-39', 'M-47'.
+- the output file goes to `--output_dir` (default '../created_tsv_files/').
+- `--input_path` may also be the raw xml export: then only the target orgs' rows are converted, during the parse (see `row_filters.py`), with no json step.
 
 Usage:
 (venv) $ python ./make_csv_100.py --input_path "/path/to/file.json"
+(venv) $ python ./make_csv_100.py --input_path "/path/to/file.json" --rollup_path "/path/to/rollups.json"  # decodes only the target orgs' items
+(venv) $ python ./make_csv_100.py --input_path "/path/to/source.xml"  # builds only the target orgs' items
 """
 
-import argparse, csv, datetime, json, logging, os, pprint
+import argparse, csv, datetime, logging, os, pprint
+from typing import Optional
+
+from hh_xml.compressed_io import CODECS, open_output
+from hh_xml.converted_data import load_items, open_lazy_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.records import XML_FORMAT, detect_format
+from org_rollups import load_rollups
+from record_grouping import group_rows_by_key
+from row_filters import RowFilter, load_filtered_xml_items
 
 
-lglvl: str = os.environ.get( 'LOGLEVEL', 'DEBUG' )
-lglvldct = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO }
-logging.basicConfig(
-    level=lglvldct[lglvl],  # assigns the level-object to the level-key
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
 log = logging.getLogger( __name__ )
-log.debug( 'logging working' )
+
+
+DEFAULT_OUTPUT_DIR: str = '../created_tsv_files'
+DEFAULT_SECONDARY_SORT_KEYS: list = [ 'Box Number', 'Box Number 3' ]
 
 
 ## manager function -------------------------------------------------
-def make_csv_from_fmpro_json( input_path: str ) -> None:
+def make_csv_from_fmpro_json( input_path: str, output_dir: str = DEFAULT_OUTPUT_DIR, rollup_path: Optional[str] = None, secondary_sort_key: Optional[list] = DEFAULT_SECONDARY_SORT_KEYS, fields: Optional[list] = None, compression: Optional[str] = None, compress_level: Optional[int] = None ) -> None:
     ## make target orgs-list ----------------------------------------
     # target_orgs: list = STARTING_ORGS.split()
     target_orgs: list = make_starting_orgs_list()
     sorted_target_orgs: list = sorted( target_orgs )
-    ## load json file -----------------------------------------------
-    with open( input_path, 'r' ) as f:
-        source_json_string: str = f.read()
-    ## load up python dict ------------------------------------------
-    data_dct = json.loads( source_json_string )
-    rows_dct: dict = data_dct['items']
-    assert type(rows_dct) == dict
+    ## load json file (or binary snapshot, or raw xml) --------------
+    if detect_format( input_path ) == XML_FORMAT:
+        rows_dct: dict = load_filtered_xml_items( input_path, RowFilter(include_orgs=sorted_target_orgs), make_parse_fields(fields, secondary_sort_key) )  # non-target rows are skipped during the parse; with `fields`, so are the other columns
+    elif rollup_path:
+        rows_dct: dict = load_target_org_items( input_path, rollup_path, sorted_target_orgs )  # only the target orgs' items are decoded
+    else:
+        rows_dct: dict = load_items( input_path )
     ## make list of dicts -------------------------------------------
     rows_list = []
     for ( row_num, row_data ) in rows_dct.items():
         assert type(row_data) == dict
         rows_list.append( row_data )
-    log.debug( f'rows_list[0:10], ``{pprint.pformat(rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'rows_list[0:10], ``{pprint.pformat(rows_list[0:10])}``' )
     ## validate each data-dict --------------------------------------
     validate_no_tabs( rows_list )  # raises exception if tab-character found
     validate_keys_same( rows_list )  # raises exception if keys differ
     validate_organization_id( rows_list )  # raises exception if org-id not found or is a list, or has a length of zero
     ## make subset list ---------------------------------------------
     subset_rows_list: list = make_subset_list( rows_list, sorted_target_orgs )
-    sorted_subset_rows: list = sort_dicts_by_key( subset_rows_list, 'Organization ID' )
+    sorted_subset_rows: list = group_rows_by_key( subset_rows_list, 'Organization ID', secondary_key=secondary_sort_key )  # one bucketing pass; sorts only the org-ids
+    if fields:
+        sorted_subset_rows = project_rows( sorted_subset_rows, fields )  # after grouping, which needs the org-id and sort-keys; also sets the output's column order
     ## make tsv file ------------------------------------------------
-    write_tsv( sorted_subset_rows )
+    write_tsv( sorted_subset_rows, output_dir, compression=compression, compress_level=compress_level )
     return
 
 
 ## helper functions START -------------------------------------------
 
 
+def load_target_org_items( input_path: str, rollup_path: str, sorted_target_orgs: list ) -> dict:
+    """ Returns items-dict of just the target orgs' items, using the org-rollups' record_ids and a lazy view of the json file.
+        Row-level data for other orgs is never decoded.
+        Called by make_csv_from_fmpro_json() """
+    rollup_orgs: dict = load_rollups( rollup_path )['orgs']
+    lazy_items = open_lazy_items( input_path )
+    rows_dct: dict = {}
+    for org_id in sorted_target_orgs:
+        for item_key in rollup_orgs.get( org_id, {} ).get( 'record_ids', [] ):
+            rows_dct[item_key] = lazy_items[item_key]
+    lazy_items.close()
+    log.debug( f'loaded ``{len(rows_dct)}`` of ``{len(lazy_items)}`` items' )
+    return rows_dct
+
+
 def make_starting_orgs_list() -> list:
     """ Makes list of orgs from STARTING_ORGS string.
         Adds '_' after the 'HH' prefix (turns 'HH123456' into 'HH_123456).
@@ -67,9 +94,19 @@ def make_starting_orgs_list() -> list:
     for org_id in STARTING_ORGS.split():
         updated_org_id: str = f'%s_%s' % ( org_id[0:2], org_id[2:] )
         target_orgs.append( updated_org_id )
-    log.debug( f'target_orgs[0:10], ``{pprint.pformat(target_orgs[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'target_orgs[0:10], ``{pprint.pformat(target_orgs[0:10])}``' )
     return target_orgs
 
+def make_parse_fields( fields: Optional[list], secondary_sort_key ) -> Optional[list]:
+    """ Returns the fields an xml-input parse must read: the output `fields`, then the org-id and sort-keys that grouping needs, without repeats.
+        Returns None (read every field) if no `fields` are given.
+        Called by make_csv_from_fmpro_json() """
+    if not fields:
+        return None
+    sort_keys: list = [ secondary_sort_key ] if type(secondary_sort_key) == str else list( secondary_sort_key or [] )
+    return list( dict.fromkeys(list(fields) + ['Organization ID'] + sort_keys) )
+
 
 def validate_no_tabs( rows_list: list ) -> None:
     """ Validates that there are no tab-characters in data.
@@ -98,9 +135,9 @@ def validate_no_tabs( rows_list: list ) -> None:
 
 
 def contains_tab_character( value ) -> bool:
-    """ Checks for tab-character in value, which can be a string or a list. 
+    """ Checks for tab-character in value, which can be a string, a list, or (for NUMBER fields) a number. 
         Called by validate_no_tabs() """
-    assert type(value) in [ str, list ], type(value)
+    assert type(value) in [ str, list, int, float ], type(value)
     if isinstance(value, str) and '\t' in value:
         log.debug( f'tab character found in value, ``{value}``' )
         return True
@@ -158,44 +195,60 @@ def validate_organization_id( rows_list: list ) -> None:
 
 def make_subset_list( rows_list: list, sorted_target_orgs: list ) -> list:
     """ Makes a subset list of dicts -- for those dicts where the `Organization ID` value is in `sorted_target_orgs`.
-        Called by make_csv_from_fmpro_json() """
+        Called by make_csv_from_fmpro_json(), and by run_pipeline.py """
+    target_orgs_set: set = set( sorted_target_orgs )  # set-lookup; the list has ~100 entries and this runs for every row
     subset_rows_list: list = []
     for row_data_dct in rows_list:
         org_id: str = row_data_dct['Organization ID']
-        if org_id in sorted_target_orgs:
+        if org_id in target_orgs_set:
             subset_rows_list.append( row_data_dct )
-    log.debug( f'subset_rows_list[0:10], ``{pprint.pformat(subset_rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'subset_rows_list[0:10], ``{pprint.pformat(subset_rows_list[0:10])}``' )
     return subset_rows_list
 
 
+def project_rows( rows_list: list, fields: list ) -> list:
+    """ Returns new row-dicts holding only `fields`, in that order -- for a narrower tsv.
+        Raises exception if a field isn't in the rows.
+        Called by make_csv_from_fmpro_json() """
+    unknown: list = [ field for field in fields if rows_list and field not in rows_list[0] ]
+    if unknown:
+        msg = f'projected fields not in data, ``{unknown}``'
+        log.error( msg )
+        raise Exception( msg )
+    return [ {field: row[field] for field in fields} for row in rows_list ]
+
+
 def sort_dicts_by_key( rows_list: list, key: str ) -> list:
     """ Sorts a list of dicts by the given key.
-        Called by make_csv_from_fmpro_json() """
+        Superseded by record_grouping.group_rows_by_key(); kept, unchanged, as the baseline for bench_grouping.py """
     sorted_rows_list = sorted( rows_list, key=lambda k: k[key] )
-    log.debug( f'sorted_rows_list[0:10], ``{pprint.pformat(sorted_rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'sorted_rows_list[0:10], ``{pprint.pformat(sorted_rows_list[0:10])}``' )
     return sorted_rows_list
 
 
-def write_tsv( rows_list: list ) -> None:
-    """ Creates a TSV file from a list of dictionaries.
-        Writes to file.
-        Called by make_csv_from_fmpro_json() """
+def write_tsv( rows_list: list, output_dir: str = DEFAULT_OUTPUT_DIR, file_prefix: str = 'output', compression: Optional[str] = None, compress_level: Optional[int] = None ) -> str:
+    """ Creates a TSV file from a list of dictionaries; optionally compressed (`compression` is a compressed_io codec-name).
+        Writes to file; None values are written as empty strings (the row-dicts themselves are left unchanged).
+        Returns the file-path.
+        Called by make_csv_from_fmpro_json(), and by run_pipeline.py """
     ## make path ----------------------------------------------------
     iso_now_time: str = datetime.datetime.now().isoformat()
     iso_now_time = iso_now_time.replace( ':', '-' )
-    file_name: str = f'output_{iso_now_time}.tsv'
-    file_path: str = f'../created_tsv_files/{file_name}'  # TODO -- take an output-path argument
+    file_name: str = f'{file_prefix}_{iso_now_time}.tsv{CODECS[compression][2] if compression else ""}'
+    file_path: str = os.path.join( output_dir, file_name )
     ## make and write file ------------------------------------------
-    with open( file_path, 'w', newline='', encoding='utf-8' ) as file:
+    with open_output( file_path, 'w', level=compress_level, encoding='utf-8', newline='' ) as file:
         writer = csv.DictWriter( file, fieldnames=rows_list[0].keys(), delimiter='\t' )
         writer.writeheader()
+        progress = ProgressReporter( 'writing tsv rows', total=len(rows_list), logger=log )
         for row in rows_list:
-            for key in row:
-                if row[key] is None:
-                    row[key] = ''
-            writer.writerow(row)
+            writer.writerow( {key: ('' if value is None else value) for (key, value) in row.items()} )
+            progress.update()
+        progress.finish()
     log.debug( f'file written to file_path, ``{file_path}``' )
-    return
+    return file_path
 
 
 ## helper functions END ---------------------------------------------
@@ -309,14 +362,21 @@ HH024904
 
 
 if __name__ == '__main__':
+    configure_logging()
     ## set up argparser
     parser = argparse.ArgumentParser(description='Output CSV of given organization-IDs')
-    parser.add_argument('--input_path', type=str, help='Path to big fmpro-export-json-file')
+    parser.add_argument('--input_path', type=str, help='Path to big fmpro-export-json-file (or its binary snapshot, or the raw xml export)')
+    parser.add_argument('--output_dir', type=str, default=DEFAULT_OUTPUT_DIR, help='Directory for the output tsv file')
+    parser.add_argument('--secondary_sort_key', type=str, nargs='*', default=DEFAULT_SECONDARY_SORT_KEYS, help='Fields to sort rows by within each org, in archival box order (default: "Box Number" "Box Number 3"; give no values to keep input order)')
+    parser.add_argument('--rollup_path', type=str, help='Optional org-rollups json (see org_rollups.py); with a json input_path, only the target orgs\' items are decoded')
+    parser.add_argument('--compress', type=str, choices=list(CODECS), help='Optionally compress the output tsv (adds .gz/.bz2/.xz); the input may be compressed too, detected automatically')
+    parser.add_argument('--compress_level', type=int, help='Compression level, with --compress (default: COMPRESS_LEVEL env-var, else the codec default)')
+    parser.add_argument('--fields', type=str, nargs='+', help='Optional fields to output, in this order (default: all); the input may itself be a projected conversion (see convert_fmproxml_to_json.py --fields), as long as it has "Organization ID" and the sort keys. With a raw xml input, the other columns are never read')
     args = parser.parse_args()
     log.debug( f'args: {args}' )
     ## get input path
     input_path = args.input_path if args.input_path else "../created_json_files/hhoag_data_as_of_2023-11-10.json"
     log.debug( f'input_path: {input_path}' )
     ## get to work
-    make_csv_from_fmpro_json( input_path )
+    make_csv_from_fmpro_json( input_path, args.output_dir, args.rollup_path, args.secondary_sort_key, args.fields, args.compress, args.compress_level )
     log.debug( 'done' )
\ No newline at end of file
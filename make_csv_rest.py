@@ -1,58 +1,72 @@
 """
-_WILL_ (currently just a copy of `make_csv_100.py`) a TSV file from a FileMaker Pro jsonized export.
+Makes a TSV file from a FileMaker Pro jsonized export -- the rows _not_ covered by `make_csv_100.py`.
 
 Notes:
-- Will exclude rows where the `Organization ID` value is in the STARTING_ORGS list.
+- Excludes rows where the `Organization ID` value is in the STARTING_ORGS list.
 - the output file will not overwrite previous output files -- because a timestamp is included in the filename.
-- TODO: the output file is hard-coded to go to a '../created_tsv_files/' dir; add an output-path argument.
+- within each org, rows are ordered by box (see `box_numbers.py`): '9', '78B', '213B', 'M-39', 'M-47'.
+- the output file goes to `--output_dir` (default '../created_tsv_files/').
+- `--input_path` may also be the raw xml export: then the STARTING_ORGS rows are skipped during the parse (see `row_filters.py`), with no json step.
+- `--workers N` (N > 1) splits the sorted rows into contiguous chunks; worker processes each format and write their chunks to chunk-files, which are then concatenated, in order, under one header. The tab-check runs over every row first, in the main process, exactly as in the single-process run. The output is byte-identical to the single-process output.
 
 Usage:
 (venv) $ python ./make_csv_rest.py --input_path "/path/to/file.json"
+(venv) $ python ./make_csv_rest.py --input_path "/path/to/file.json" --workers 8
 """
 
-import argparse, csv, datetime, json, logging, os, pprint
+import argparse, csv, datetime, logging, os, pprint, shutil, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from hh_xml.compressed_io import CODECS, open_output
+from hh_xml.converted_data import load_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from hh_xml.records import XML_FORMAT, detect_format
+from record_grouping import group_rows_by_key
+from row_filters import RowFilter, load_filtered_xml_items
 
 
-lglvl: str = os.environ.get( 'LOGLEVEL', 'DEBUG' )
-lglvldct = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO }
-logging.basicConfig(
-    level=lglvldct[lglvl],  # assigns the level-object to the level-key
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
 log = logging.getLogger( __name__ )
-log.debug( 'logging working' )
+
+
+DEFAULT_OUTPUT_DIR: str = '../created_tsv_files'
+DEFAULT_SECONDARY_SORT_KEYS: list = [ 'Box Number', 'Box Number 3' ]
+CHUNKS_PER_WORKER: int = 4  # more chunks than workers, so a slow chunk doesn't leave the other workers idle
 
 
 ## manager function -------------------------------------------------
-def make_csv_from_fmpro_json( input_path: str ) -> None:
+def make_csv_from_fmpro_json( input_path: str, output_dir: str = DEFAULT_OUTPUT_DIR, secondary_sort_key: Optional[list] = DEFAULT_SECONDARY_SORT_KEYS, workers: int = 1, fields: Optional[list] = None, compression: Optional[str] = None, compress_level: Optional[int] = None ) -> None:
     ## make target orgs-list ----------------------------------------
     # target_orgs: list = STARTING_ORGS.split()
     target_orgs: list = make_starting_orgs_list()
     sorted_target_orgs: list = sorted( target_orgs )
-    ## load json file -----------------------------------------------
-    with open( input_path, 'r' ) as f:
-        source_json_string: str = f.read()
-    ## load up python dict ------------------------------------------
-    data_dct = json.loads( source_json_string )
-    rows_dct: dict = data_dct['items']
-    assert type(rows_dct) == dict
+    ## load json file (or binary snapshot, or raw xml) --------------
+    if detect_format( input_path ) == XML_FORMAT:
+        rows_dct: dict = load_filtered_xml_items( input_path, RowFilter(exclude_orgs=sorted_target_orgs), make_parse_fields(fields, secondary_sort_key) )  # target rows are skipped during the parse; with `fields`, so are the other columns
+    else:
+        rows_dct: dict = load_items( input_path )
     ## make list of dicts -------------------------------------------
     rows_list = []
     for ( row_num, row_data ) in rows_dct.items():
         assert type(row_data) == dict
         rows_list.append( row_data )
-    log.debug( f'rows_list[0:10], ``{pprint.pformat(rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'rows_list[0:10], ``{pprint.pformat(rows_list[0:10])}``' )
     ## validate each data-dict --------------------------------------
-    validate_no_tabs( rows_list )  # raises exception if tab-character found
+    validate_no_tabs( rows_list )  # raises exception if tab-character found; every row, before any subsetting or worker fan-out
     validate_keys_same( rows_list )  # raises exception if keys differ
     validate_organization_id( rows_list )  # raises exception if org-id not found or is a list, or has a length of zero
     ## make subset list ---------------------------------------------
     subset_rows_list: list = make_subset_list( rows_list, sorted_target_orgs )
-    sorted_subset_rows: list = sort_dicts_by_key( subset_rows_list, 'Organization ID' )
+    sorted_subset_rows: list = group_rows_by_key( subset_rows_list, 'Organization ID', secondary_key=secondary_sort_key )  # one bucketing pass; sorts only the org-ids
+    if fields:
+        sorted_subset_rows = project_rows( sorted_subset_rows, fields )  # after grouping, which needs the org-id and sort-keys; also sets the output's column order
     ## make tsv file ------------------------------------------------
-    write_tsv( sorted_subset_rows )
+    if workers > 1:
+        write_tsv_parallel( sorted_subset_rows, workers, output_dir, compression=compression, compress_level=compress_level )
+    else:
+        write_tsv( sorted_subset_rows, output_dir, compression=compression, compress_level=compress_level )
     return
 
 
@@ -67,9 +81,19 @@ def make_starting_orgs_list() -> list:
     for org_id in STARTING_ORGS.split():
         updated_org_id: str = f'%s_%s' % ( org_id[0:2], org_id[2:] )
         target_orgs.append( updated_org_id )
-    log.debug( f'target_orgs[0:10], ``{pprint.pformat(target_orgs[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'target_orgs[0:10], ``{pprint.pformat(target_orgs[0:10])}``' )
     return target_orgs
 
+def make_parse_fields( fields: Optional[list], secondary_sort_key ) -> Optional[list]:
+    """ Returns the fields an xml-input parse must read: the output `fields`, then the org-id and sort-keys that grouping needs, without repeats.
+        Returns None (read every field) if no `fields` are given.
+        Called by make_csv_from_fmpro_json() """
+    if not fields:
+        return None
+    sort_keys: list = [ secondary_sort_key ] if type(secondary_sort_key) == str else list( secondary_sort_key or [] )
+    return list( dict.fromkeys(list(fields) + ['Organization ID'] + sort_keys) )
+
 
 def validate_no_tabs( rows_list: list ) -> None:
     """ Validates that there are no tab-characters in data.
@@ -98,9 +122,9 @@ def validate_no_tabs( rows_list: list ) -> None:
 
 
 def contains_tab_character( value ) -> bool:
-    """ Checks for tab-character in value, which can be a string or a list. 
+    """ Checks for tab-character in value, which can be a string, a list, or (for NUMBER fields) a number. 
         Called by validate_no_tabs() """
-    assert type(value) in [ str, list ], type(value)
+    assert type(value) in [ str, list, int, float ], type(value)
     if isinstance(value, str) and '\t' in value:
         log.debug( f'tab character found in value, ``{value}``' )
         return True
@@ -157,47 +181,127 @@ def validate_organization_id( rows_list: list ) -> None:
 
 
 def make_subset_list( rows_list: list, sorted_target_orgs: list ) -> list:
-    """ Makes a subset list of dicts -- for those dicts where the `Organization ID` value is in `sorted_target_orgs`.
-        Called by make_csv_from_fmpro_json() """
+    """ Makes a subset list of dicts -- for those dicts where the `Organization ID` value is _not_ in `sorted_target_orgs`.
+        Called by make_csv_from_fmpro_json(), and by run_pipeline.py """
+    target_orgs_set: set = set( sorted_target_orgs )  # set-lookup; the list has ~100 entries and this runs for every row
     subset_rows_list: list = []
     for row_data_dct in rows_list:
         org_id: str = row_data_dct['Organization ID']
-        if org_id in sorted_target_orgs:
+        if org_id not in target_orgs_set:
             subset_rows_list.append( row_data_dct )
-    log.debug( f'subset_rows_list[0:10], ``{pprint.pformat(subset_rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'subset_rows_list[0:10], ``{pprint.pformat(subset_rows_list[0:10])}``' )
     return subset_rows_list
 
 
+def project_rows( rows_list: list, fields: list ) -> list:
+    """ Returns new row-dicts holding only `fields`, in that order -- for a narrower tsv.
+        Raises exception if a field isn't in the rows.
+        Called by make_csv_from_fmpro_json() """
+    unknown: list = [ field for field in fields if rows_list and field not in rows_list[0] ]
+    if unknown:
+        msg = f'projected fields not in data, ``{unknown}``'
+        log.error( msg )
+        raise Exception( msg )
+    return [ {field: row[field] for field in fields} for row in rows_list ]
+
+
 def sort_dicts_by_key( rows_list: list, key: str ) -> list:
     """ Sorts a list of dicts by the given key.
-        Called by make_csv_from_fmpro_json() """
+        Superseded by record_grouping.group_rows_by_key(); kept, unchanged, as the baseline for bench_grouping.py """
     sorted_rows_list = sorted( rows_list, key=lambda k: k[key] )
-    log.debug( f'sorted_rows_list[0:10], ``{pprint.pformat(sorted_rows_list[0:10])}``' )
+    if log.isEnabledFor( logging.DEBUG ):
+        log.debug( f'sorted_rows_list[0:10], ``{pprint.pformat(sorted_rows_list[0:10])}``' )
     return sorted_rows_list
 
 
-def write_tsv( rows_list: list ) -> None:
-    """ Creates a TSV file from a list of dictionaries.
-        Writes to file.
-        Called by make_csv_from_fmpro_json() """
-    ## make path ----------------------------------------------------
-    iso_now_time: str = datetime.datetime.now().isoformat()
-    iso_now_time = iso_now_time.replace( ':', '-' )
-    file_name: str = f'output_{iso_now_time}.tsv'
-    file_path: str = f'../created_tsv_files/{file_name}'  # TODO -- take an output-path argument
-    ## make and write file ------------------------------------------
-    with open( file_path, 'w', newline='', encoding='utf-8' ) as file:
+def write_tsv( rows_list: list, output_dir: str = DEFAULT_OUTPUT_DIR, file_prefix: str = 'output', compression: Optional[str] = None, compress_level: Optional[int] = None ) -> str:
+    """ Creates a TSV file from a list of dictionaries; optionally compressed (`compression` is a compressed_io codec-name).
+        Writes to file; None values are written as empty strings (the row-dicts themselves are left unchanged).
+        Returns the file-path.
+        Called by make_csv_from_fmpro_json(), and by run_pipeline.py """
+    file_path: str = make_tsv_path( output_dir, file_prefix, compression )
+    with open_output( file_path, 'w', level=compress_level, encoding='utf-8', newline='' ) as file:
         writer = csv.DictWriter( file, fieldnames=rows_list[0].keys(), delimiter='\t' )
         writer.writeheader()
+        progress = ProgressReporter( 'writing tsv rows', total=len(rows_list), logger=log )
         for row in rows_list:
-            for key in row:
-                if row[key] is None:
-                    row[key] = ''
-            writer.writerow(row)
+            writer.writerow( {key: ('' if value is None else value) for (key, value) in row.items()} )
+            progress.update()
+        progress.finish()
     log.debug( f'file written to file_path, ``{file_path}``' )
+    return file_path
+
+
+def make_tsv_path( output_dir: str, file_prefix: str, compression: Optional[str] = None ) -> str:
+    """ Returns a timestamped output path, so previous output files aren't overwritten; with the codec's extension, if compressing.
+        Called by write_tsv() and write_tsv_parallel() """
+    iso_now_time: str = datetime.datetime.now().isoformat()
+    iso_now_time = iso_now_time.replace( ':', '-' )
+    file_name: str = f'{file_prefix}_{iso_now_time}.tsv{CODECS[compression][2] if compression else ""}'
+    return os.path.join( output_dir, file_name )
+
+
+## parallel tsv-writing ---------------------------------------------
+
+
+_worker_rows: list = []  # set in each worker by init_chunk_worker()
+_worker_fieldnames: list = []
+
+
+def write_tsv_parallel( rows_list: list, workers: int, output_dir: str = DEFAULT_OUTPUT_DIR, file_prefix: str = 'output', compression: Optional[str] = None, compress_level: Optional[int] = None ) -> str:
+    """ Like write_tsv(), but formats contiguous chunks of rows in `workers` processes, then concatenates the chunk-files in order under one header.
+        Rows reach the workers via the pool-initializer: under the (linux-default) fork start-method they're inherited, not pickled.
+        With `compression`, each worker compresses its own chunk; gzip, bzip2, and xz all read a concatenation of compressed streams as one stream.
+        Returns the file-path.
+        Called by make_csv_from_fmpro_json() """
+    file_path: str = make_tsv_path( output_dir, file_prefix, compression )
+    fieldnames: list = list( rows_list[0].keys() )
+    chunk_extension: str = CODECS[compression][2] if compression else ''
+    chunk_count: int = min( len(rows_list), workers * CHUNKS_PER_WORKER )
+    bounds: list = [ (len(rows_list) * i // chunk_count) for i in range( chunk_count + 1 ) ]
+    with tempfile.TemporaryDirectory( dir=output_dir ) as chunk_dir:  # same filesystem as the output, for cheap concatenation
+        chunk_args: list = [ (bounds[i], bounds[i + 1], os.path.join(chunk_dir, f'chunk_{i:05d}.tsv{chunk_extension}'), compress_level) for i in range( chunk_count ) ]
+        with open_output( file_path, 'w', level=compress_level, encoding='utf-8', newline='' ) as file:
+            csv.DictWriter( file, fieldnames=fieldnames, delimiter='\t' ).writeheader()
+        progress = ProgressReporter( 'writing tsv rows', total=len(rows_list), logger=log )
+        try:
+            with ProcessPoolExecutor( max_workers=workers, initializer=init_chunk_worker, initargs=(rows_list, fieldnames) ) as executor, open( file_path, 'ab' ) as output_file:
+                for ( chunk_path, row_count ) in executor.map( write_tsv_chunk, chunk_args ):  # results arrive in chunk order
+                    with open( chunk_path, 'rb' ) as chunk_file:
+                        shutil.copyfileobj( chunk_file, output_file, 1024 * 1024 )
+                    os.remove( chunk_path )
+                    progress.update( row_count )
+        except Exception:
+            os.remove( file_path )  # don't leave a partial tsv behind
+            raise
+        progress.finish()
+    log.debug( f'file written to file_path, ``{file_path}``; ``{chunk_count}`` chunks, ``{workers}`` workers' )
+    return file_path
+
+
+def init_chunk_worker( rows_list: list, fieldnames: list ) -> None:
+    """ Stores the rows and header-fields in the worker process.
+        Called once per worker, by the ProcessPoolExecutor in write_tsv_parallel() """
+    global _worker_rows, _worker_fieldnames
+    _worker_rows = rows_list
+    _worker_fieldnames = fieldnames
     return
 
 
+def write_tsv_chunk( chunk_args: tuple ) -> tuple:
+    """ Writes (without a header) the rows `_worker_rows[start:stop]` to `chunk_path`.
+        Returns ( chunk_path, row-count ).
+        Called in a worker process, by write_tsv_parallel() """
+    ( start, stop, chunk_path, compress_level ) = chunk_args
+    chunk_rows: list = _worker_rows[start:stop]
+    with open_output( chunk_path, 'w', level=compress_level, encoding='utf-8', newline='' ) as file:
+        writer = csv.DictWriter( file, fieldnames=_worker_fieldnames, delimiter='\t' )
+        for row in chunk_rows:
+            writer.writerow( {key: ('' if value is None else value) for (key, value) in row.items()} )
+    return ( chunk_path, len(chunk_rows) )
+
+
 ## helper functions END ---------------------------------------------
 
 
@@ -309,14 +413,21 @@ HH024904
 
 
 if __name__ == '__main__':
+    configure_logging()
     ## set up argparser
     parser = argparse.ArgumentParser(description='Output CSV of given organization-IDs')
-    parser.add_argument('--input_path', type=str, help='Path to big fmpro-export-json-file')
+    parser.add_argument('--input_path', type=str, help='Path to big fmpro-export-json-file (or its binary snapshot, or the raw xml export)')
+    parser.add_argument('--output_dir', type=str, default=DEFAULT_OUTPUT_DIR, help='Directory for the output tsv file')
+    parser.add_argument('--secondary_sort_key', type=str, nargs='*', default=DEFAULT_SECONDARY_SORT_KEYS, help='Fields to sort rows by within each org, in archival box order (default: "Box Number" "Box Number 3"; give no values to keep input order)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for formatting and writing the tsv chunks (default 1: no worker processes); the tab-check always runs first, in the main process')
+    parser.add_argument('--compress', type=str, choices=list(CODECS), help='Optionally compress the output tsv (adds .gz/.bz2/.xz); the input may be compressed too, detected automatically')
+    parser.add_argument('--compress_level', type=int, help='Compression level, with --compress (default: COMPRESS_LEVEL env-var, else the codec default)')
+    parser.add_argument('--fields', type=str, nargs='+', help='Optional fields to output, in this order (default: all); the input may itself be a projected conversion (see convert_fmproxml_to_json.py --fields), as long as it has "Organization ID" and the sort keys. With a raw xml input, the other columns are never read')
     args = parser.parse_args()
     log.debug( f'args: {args}' )
     ## get input path
     input_path = args.input_path if args.input_path else "../created_json_files/hhoag_data_as_of_2023-11-10.json"
     log.debug( f'input_path: {input_path}' )
     ## get to work
-    make_csv_from_fmpro_json( input_path )
+    make_csv_from_fmpro_json( input_path, args.output_dir, secondary_sort_key=args.secondary_sort_key, workers=args.workers, fields=args.fields, compression=args.compress, compress_level=args.compress_level )
     log.debug( 'done' )
\ No newline at end of file
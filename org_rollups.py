@@ -0,0 +1,107 @@
+"""
+Per-organization rollup tables, accumulated while the converter's rows stream through.
+
+Saved to a small json file, so org-reports (`unique_orgs.py --rollup_path`) and org-based row-selection (`make_csv_100.py --rollup_path`) never need to re-read row-level data.
+
+Per org (keyed by `Organization ID`):
+- `item_count`
+- `boxes` (distinct `Box Number` values, in natural box order) and `box_count`
+- `barcode_count` (filled-in `Barcode 1/2/3` values)
+- `folder_total` (sum of numeric `Number of Folders` values)
+- `names` (distinct `Organization::Name` values)
+- `record_ids` (items-dict-keys, for fetching the org's items via `converted_data.open_lazy_items()`)
+
+Usage:
+    rollup = OrgRollupBuilder()
+    for ( item_key, item ) in items:
+        rollup.add( item_key, item )
+    save_rollups( rollup.to_dict(), '/path/to/rollups.json' )
+"""
+
+import datetime, logging
+from typing import Optional
+
+from box_numbers import box_sort_key
+from hh_xml.serializer import dump_to_path, load_from_path
+
+
+log = logging.getLogger( __name__ )
+
+
+BARCODE_FIELDS: tuple = ( 'Barcode 1', 'Barcode 2', 'Barcode 3' )
+
+
+class OrgRollupBuilder:
+    """ Accumulates per-org aggregates, one item at a time. """
+
+    def __init__( self ):
+        self.orgs: dict = {}
+        self.items_without_org: list = []
+
+    def add( self, item_key: str, item: dict ) -> None:
+        """ Adds one item to its org's aggregates.
+            Called by SourceDictMaker._dictify_data(), and by run_pipeline.py """
+        org_id = item.get( 'Organization ID' )
+        if org_id is None:
+            self.items_without_org.append( item_key )
+            return
+        org = self.orgs.get( org_id )
+        if org is None:
+            org = self.orgs[org_id] = { 'item_count': 0, 'boxes': set(), 'barcode_count': 0, 'folder_total': 0, 'names': set(), 'record_ids': [] }
+        org['item_count'] += 1
+        org['record_ids'].append( item_key )
+        boxes = item.get( 'Box Number' )
+        for box in ( boxes if type(boxes) == list else [boxes] ):
+            if box is not None:
+                org['boxes'].add( box )
+        for field in BARCODE_FIELDS:
+            if item.get( field ) is not None:
+                org['barcode_count'] += 1
+        folders = item.get( 'Number of Folders' )
+        if type(folders) in ( int, float ):  # NUMBER field; unparseable values stay strings, and are skipped
+            org['folder_total'] += folders
+        names = item.get( 'Organization::Name' )
+        for name in ( names if type(names) == list else [names] ):
+            if name is not None:
+                org['names'].add( name )
+        return
+
+    def to_dict( self ) -> dict:
+        """ Returns the json-ready rollup data, orgs in sorted order.
+            Called by the converter and run_pipeline.py, before save_rollups() """
+        orgs_out = {}
+        for org_id in sorted( self.orgs ):
+            org = self.orgs[org_id]
+            orgs_out[org_id] = {
+                'item_count': org['item_count'],
+                'box_count': len( org['boxes'] ),
+                'boxes': sorted( org['boxes'], key=box_sort_key ),  # archival order; '9' before '78B' before 'M-47'
+                'barcode_count': org['barcode_count'],
+                'folder_total': org['folder_total'],
+                'names': sorted( org['names'] ),
+                'record_ids': org['record_ids'] }
+        return {
+            '__meta__': {
+                'org_count': len( orgs_out ),
+                'item_count': sum( org['item_count'] for org in orgs_out.values() ),
+                'items_without_org': self.items_without_org,
+                'timestamp': str( datetime.datetime.now() ) },
+            'orgs': orgs_out }
+
+    ## end class OrgRollupBuilder()
+
+
+def save_rollups( rollup_data: dict, rollup_path: str, level: Optional[int] = None ) -> None:
+    """ Saves rollup data to a json file; compressed, at `level`, for a compression-extension.
+        Called by the converter and run_pipeline.py """
+    dump_to_path( rollup_data, rollup_path, level=level )
+    log.debug( f'rollups for ``{rollup_data["__meta__"]["org_count"]}`` orgs saved to ``{rollup_path}``' )
+    return
+
+
+def load_rollups( rollup_path: str ) -> dict:
+    """ Loads a rollup file saved by save_rollups().
+        Called by unique_orgs.py and make_csv_100.py """
+    rollup_data: dict = load_from_path( rollup_path )
+    assert type(rollup_data.get('orgs')) == dict, type(rollup_data.get('orgs'))
+    return rollup_data
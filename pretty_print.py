@@ -1,32 +1,27 @@
-""" Pretty prints source XML file. """
+""" Pretty prints source XML file. A .gz/.bz2/.xz source is decompressed as it's read, and the output is compressed the same way (see hh_xml/compressed_io.py). """
 
-import argparse, logging, os, pathlib
+import argparse, logging, pathlib
+from typing import Optional
 from xml.dom import minidom
 
-lglvl: str = os.environ.get( 'LOGLEVEL', 'DEBUG' )
-lglvldct = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO }
-logging.basicConfig(
-    level=lglvldct[lglvl],  # assigns the level-object to the level-key
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
+from hh_xml.compressed_io import open_input, open_output, strip_codec_extension
+from hh_xml.logging_setup import configure_logging
+
 log = logging.getLogger( __name__ )
-log.debug( 'logging working' )
 
 
 ## manager function -------------------------------------------------
-def pretty_print_xml( input_filepath: str, output_filepath: str ):
+def pretty_print_xml( input_filepath: str, output_filepath: str, compress_level: Optional[int] = None ):
     """ Just outputs a pretty-printed XML file.
         Called by dundermain. """
     ## load file
-    with open( input_filepath, 'r' ) as f:
-        xml_string = f.read()
+    with open_input( input_filepath ) as f:
+        xml_string = f.read()  # bytes; the parser honors the xml-declaration's encoding
     ## format the xml    
     dom = minidom.parseString( xml_string )
     formatted_xml = dom.toprettyxml()
     ## write output file
-    with open( output_filepath, 'w' ) as f:
+    with open_output( output_filepath, 'w', level=compress_level ) as f:
         f.write( formatted_xml )
     return
 
@@ -34,19 +29,23 @@ def pretty_print_xml( input_filepath: str, output_filepath: str ):
 def make_output_path( input_path: str ):
     """ Makes an output path from the input path.
         Called by dundermain. """
-    input_path_obj = pathlib.Path(input_path)
+    uncompressed_path: str = strip_codec_extension( input_path )  # 'x.xml.gz' -> 'x_formatted.xml.gz'
+    codec_extension: str = input_path[len(uncompressed_path):]
+    input_path_obj = pathlib.Path( uncompressed_path )
     dir_path = input_path_obj.parent
     filename_without_ext = input_path_obj.stem
     file_extension = input_path_obj.suffix
-    output_path = f'{dir_path}/{filename_without_ext}_formatted{file_extension}'
+    output_path = f'{dir_path}/{filename_without_ext}_formatted{file_extension}{codec_extension}'
     log.debug( f'output_path: {output_path}' )
     return output_path
 
 
 if __name__ == '__main__':
+    configure_logging()
     ## set up argparser
     parser = argparse.ArgumentParser( description='Formats xml.' )
-    parser.add_argument('--input_path', type=str, help='Path to the input file')
+    parser.add_argument('--input_path', type=str, help='Path to the input file (may be .gz/.bz2/.xz)')
+    parser.add_argument('--compress_level', type=int, help='Compression level, for a compressed input (default: COMPRESS_LEVEL env-var, else the codec default)')
     args = parser.parse_args()
     log.debug( f'args: {args}' )
     ## get input path
@@ -55,5 +54,5 @@ if __name__ == '__main__':
     ## make output path
     output_path: str = make_output_path( input_path )
     ## get to work
-    pretty_print_xml( input_path, output_path )
+    pretty_print_xml( input_path, output_path, args.compress_level )
     log.debug( 'done' )
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Local, read-only HTTP lookups over the converter's output -- so other scripts needn't each load the full json.
+
+Endpoints (all return json):
+- `/record/<items-dict-key>`: the item (usually keyed by its RECORDID).
+- `/org/<Organization ID>`: the org's rollup -- item-count, boxes, barcode-count, folder-total, names, and items-dict-keys (see `org_rollups.py`).
+- `/orgs/top?k=10`: the k orgs with the most items.
+- `/health`: item- and org-counts.
+
+Data loads once at startup. A json input is memory-mapped through its key-to-offset index (`converted_data.open_lazy_items()`), so startup is fast and an item is decoded only when first requested; a binary snapshot loads whole. Org-rollups come from `--rollup_path` if given, otherwise they're computed at startup with one pass over the items.
+Responses are cached (LRU, as encoded bytes), since the data doesn't change while the service runs.
+
+Usage:
+(venv) $ python ./query_service.py --input_path "/path/to/output.json" --rollup_path "/path/to/rollups.json" --port 8765
+(venv) $ curl "http://127.0.0.1:8765/orgs/top?k=5"
+
+`bench_query_service.py` load-tests a running service.
+"""
+
+import argparse, functools, logging, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from hh_xml.converted_data import load_items, open_lazy_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.records import SNAPSHOT_FORMAT, detect_format
+from hh_xml.serializer import dumps
+from org_rollups import OrgRollupBuilder, load_rollups
+
+
+log = logging.getLogger( __name__ )
+
+
+DEFAULT_HOST: str = '127.0.0.1'
+DEFAULT_PORT: int = 8765
+DEFAULT_TOP_K: int = 10
+MAX_TOP_K: int = 1000
+RESPONSE_CACHE_SIZE: int = 65536
+
+
+class ConvertedDataStore:
+    """ The loaded items and org-rollups, and the (cached) json response for each request-path. """
+
+    def __init__( self, input_path: str, rollup_path: str = None ):
+        start = time.perf_counter()
+        is_snapshot: bool = detect_format( input_path ) == SNAPSHOT_FORMAT
+        self.items = load_items( input_path ) if is_snapshot else open_lazy_items( input_path )
+        if rollup_path:
+            self.orgs: dict = load_rollups( rollup_path )['orgs']
+        else:
+            log.info( 'no rollup_path; computing org-rollups from the items (pass the converter\'s --rollup_path output to skip this)' )
+            rollup = OrgRollupBuilder()
+            for ( item_key, item ) in self.items.items():
+                rollup.add( item_key, item )
+            self.orgs = rollup.to_dict()['orgs']
+        self.top_orgs: list = sorted( self.orgs, key=lambda org_id: (-self.orgs[org_id]['item_count'], org_id) )  # ranked once, for /orgs/top
+        self.response = functools.lru_cache( maxsize=RESPONSE_CACHE_SIZE )( self.make_response )
+        log.info( f'loaded ``{len(self.items)}`` items and ``{len(self.orgs)}`` orgs in ``{time.perf_counter() - start:.2f}s``' )
+
+    def make_response( self, path: str ) -> tuple:
+        """ Returns ( http-status, json-bytes ) for a request-path; cached as bytes, so a repeat request skips the lookup and the encoding.
+            Called through the cached `self.response()`, by QueryRequestHandler.do_GET() """
+        ( status, data ) = self.lookup( path )
+        return ( status, dumps(data) )
+
+    def lookup( self, path: str ) -> tuple:
+        """ Returns ( http-status, json-ready data ) for a request-path (including any query-string).
+            Called by make_response() """
+        url = urlsplit( path )
+        parts: list = [ unquote(part) for part in url.path.strip('/').split('/') ]
+        if len( parts ) == 2 and parts[0] == 'record':
+            item = self.items.get( parts[1] )
+            return ( 200, item ) if item is not None else ( 404, {'error': f'no record ``{parts[1]}``'} )
+        elif len( parts ) == 2 and parts[0] == 'org':
+            org = self.orgs.get( parts[1] )
+            return ( 200, dict(org, org_id=parts[1]) ) if org is not None else ( 404, {'error': f'no org ``{parts[1]}``'} )
+        elif parts == [ 'orgs', 'top' ]:
+            k_values: list = parse_qs( url.query ).get( 'k', [str(DEFAULT_TOP_K)] )
+            if not k_values[0].isdigit():
+                return ( 400, {'error': f'k must be a non-negative integer; got ``{k_values[0]}``'} )
+            k: int = min( int(k_values[0]), MAX_TOP_K )
+            return ( 200, [ {'org_id': org_id, 'item_count': self.orgs[org_id]['item_count'], 'names': self.orgs[org_id]['names']} for org_id in self.top_orgs[:k] ] )
+        elif parts == [ 'health' ]:
+            return ( 200, {'items': len(self.items), 'orgs': len(self.orgs)} )
+        return ( 404, {'error': 'endpoints: /record/<RECORDID>, /org/<Organization ID>, /orgs/top?k=N, /health'} )
+
+    ## end class ConvertedDataStore()
+
+
+class QueryRequestHandler( BaseHTTPRequestHandler ):
+    """ Serves GET requests from the server's ConvertedDataStore. """
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients can reuse a connection
+    disable_nagle_algorithm = True  # headers and body go out as separate writes; with Nagle on, each keep-alive response stalls c.40ms on the client's delayed-ack
+
+    def do_GET( self ):
+        ( status, body ) = self.server.store.response( self.path )  # type: ignore
+        self.send_response( status )
+        self.send_header( 'Content-Type', 'application/json; charset=utf-8' )
+        self.send_header( 'Content-Length', str(len(body)) )
+        self.end_headers()
+        self.wfile.write( body )
+
+    def log_message( self, format, *args ):
+        log.debug( format % args )  # per-request lines only at DEBUG; the default handler writes every one to stderr
+
+    ## end class QueryRequestHandler()
+
+
+def make_server( store: ConvertedDataStore, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT ) -> ThreadingHTTPServer:
+    """ Returns the (not yet serving) http server; port 0 picks a free port.
+        Called by dundermain, and by bench_query_service.py """
+    server = ThreadingHTTPServer( (host, port), QueryRequestHandler )
+    server.daemon_threads = True
+    server.store = store  # type: ignore
+    return server
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Serves read-only record- and org-lookups over converted data.' )
+    parser.add_argument( '--input_path', type=str, help='path to the converted json file (or its binary snapshot)' )
+    parser.add_argument( '--rollup_path', type=str, help='optional org-rollups json (see org_rollups.py); computed at startup if omitted' )
+    parser.add_argument( '--host', type=str, default=DEFAULT_HOST, help=f'interface to listen on (default {DEFAULT_HOST})' )
+    parser.add_argument( '--port', type=int, default=DEFAULT_PORT, help=f'port to listen on (default {DEFAULT_PORT})' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    server = make_server( ConvertedDataStore(args.input_path, args.rollup_path), args.host, args.port )
+    log.info( f'serving on ``http://{args.host}:{server.server_address[1]}``' )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info( 'stopping' )
+    server.server_close()
+    log.debug( 'done' )
@@ -0,0 +1,52 @@
+"""
+Groups row-dicts by a key (eg `Organization ID`) without a full comparison-sort of the rows.
+
+One pass drops each row into its key's bucket; then only the distinct keys are sorted (c.39K org-ids, rather than c.177K rows), and the buckets are emitted in that order.
+Within a bucket, rows keep their input order -- the same result as a stable `sorted()` on the key -- unless secondary sort keys are given (eg `Box Number` then `Box Number 3`, in archival box order; see `box_numbers.py`), in which case each (small) bucket is sorted by them.
+
+Usage:
+    grouped_rows: list = group_rows_by_key( rows, 'Organization ID', secondary_key=['Box Number', 'Box Number 3'] )
+"""
+
+import logging
+from typing import Callable, Optional, Union
+
+from box_numbers import box_sort_key
+
+
+log = logging.getLogger( __name__ )
+
+
+def group_rows_by_key( rows_list: list, key: str, secondary_key: Union[str, list, None] = None, secondary_sort_key: Optional[Callable] = None ) -> list:
+    """ Returns the rows grouped by `key`, groups in sorted key order (None last).
+        If `secondary_key` (a field-name, or list of them) is given, rows within each group are sorted by `secondary_sort_key(row[field])` for each field (default: box_numbers.box_sort_key, which is cached per distinct value).
+        Called by the make_csv scripts, and by run_pipeline.py """
+    buckets: dict = {}
+    for row in rows_list:
+        value = row[key]
+        bucket = buckets.get( value )
+        if bucket is None:
+            bucket = buckets[value] = []
+        bucket.append( row )
+    none_bucket = buckets.pop( None, None )
+    sorted_keys: list = sorted( buckets )
+    log.debug( f'grouped ``{len(rows_list)}`` rows into ``{len(sorted_keys)}`` buckets' )
+    if secondary_key:
+        value_key = secondary_sort_key if secondary_sort_key is not None else box_sort_key
+        fields: list = [ secondary_key ] if type(secondary_key) == str else list( secondary_key )
+        if len( fields ) == 1:
+            field = fields[0]
+            row_key = lambda row: value_key( row.get(field) )
+        else:
+            row_key = lambda row: tuple( value_key(row.get(field)) for field in fields )
+        for bucket_key in sorted_keys:
+            buckets[bucket_key].sort( key=row_key )
+        if none_bucket:
+            none_bucket.sort( key=row_key )
+    grouped_rows: list = []
+    for bucket_key in sorted_keys:
+        grouped_rows.extend( buckets[bucket_key] )
+    if none_bucket:
+        grouped_rows.extend( none_bucket )
+    return grouped_rows
+
@@ -0,0 +1,98 @@
+"""
+Row predicates the converter evaluates during the xml parse, on a few cheap columns, before a row's item-dict is built.
+
+A `RowFilter` combines (all optional; a row must pass every one given):
+- `include_orgs` / `exclude_orgs`: sets of `Organization ID` values.
+- `record_id_ranges`: inclusive ( low, high ) ranges of numeric `Record ID` values; a non-numeric or empty Record ID matches no range.
+- `types`: a set of `Type` values.
+Values are compared after the converter's text-normalization, so they match what the item-dict would hold.
+
+Only the filter's own columns are read for a rejected row (one DATA element each); the rest of the row is never walked.
+So `make_csv_100.py`, given the raw xml, builds item-dicts for just its ~100 orgs' rows instead of converting, saving, and reloading all of them.
+
+Usage:
+    from row_filters import RowFilter, load_filtered_xml_items
+    items: dict = load_filtered_xml_items( '/path/to/source.xml', RowFilter(include_orgs={'HH_030652'}) )
+    ## or, for a filtered conversion:
+    maker.row_filter = RowFilter( record_id_ranges=[(1000, 1999)], types={'Book'} )
+"""
+
+import logging
+from typing import Optional
+
+from hh_xml.records import iter_xml_records
+
+
+log = logging.getLogger( __name__ )
+
+
+ORG_FIELD: str = 'Organization ID'
+RECORD_ID_FIELD: str = 'Record ID'
+TYPE_FIELD: str = 'Type'
+
+
+class RowFilter:
+    """ A row predicate over the `Organization ID`, `Record ID`, and `Type` columns. """
+
+    def __init__( self, include_orgs=None, exclude_orgs=None, record_id_ranges: Optional[list] = None, types=None ):
+        self.include_orgs: Optional[set] = set( include_orgs ) if include_orgs is not None else None
+        self.exclude_orgs: set = set( exclude_orgs or () )
+        self.record_id_ranges: Optional[list] = list( record_id_ranges ) if record_id_ranges is not None else None
+        self.types: Optional[set] = set( types ) if types is not None else None
+
+    def needed_fields( self ) -> list:
+        """ Returns the field-names whose values matches() reads. """
+        fields: list = []
+        if self.include_orgs is not None or self.exclude_orgs:
+            fields.append( ORG_FIELD )
+        if self.record_id_ranges is not None:
+            fields.append( RECORD_ID_FIELD )
+        if self.types is not None:
+            fields.append( TYPE_FIELD )
+        return fields
+
+    def matches( self, values: dict ) -> bool:
+        """ Returns True if the row passes; `values` maps each needed field to its normalized text, or None. """
+        if self.include_orgs is not None or self.exclude_orgs:
+            org_id = values.get( ORG_FIELD )
+            if ( self.include_orgs is not None and org_id not in self.include_orgs ) or org_id in self.exclude_orgs:
+                return False
+        if self.types is not None and values.get( TYPE_FIELD ) not in self.types:
+            return False
+        if self.record_id_ranges is not None:
+            record_id = values.get( RECORD_ID_FIELD )
+            if not ( record_id and record_id.isdigit() ):
+                return False
+            number = int( record_id )
+            return any( low <= number <= high for (low, high) in self.record_id_ranges )
+        return True
+
+    def __repr__( self ):
+        return f'RowFilter(include_orgs={len(self.include_orgs) if self.include_orgs is not None else None}, exclude_orgs={len(self.exclude_orgs)}, record_id_ranges={self.record_id_ranges}, types={self.types})'
+
+    ## end class RowFilter()
+
+
+def parse_record_id_range( text: str ) -> tuple:
+    """ Returns ( low, high ) from a 'low-high' string (eg '1000-1999'); a single number is a one-value range.
+        Called by argparse, as a `type`. """
+    ( low, _sep, high ) = text.partition( '-' )
+    ( low_number, high_number ) = ( int(low), int(high or low) )
+    if low_number > high_number:
+        raise ValueError( f'record-id range ``{text}`` is backwards' )
+    return ( low_number, high_number )
+
+
+def load_filtered_xml_items( xml_path: str, row_filter: RowFilter, fields: Optional[list] = None ) -> dict:
+    """ Returns the items-dict (keyed as the converter keys it) of just the rows passing `row_filter`, straight from the raw xml export.
+        Validates the export first, as the converter does.
+        Called by the make_csv scripts. """
+    from hh_xml.fm_rows import RowConverter  # imported here; it loads lxml, which json-input runs never need
+    from validate_fmpro_export import validate_export
+    maker = RowConverter()
+    maker.row_filter = row_filter
+    maker.fields = fields
+    validate_export( xml_path )  # the converter's default schema and row-sample
+    items: dict = dict( iter_xml_records(xml_path, maker) )
+    log.info( f'loaded ``{len(items)}`` items passing ``{row_filter}``' )
+    return items
@@ -0,0 +1,238 @@
+"""
+Runs the nightly chain -- convert, include-subset TSV, exclude-subset TSV, org-counts -- from a single parse of the xml export.
+
+Replaces running `convert_fmproxml_to_json.py`, `make_csv_100.py`, `make_csv_rest.py` and `unique_orgs.py` as separate processes (each re-reading and re-parsing the data).
+
+How it works:
+- a producer thread streams item-dicts from the xml (SourceDictMaker.iter_item_dicts()), in batches, tab-checking every row as the make_csv scripts do.
+- each batch goes onto one bounded asyncio-queue per consumer; a full queue blocks the producer (backpressure), so a slow consumer can't make memory balloon.
+- the consumers (json-writer, two tsv-writers, org-counter) run on the event-loop while the producer keeps parsing; their final writes run in worker threads.
+
+Total wall-time approaches that of one parse plus the slowest final write.
+
+Outputs are all-or-nothing: each final write goes to a `.partial-` staging path, and the staged files are moved into place only once every consumer has finished.
+If parsing fails, the consumers get an abort-sentinel instead of the end-of-stream `None`, so no final write runs; if any consumer fails, the staged files are removed. Either way, the last good outputs are left as they were.
+
+Usage:
+(venv) $ python ./run_pipeline.py --source_path "/path/to/source.xml" --output_path "/path/to/output.json" --tsv_output_dir "/path/to/tsv_dir/"
+"""
+
+import argparse, asyncio, datetime, logging, os, shutil, tempfile
+from typing import Optional
+
+import make_csv_100, make_csv_rest, unique_orgs
+from convert_fmproxml_to_json import SourceDictMaker
+from hh_xml.converted_data import save_snapshot
+from hh_xml.logging_setup import configure_logging
+from org_rollups import OrgRollupBuilder, save_rollups
+from record_grouping import group_rows_by_key
+from validate_fmpro_export import validate_export
+
+
+log = logging.getLogger( __name__ )
+
+
+BATCH_SIZE: int = 500  # item-dicts per queue-entry; batching keeps per-item queue overhead negligible
+QUEUE_SIZE: int = 8  # batches per consumer-queue before the producer blocks
+ABORT = object()  # sent instead of the end-of-stream `None` when parsing fails; consumers then skip their final writes
+STAGING_PREFIX: str = '.partial-'
+
+
+## consumers --------------------------------------------------------
+
+
+class JsonConsumer:
+    """ Collects every item, then dictifies and saves them -- the `convert_fmproxml_to_json.py` output. """
+
+    def __init__( self, maker: SourceDictMaker, json_output_path: str, snapshot_output_path: Optional[str] = None, rollup_output_path: Optional[str] = None ):
+        self.maker = maker
+        self.json_output_path = json_output_path
+        self.snapshot_output_path = snapshot_output_path
+        self.rollup_output_path = rollup_output_path
+        self.items: list = []
+        self.staged: list = []  # ( staged-path, final-path ) pairs; moved into place, or removed, by run_pipeline()
+
+    def consume( self, batch: list ) -> None:
+        self.items.extend( batch )
+
+    def close( self ) -> None:
+        """ Writes the outputs to staging paths, listed in self.staged. """
+        self.maker.org_rollup = OrgRollupBuilder() if self.rollup_output_path else None  # fed by _dictify_data(); reset, in case the maker was used before
+        dictified_data = self.maker._dictify_data( self.items )
+        self.staged.append( (make_staging_path(self.json_output_path), self.json_output_path) )
+        self.maker._save_json( dictified_data, self.staged[-1][0] )
+        if self.snapshot_output_path:
+            self.staged.append( (make_staging_path(self.snapshot_output_path), self.snapshot_output_path) )
+            save_snapshot( dictified_data, self.staged[-1][0] )
+        if self.rollup_output_path:
+            self.staged.append( (make_staging_path(self.rollup_output_path), self.rollup_output_path) )
+            save_rollups( self.maker.org_rollup.to_dict(), self.staged[-1][0] )  # type: ignore
+
+
+class TsvSubsetConsumer:
+    """ Keeps the rows selected by `subset_module.make_subset_list()`, then validates, sorts and writes them (the tab-check is done on every row, by the producer).
+        `subset_module` is make_csv_100 (include the target orgs) or make_csv_rest (exclude them). """
+
+    def __init__( self, subset_module, output_dir: str, file_prefix: str ):
+        self.subset_module = subset_module
+        self.output_dir = output_dir
+        self.staging_dir: Optional[str] = None  # set by close(); removed by run_pipeline()
+        self.staged: list = []
+        self.file_prefix = file_prefix
+        self.sorted_target_orgs: list = sorted( subset_module.make_starting_orgs_list() )
+        self.rows: list = []
+
+    def consume( self, batch: list ) -> None:
+        self.rows.extend( self.subset_module.make_subset_list(batch, self.sorted_target_orgs) )
+
+    def close( self ) -> None:
+        """ Writes the tsv into a staging directory inside `output_dir`, listed in self.staged. """
+        if not self.rows:
+            log.warning( f'no rows for ``{self.file_prefix}``; no tsv written' )
+            return
+        self.subset_module.validate_keys_same( self.rows )  # raises exception if keys differ
+        self.subset_module.validate_organization_id( self.rows )  # raises exception on a bad org-id
+        sorted_rows: list = group_rows_by_key( self.rows, 'Organization ID', secondary_key=self.subset_module.DEFAULT_SECONDARY_SORT_KEYS )
+        self.staging_dir = tempfile.mkdtemp( prefix=STAGING_PREFIX, dir=self.output_dir )  # same filesystem, so the move is an atomic rename
+        staged_path: str = self.subset_module.write_tsv( sorted_rows, self.staging_dir, self.file_prefix )
+        self.staged.append( (staged_path, os.path.join(self.output_dir, os.path.basename(staged_path))) )
+
+
+class OrgCountConsumer:
+    """ Counts items per `Organization ID` -- the `unique_orgs.py` report. """
+
+    def __init__( self ):
+        self.items_per_organization: dict = {}
+        self.staged: list = []  # writes no files
+
+    def consume( self, batch: list ) -> None:
+        counts = self.items_per_organization
+        for item in batch:
+            org_id = item['Organization ID']
+            if org_id is not None:
+                counts[org_id] = counts.get( org_id, 0 ) + 1
+
+    def close( self ) -> None:
+        unique_orgs.log_org_counts( self.items_per_organization )
+
+
+## manager function -------------------------------------------------
+
+
+async def run_pipeline( source_path: str, json_output_path: str, tsv_output_dir: str, snapshot_output_path: Optional[str] = None, rollup_output_path: Optional[str] = None, canonical_json: bool = False ) -> None:
+    """ Parses the export once, fanning batches of item-dicts out to every consumer.
+        Called by dundermain. """
+    maker = SourceDictMaker()
+    maker.canonical_json = canonical_json
+    validate_export( source_path, schema=maker.validation_schema, max_rows=maker.validation_max_rows )  # fail fast, before starting the consumers
+    consumers: list = [
+        JsonConsumer( maker, json_output_path, snapshot_output_path, rollup_output_path ),
+        TsvSubsetConsumer( make_csv_100, tsv_output_dir, 'output_100' ),
+        TsvSubsetConsumer( make_csv_rest, tsv_output_dir, 'output_rest' ),
+        OrgCountConsumer() ]
+    queues: list = [ asyncio.Queue(maxsize=QUEUE_SIZE) for _ in consumers ]
+    loop = asyncio.get_running_loop()
+    consumer_tasks = [ asyncio.create_task(drain_queue(consumer, queue)) for (consumer, queue) in zip(consumers, queues) ]
+    producer_task = loop.run_in_executor( None, produce_batches, maker, source_path, queues, loop )  # a thread of the default executor; not asyncio.to_thread(), which needs python 3.9
+    results: list = await asyncio.gather( producer_task, *consumer_tasks, return_exceptions=True )  # waits for every task, even after a failure
+    staged: list = [ pair for consumer in consumers for pair in consumer.staged ]
+    errors: list = [ result for result in results if isinstance(result, BaseException) ]
+    try:
+        if errors:
+            for ( staged_path, _final_path ) in staged:
+                if os.path.exists( staged_path ):  # a failed final write may not have created it
+                    os.remove( staged_path )
+            log.error( f'pipeline failed; ``{len(staged)}`` staged outputs discarded; existing outputs left unchanged' )
+            raise errors[0]
+        for ( staged_path, final_path ) in staged:
+            os.replace( staged_path, final_path )
+            log.info( f'written, ``{final_path}``' )
+    finally:
+        for consumer in consumers:
+            if getattr( consumer, 'staging_dir', None ):  # the tsv-consumers'
+                shutil.rmtree( consumer.staging_dir, ignore_errors=True )
+    return
+
+
+## helper functions START -------------------------------------------
+
+
+def produce_batches( maker: SourceDictMaker, source_path: str, queues: list, loop ) -> None:
+    """ Runs in a worker-thread; streams item-dicts into every queue, blocking while any queue is full.
+        Each batch is tab-checked before it's sent, over every parsed row -- not just a subset -- so the pipeline fails on the same data the make_csv scripts fail on.
+        Sends the end-of-stream `None` after the last batch; if parsing fails, sends ABORT instead (so consumers finish without writing), and re-raises.
+        Called by run_pipeline() """
+    def put_all( batch ):
+        for queue in queues:
+            asyncio.run_coroutine_threadsafe( queue.put(batch), loop ).result()  # blocks this thread (not the loop) while the queue is full
+    try:
+        batch: list = []
+        for item_dict in maker.iter_item_dicts( source_path ):
+            batch.append( item_dict )
+            if len( batch ) >= BATCH_SIZE:
+                make_csv_rest.validate_no_tabs( batch )  # raises exception if tab-character found
+                put_all( batch )
+                batch = []
+        if batch:
+            make_csv_rest.validate_no_tabs( batch )
+            put_all( batch )
+    except BaseException:
+        put_all( ABORT )
+        raise
+    put_all( None )
+    return
+
+
+async def drain_queue( consumer, queue: asyncio.Queue ) -> None:
+    """ Feeds batches to the consumer until the end-of-stream `None`, then runs its final (staged) write in a worker-thread.
+        On ABORT (the producer failed) returns without the final write.
+        After a consumer error the queue is still drained, so the producer is never left blocked; the error is re-raised at the end.
+        Called by run_pipeline() """
+    error = None
+    while True:
+        batch = await queue.get()
+        if batch is ABORT:
+            log.warning( f'parse failed; ``{type(consumer).__name__}`` skips its final write' )
+            return
+        if batch is None:
+            break
+        if error is None:
+            try:
+                consumer.consume( batch )
+            except Exception as e:
+                log.exception( f'consumer ``{type(consumer).__name__}`` failed; discarding its remaining batches' )
+                error = e
+    if error is not None:
+        raise error
+    await asyncio.get_running_loop().run_in_executor( None, consumer.close )
+    return
+
+
+def make_staging_path( final_path: str ) -> str:
+    """ Returns a sibling path for writing `final_path`'s content before it's moved into place; the extension is kept, so a compressed output is still compressed.
+        Called by JsonConsumer.close() """
+    ( directory, file_name ) = os.path.split( final_path )
+    return os.path.join( directory, f'{STAGING_PREFIX}{file_name}' )
+
+
+## helper functions END ---------------------------------------------
+
+
+if __name__ == '__main__':
+    configure_logging()
+    log.info( 'starting dundermain' )
+    start_time = datetime.datetime.now()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Converts the xml export, and makes the tsv files and org-counts, from one parse.' )
+    parser.add_argument( '--source_path', type=str, help='path to source xml file' )
+    parser.add_argument( '--output_path', type=str, help='path to output json file' )
+    parser.add_argument( '--snapshot_path', type=str, help='optional path for a binary snapshot of the json output, for fast reloading' )
+    parser.add_argument( '--rollup_path', type=str, help='optional path for per-org rollups json' )
+    parser.add_argument( '--tsv_output_dir', type=str, default=make_csv_100.DEFAULT_OUTPUT_DIR, help='directory for the two output tsv files' )
+    parser.add_argument( '--canonical_json', action='store_true', help='write the older, byte-comparable, indent=2 sort_keys=True json layout (slower)' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    asyncio.run( run_pipeline(args.source_path, args.output_path, args.tsv_output_dir, args.snapshot_path, args.rollup_path, args.canonical_json) )
+    elapsed_time = datetime.datetime.now() - start_time
+    log.info( 'ending dundermain; elapsed_time, ``%s``' % elapsed_time )
@@ -0,0 +1,250 @@
+"""
+Full-text search over item titles (`Item`) and org names (`Organization::Name`), without grepping the big json or xml.
+
+Builds an inverted index from the converted records:
+- tokens are unicode-normalized (NFKD, accents dropped), casefolded, and split on non-word characters.
+- each token's posting-list holds the (dense, integer) doc-numbers of the items containing it.
+- each item's `Item` title is stored too, so results print without loading the converted data.
+- posting-lists are delta-encoded as varints and zlib-compressed on disk, so the index is a few MB for all c.177K items.
+
+File layout: an 8-byte prefix (the compressed header's length, then the postings section's length), then three sections:
+- header: zlib-compressed json of the vocabulary and the offsets below; the only part every query decompresses in full.
+- postings: the posting-lists, in blocks of POSTINGS_BLOCK_TOKENS tokens, each block zlib-compressed on its own.
+- docs: the ( items-dict-key, `Item` title ) pairs, in blocks of DOCS_BLOCK_SIZE docs, each block zlib-compressed on its own.
+So a query decompresses only the posting-blocks of its tokens, and the doc-blocks of the results it prints.
+
+Queries:
+- terms are ANDed: `feminist minnesota` matches items containing both.
+- a trailing `*` makes a prefix term: `femin*` matches `feminist`, `feminists`, etc (found by bisecting the sorted vocabulary).
+  If the term tokenizes to several tokens (eg `o'bri*`), the earlier ones are exact and only the last is a prefix.
+- posting-lists are intersected smallest-first.
+
+Usage:
+(venv) $ python ./search_index.py build --input_path "/path/to/output.json" --index_path "/path/to/search.idx"
+(venv) $ python ./search_index.py query --index_path "/path/to/search.idx" feminist minn*
+"""
+
+import argparse, bisect, logging, os, re, time, unicodedata, zlib
+from array import array
+
+from hh_xml.converted_data import load_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.serializer import dumps, loads
+
+
+log = logging.getLogger( __name__ )
+
+
+INDEXED_FIELDS: tuple = ( 'Item', 'Organization::Name' )
+TOKEN_RE = re.compile( r'\w+' )
+INDEX_FORMAT_VERSION: int = 2
+POSTINGS_BLOCK_TOKENS: int = 256  # tokens per compressed posting-block
+DOCS_BLOCK_SIZE: int = 1024  # docs per compressed doc-block
+
+
+## tokenizing -------------------------------------------------------
+
+
+def tokenize( text: str ) -> list:
+    """ Returns the normalized tokens of `text`: accents dropped, casefolded, split on non-word characters.
+        Called by build_index() and SearchIndex.query() """
+    decomposed = unicodedata.normalize( 'NFKD', text )
+    without_accents = ''.join( c for c in decomposed if not unicodedata.combining(c) )
+    return TOKEN_RE.findall( without_accents.casefold() )
+
+
+## varint posting-lists ---------------------------------------------
+
+
+def encode_postings( doc_numbers: list ) -> bytes:
+    """ Delta-encodes sorted doc-numbers as LEB128 varints.
+        Called by build_index() """
+    out = bytearray()
+    previous = 0
+    for doc_number in doc_numbers:
+        delta = doc_number - previous
+        previous = doc_number
+        while delta >= 0x80:
+            out.append( (delta & 0x7F) | 0x80 )
+            delta >>= 7
+        out.append( delta )
+    return bytes( out )
+
+
+def decode_postings( data: bytes ) -> array:
+    """ Decodes encode_postings() output back to an array of doc-numbers.
+        Called by SearchIndex.postings() """
+    doc_numbers = array( 'I' )
+    value = shift = previous = 0
+    for byte in data:
+        value |= ( byte & 0x7F ) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += value
+            doc_numbers.append( previous )
+            value = shift = 0
+    return doc_numbers
+
+
+## build ------------------------------------------------------------
+
+
+def build_index( input_path: str, index_path: str ) -> None:
+    """ Builds and saves the inverted index for the converted file's items; see the module docstring for the file layout.
+        Called by dundermain. """
+    start = time.perf_counter()
+    items: dict = load_items( input_path )
+    doc_keys: list = list( items.keys() )
+    doc_labels: list = [ str(items[key].get('Item') or '') for key in doc_keys ]  # shown with query results
+    postings: dict = {}
+    for ( doc_number, item_key ) in enumerate( doc_keys ):
+        item = items[item_key]
+        tokens = set()
+        for field in INDEXED_FIELDS:
+            value = item.get( field )
+            for text in ( value if type(value) == list else [value] ):
+                if text:
+                    tokens.update( tokenize(str(text)) )
+        for token in tokens:
+            postings.setdefault( token, [] ).append( doc_number )  # doc_numbers are appended in increasing order, so lists are already sorted
+    vocabulary: list = sorted( postings )
+    ## postings section: per-token offsets are within the token's decompressed block
+    ( postings_section, posting_block_offsets, token_offsets ) = ( bytearray(), [], [] )
+    for block_start in range( 0, len(vocabulary), POSTINGS_BLOCK_TOKENS ):
+        block = bytearray()
+        for token in vocabulary[block_start:block_start + POSTINGS_BLOCK_TOKENS]:
+            token_offsets.append( len(block) )
+            block.extend( encode_postings(postings[token]) )
+        token_offsets.append( len(block) )  # each block's end, so a token's end is always the next offset
+        posting_block_offsets.append( len(postings_section) )
+        postings_section.extend( zlib.compress(bytes(block)) )
+    posting_block_offsets.append( len(postings_section) )
+    ## docs section
+    ( docs_section, doc_block_offsets ) = ( bytearray(), [] )
+    for block_start in range( 0, len(doc_keys), DOCS_BLOCK_SIZE ):
+        doc_block_offsets.append( len(docs_section) )
+        docs_section.extend( zlib.compress(dumps(list(zip(doc_keys[block_start:block_start + DOCS_BLOCK_SIZE], doc_labels[block_start:block_start + DOCS_BLOCK_SIZE])))) )
+    doc_block_offsets.append( len(docs_section) )
+    header: bytes = zlib.compress( dumps({
+        'version': INDEX_FORMAT_VERSION, 'doc_count': len(doc_keys), 'vocabulary': vocabulary, 'token_offsets': token_offsets,
+        'posting_block_offsets': posting_block_offsets, 'doc_block_offsets': doc_block_offsets}) )
+    with open( index_path, 'wb' ) as f:
+        f.write( len(header).to_bytes(4, 'big') + len(postings_section).to_bytes(4, 'big') )
+        f.write( header )
+        f.write( postings_section )
+        f.write( docs_section )
+    log.info( f'indexed ``{len(doc_keys)}`` items, ``{len(vocabulary)}`` tokens, in ``{time.perf_counter() - start:.1f}s``; index size ``{os.path.getsize(index_path) / 1e6:.1f}MB``' )
+    return
+
+
+## query ------------------------------------------------------------
+
+
+class SearchIndex:
+    """ A loaded index; answers AND/prefix queries. Posting- and doc-blocks are decompressed on first use, and kept. """
+
+    def __init__( self, index_path: str ):
+        with open( index_path, 'rb' ) as f:
+            data: bytes = f.read()
+        header_length = int.from_bytes( data[0:4], 'big' )
+        postings_length = int.from_bytes( data[4:8], 'big' )
+        header: dict = loads( zlib.decompress(data[8:8 + header_length]) )
+        assert header['version'] == INDEX_FORMAT_VERSION, header['version']
+        self.doc_count: int = header['doc_count']
+        self.vocabulary: list = header['vocabulary']
+        self.token_offsets: list = header['token_offsets']
+        self.posting_block_offsets: list = header['posting_block_offsets']
+        self.doc_block_offsets: list = header['doc_block_offsets']
+        self.postings_section = memoryview( data )[8 + header_length:8 + header_length + postings_length]
+        self.docs_section = memoryview( data )[8 + header_length + postings_length:]
+        self.posting_blocks: dict = {}  # block-number -> decompressed bytes
+        self.doc_blocks: dict = {}  # block-number -> list of [ items-dict-key, label ]
+
+    def postings( self, vocabulary_position: int ) -> array:
+        """ Returns the doc-numbers for the token at `vocabulary_position`. """
+        block_number = vocabulary_position // POSTINGS_BLOCK_TOKENS
+        if block_number not in self.posting_blocks:
+            ( start, end ) = self.posting_block_offsets[block_number:block_number + 2]
+            self.posting_blocks[block_number] = zlib.decompress( self.postings_section[start:end] )
+        offset_position = vocabulary_position + block_number  # each earlier block added one end-offset
+        ( start, end ) = self.token_offsets[offset_position:offset_position + 2]
+        return decode_postings( memoryview(self.posting_blocks[block_number])[start:end] )
+
+    def doc( self, doc_number: int ) -> tuple:
+        """ Returns the ( items-dict-key, `Item` title ) of a doc-number. """
+        block_number = doc_number // DOCS_BLOCK_SIZE
+        if block_number not in self.doc_blocks:
+            ( start, end ) = self.doc_block_offsets[block_number:block_number + 2]
+            self.doc_blocks[block_number] = loads( zlib.decompress(self.docs_section[start:end]) )
+        ( key, label ) = self.doc_blocks[block_number][doc_number % DOCS_BLOCK_SIZE]
+        return ( key, label )
+
+    def exact_doc_numbers( self, token: str ) -> set:
+        """ Returns the doc-numbers containing `token`. """
+        position = bisect.bisect_left( self.vocabulary, token )
+        return set( self.postings(position) ) if position < len( self.vocabulary ) and self.vocabulary[position] == token else set()
+
+    def prefix_doc_numbers( self, prefix: str ) -> set:
+        """ Returns the doc-numbers containing any token starting with `prefix`. """
+        position = bisect.bisect_left( self.vocabulary, prefix )
+        doc_numbers: set = set()
+        while position < len( self.vocabulary ) and self.vocabulary[position].startswith( prefix ):
+            doc_numbers.update( self.postings(position) )
+            position += 1
+        return doc_numbers
+
+    def term_doc_numbers( self, term: str ) -> set:
+        """ Returns doc-numbers matching one query-term: all of its tokens (eg `O'Brien` tokenizes to two, both required).
+            With a trailing `*`, the term's last token is a prefix; any earlier ones are still exact (eg `o'bri*`). """
+        is_prefix: bool = term.endswith( '*' )
+        tokens = tokenize( term[:-1] if is_prefix else term )
+        result = None
+        for ( i, token ) in enumerate( tokens ):
+            found = self.prefix_doc_numbers( token ) if is_prefix and i == len( tokens ) - 1 else self.exact_doc_numbers( token )
+            result = found if result is None else result & found
+        return result if result is not None else set()
+
+    def query( self, terms: list ) -> list:
+        """ Returns the doc-numbers matching all `terms`, in index order. """
+        term_sets = sorted( (self.term_doc_numbers(term) for term in terms), key=len )
+        if not term_sets:
+            return []
+        result = term_sets[0]
+        for term_set in term_sets[1:]:  # smallest-first, so the working set only shrinks
+            if not result:
+                break
+            result = result & term_set
+        return sorted( result )
+
+    ## end class SearchIndex()
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Builds, or queries, a full-text index of item titles and org names.' )
+    subparsers = parser.add_subparsers( dest='command', required=True )
+    build_parser = subparsers.add_parser( 'build', help='build the index from converted data' )
+    build_parser.add_argument( '--input_path', type=str, help='path to the converted json file (or its binary snapshot)' )
+    build_parser.add_argument( '--index_path', type=str, help='path to the output index file' )
+    query_parser = subparsers.add_parser( 'query', help='query the index; terms are ANDed; a trailing * makes a prefix term' )
+    query_parser.add_argument( '--index_path', type=str, help='path to the index file' )
+    query_parser.add_argument( '--limit', type=int, default=50, help='max results to print (default 50)' )
+    query_parser.add_argument( 'terms', nargs='+', help='query terms' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    if args.command == 'build':
+        build_index( args.input_path, args.index_path )
+    else:
+        load_start = time.perf_counter()
+        index = SearchIndex( args.index_path )
+        query_start = time.perf_counter()
+        results = index.query( args.terms )
+        query_ms = ( time.perf_counter() - query_start ) * 1000
+        for doc_number in results[:args.limit]:
+            ( doc_key, doc_label ) = index.doc( doc_number )
+            print( f'{doc_key}\t{doc_label}' )
+        log.info( f'``{len(results)}`` results; index-load ``{(query_start - load_start) * 1000:.0f}ms``; query ``{query_ms:.1f}ms``' )
+    log.debug( 'done' )
@@ -0,0 +1,98 @@
+"""
+Generates realistic-looking synthetic data, for benchmarks and performance-tests, without needing the real (large) export.
+
+Row-values mimic the 2023-11-10 export: ~4.5 items per organization, HH_ org-ids, box-numbers like '78B' and 'M-47', related-table org-names, some empty columns.
+Generation is seeded, so the same `row_count` always gives the same data.
+
+Usage:
+(venv) $ python ./synthetic_export.py --output_path "/path/to/synthetic.xml" --row_count 177000
+"""
+
+import argparse, logging, random
+from xml.sax.saxutils import escape
+
+from hh_xml.logging_setup import configure_logging
+from validate_fmpro_export import DEFAULT_SCHEMA
+
+
+log = logging.getLogger( __name__ )
+
+
+FIELD_NAMES: list = [ f['NAME'] for f in DEFAULT_SCHEMA ]
+FIELD_TYPES: dict = { 'Number of Folders': 'NUMBER' }
+WORDS: list = 'committee defense alliance women labor peace action council league national coalition freedom union party socialist citizens students rights workers fund'.split()
+
+
+def iter_synthetic_rows( row_count: int, seed: int = 1 ):
+    """ Yields ( RECORDID, {field-name: value-or-list} ) tuples; missing fields are empty.
+        Called by write_synthetic_export() and make_synthetic_items() """
+    rng = random.Random( seed )
+    org_count = max( 1, int(row_count / 4.5) )
+    for i in range( row_count ):
+        org_number = rng.randint( 1, org_count )
+        values = {
+            'Organization ID': f'HH_{org_number:06d}',
+            'Item': ' '.join( rng.choice(WORDS) for _ in range(rng.randint(2, 6)) ).title(),
+            'Box Number': f'{rng.randint(1, 400)}{rng.choice(["", "", "B", "C"])}',
+            'Record ID': str( 100000 + i - (i % 997 == 0) ),  # a few duplicated "Record ID" values, like the real data
+            'Organization::Name': f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} of {org_number}',
+            'Organization::Record Type': 'Organization' }
+        if rng.random() < 0.3:
+            values['Box Number 3'] = f'M-{rng.randint(1, 90)}'
+        if rng.random() < 0.5:
+            values['Barcode 1'] = f'3123{rng.randint(10**9, 10**10 - 1)}'
+        if rng.random() < 0.4:
+            values['Number of Folders'] = str( rng.randint(1, 12) )
+        if rng.random() < 0.1:
+            values['Notes'] = 'see also ' + ' '.join( rng.choice(WORDS) for _ in range(8) )
+        yield ( str(i + 1), values )
+
+
+def write_synthetic_export( output_path: str, row_count: int, seed: int = 1 ) -> None:
+    """ Writes a filemaker-pro xml export of `row_count` synthetic rows, in the real export's layout.
+        Called by dundermain, and by the benchmark and performance-test modules. """
+    with open( output_path, 'w', encoding='utf-8' ) as f:
+        f.write( '<?xml version="1.0" encoding="UTF-8" ?>\n' )
+        f.write( '<FMPXMLRESULT xmlns="http://www.filemaker.com/fmpxmlresult"><ERRORCODE>0</ERRORCODE><PRODUCT BUILD="" NAME="FileMaker" VERSION="ProAdvanced 19"/>' )
+        f.write( f'<DATABASE DATEFORMAT="M/d/yyyy" LAYOUT="" NAME="HH.fmp12" RECORDS="{row_count}" TIMEFORMAT="h:mm:ss a"/><METADATA>' )
+        for name in FIELD_NAMES:
+            max_repeat = '2' if '::' in name else '1'
+            f.write( f'<FIELD EMPTYOK="YES" MAXREPEAT="{max_repeat}" NAME="{escape(name)}" TYPE="{FIELD_TYPES.get(name, "TEXT")}"/>' )
+        f.write( f'</METADATA><RESULTSET FOUND="{row_count}">' )
+        for ( record_id, values ) in iter_synthetic_rows( row_count, seed ):
+            cols = []
+            for name in FIELD_NAMES:
+                value = values.get( name )
+                cols.append( f'<COL><DATA>{escape(value)}</DATA></COL>' if value is not None else '<COL></COL>' )
+            f.write( f'<ROW MODID="1" RECORDID="{record_id}">{"".join(cols)}</ROW>' )
+        f.write( '</RESULTSET></FMPXMLRESULT>\n' )
+    log.debug( f'wrote ``{row_count}`` synthetic rows to ``{output_path}``' )
+    return
+
+
+def make_synthetic_items( row_count: int, seed: int = 1 ) -> dict:
+    """ Returns a converter-style `{'__meta__': ..., 'items': ...}` dict, without the cost of writing and converting xml.
+        Value-types follow the converter's rules: related-table fields are lists, NUMBER fields are ints.
+        Called by the benchmark and performance-test modules. """
+    items = {}
+    for ( record_id, values ) in iter_synthetic_rows( row_count, seed ):
+        item = { 'row_MODID': '1', 'row_RECORDID': record_id }
+        for name in FIELD_NAMES:
+            value = values.get( name )
+            if FIELD_TYPES.get( name ) == 'NUMBER' and value is not None:
+                value = int( value )
+            item[name] = [ value ] if '::' in name else value
+        items[record_id] = item
+    return { '__meta__': {'count': len(items), 'synthetic': True}, 'items': items }
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Writes a synthetic filemaker-pro xml export.' )
+    parser.add_argument( '--output_path', type=str, help='path to output xml file' )
+    parser.add_argument( '--row_count', type=int, default=10000, help='number of rows (default 10000)' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    write_synthetic_export( args.output_path, args.row_count )
+    log.debug( 'done' )
@@ -0,0 +1,80 @@
+""" 
+Tests the analyze_duplicates.py script.
+"""
+
+import json, logging, os, tempfile, unittest
+
+from analyze_duplicates import analyze_duplicates
+from convert_fmproxml_to_json import SourceDictMaker
+from hh_xml.converted_data import load_items
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestAnalyzeDuplicates( unittest.TestCase ):
+    """ Tests the analyze_duplicates.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_analyze_duplicates_matches_converter( self ):
+        """ Tests that the bounded-memory duplicate analysis finds the same Record ID groups as the converter, for numeric and spilled values. """
+        record_ids = [ '7', 'A-1', '12', '7', '01', '1', 'A-1', None, '12', '7', 'b' ]
+        xml = make_export_xml( [ (str(i), {'Record ID': record_id}) for (i, record_id) in enumerate(record_ids, start=1) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, os.path.join(temp_dir, 'output.json') )
+            with open( os.path.join(temp_dir, 'output.json'), 'r' ) as f:
+                expected_groups = json.loads( f.read() )['__meta__']['duplicate_groups']
+            report = analyze_duplicates( xml_path, os.path.join(temp_dir, 'duplicates.json'), partitions=3 )
+        self.assertEqual( {'7': ['1', '4', '10'], '12': ['3', '9'], 'A-1': ['2', '7']}, report['duplicate_groups'] )
+        self.assertEqual( expected_groups, report['duplicate_groups'] )
+        self.assertEqual( 1, report['__meta__']['rows_without_record_id'] )
+        self.assertEqual( 4, report['__meta__']['spilled_record_ids'] )  # 'A-1' twice, '01', 'b'
+
+    def test_analyze_duplicates_number_typed_json( self ):
+        """ Tests the duplicate analysis of a converted json whose Record ID is NUMBER-typed (so int values), including a value too big for the bitmap. """
+        record_ids = [ '7', '12', '7', None, '99999999999', '12', '99999999999' ]
+        xml = make_export_xml( [ (str(i), {'Record ID': record_id}) for (i, record_id) in enumerate(record_ids, start=1) ], field_types={'Record ID': 'NUMBER'} )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( xml_path, json_path ) = ( os.path.join(temp_dir, 'export.xml'), os.path.join(temp_dir, 'output.json') )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            self.assertEqual( 7, load_items(json_path)['1']['Record ID'] )
+            report = analyze_duplicates( json_path, os.path.join(temp_dir, 'duplicates.json') )
+        self.assertEqual( {'7': ['1', '3'], '12': ['2', '6'], '99999999999': ['5', '7']}, report['duplicate_groups'] )
+        self.assertEqual( 2, report['__meta__']['spilled_record_ids'] )
+        self.assertLess( report['__meta__']['bitmap_bytes'], 100 )
+
+    def test_analyze_duplicates_normalizes_like_converter( self ):
+        """ Tests that Record IDs differing only in whitespace or unicode form are grouped as the converter groups them, from the xml and from the json. """
+        record_ids = [ 'A 1', ' A  1 ', 'A\t1', 'Cafe\u0301', 'Caf\u00e9', '7', ' 7', '   ', '   ', 'B 2' ]
+        xml = make_export_xml( [ (str(i), {'Record ID': record_id}) for (i, record_id) in enumerate(record_ids, start=1) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( xml_path, json_path ) = ( os.path.join(temp_dir, 'export.xml'), os.path.join(temp_dir, 'output.json') )
+            with open( xml_path, 'w', encoding='utf-8' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            with open( json_path, 'r', encoding='utf-8' ) as f:
+                expected_groups = json.loads( f.read() )['__meta__']['duplicate_groups']
+            xml_report = analyze_duplicates( xml_path, os.path.join(temp_dir, 'duplicates_xml.json'), partitions=2 )
+            json_report = analyze_duplicates( json_path, os.path.join(temp_dir, 'duplicates_json.json'), partitions=2 )
+        self.assertEqual( {'A 1': ['1', '2', '3'], 'Caf\u00e9': ['4', '5'], '7': ['6', '7'], '': ['8', '9']}, expected_groups )
+        self.assertEqual( expected_groups, xml_report['duplicate_groups'] )
+        self.assertEqual( expected_groups, json_report['duplicate_groups'] )
+
+## end class TestAnalyzeDuplicates()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,20 @@
 """ 
-Tests the convert_fmproxml_to_json.py module.
+Tests the convert_fmproxml_to_json.py module, and the row-conversion it inherits from hh_xml/fm_rows.py.
 """
 
-import logging, pprint, unittest
+import bz2, gzip, json, logging, lzma, os, tempfile, time, unittest
+from unittest import mock
 
-from convert_fmproxml_to_json import SourceDictMaker
+import convert_fmproxml_to_json, make_csv_100
+from convert_fmproxml_to_json import SourceDictMaker, convert_batch
+from hh_xml.converted_data import load_items, open_lazy_items
+from make_csv_rest import project_rows, write_tsv, write_tsv_parallel
+from row_filters import RowFilter
+from test_helpers import make_export_xml
+from validate_fmpro_export import DEFAULT_SCHEMA
 
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
-log = logging.getLogger( '__name__' )
+log = logging.getLogger( __name__ )
 
 
 class TestConvertXml( unittest.TestCase ):
@@ -193,6 +196,259 @@ class TestConvertXml( unittest.TestCase ):
 
         # end test_dictify_data()
 
+    def test_dictify_data_duplicates( self ):
+        """ Tests that _dictify_data() makes deterministic keys for repeated RECORDIDs, and reports "Record ID" groups. """
+        converter = SourceDictMaker()
+        test_data = [
+            {'Record ID': '188135', 'row_RECORDID': 'abc'},
+            {'Record ID': '188136', 'row_RECORDID': 'abc'},
+            {'Record ID': '188135', 'row_RECORDID': 'ghi'},
+            {'Record ID': '188135', 'row_RECORDID': 'abc'},
+        ]
+        actual = converter._dictify_data( test_data )
+        self.assertEqual( ['abc', 'abc___2', 'ghi', 'abc___3'], list(actual['items'].keys()) )
+        self.assertEqual( ['188135', '188135'], actual['__meta__']['duplicates'] )
+        self.assertEqual( {'188135': ['abc', 'ghi', 'abc___3']}, actual['__meta__']['duplicate_groups'] )
+        self.assertEqual( ['abc', 'abc'], actual['__meta__']['duplicate_row_RECORDIDs'] )
+
+    def test_convert_rejects_bad_export( self ):
+        """ Tests that the pre-conversion check fails on a missing field, before any json is written. """
+        field_names = [ f['NAME'] for f in DEFAULT_SCHEMA if f['NAME'] != 'Notes' ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            json_path = os.path.join( temp_dir, 'output.json' )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml([('1', {'Item': 'an item'})], field_names=field_names) )
+            with self.assertRaises( Exception ) as context:
+                SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            self.assertIn( 'Notes', str(context.exception) )
+            self.assertFalse( os.path.exists(json_path) )
+
+    def test_convert_uses_field_schema( self ):
+        """ Tests that list-vs-scalar and native types come from the FIELD attributes, not from the data. """
+        xml = make_export_xml(
+            [ ('1', {'Item': ' an item ', 'Number of Folders': '3', 'Book_Date': '1/2/1999', 'Organization::Name': 'an org'}),
+              ('2', {'Item': 'another item', 'Number of Folders': '2.5', 'Book_Date': 'unknown'}) ],
+            field_types={'Number of Folders': 'NUMBER', 'Book_Date': 'DATE'} )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            json_path = os.path.join( temp_dir, 'output.json' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            with open( json_path, 'r' ) as f:
+                items = json.loads( f.read() )['items']
+        self.assertEqual( 'an item', items['1']['Item'] )
+        self.assertEqual( 3, items['1']['Number of Folders'] )
+        self.assertEqual( 2.5, items['2']['Number of Folders'] )
+        self.assertEqual( '1999-01-02', items['1']['Book_Date'] )
+        self.assertEqual( 'unknown', items['2']['Book_Date'] )  # unparseable values are kept as-is
+        self.assertEqual( ['an org'], items['1']['Organization::Name'] )  # related-table field is always a list
+        self.assertEqual( [None], items['2']['Organization::Name'] )
+        self.assertEqual( None, items['2']['Notes'] )
+
+    def test_convert_projects_fields( self ):
+        """ Tests that a field-projection keeps only the requested fields, in export order, and rejects unknown field-names. """
+        xml = make_export_xml( [ ('1', {'Organization ID': 'HH_1', 'Item': 'an item', 'Notes': 'a note', 'Box Number': '2'}) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            maker = SourceDictMaker()
+            maker.fields = [ 'Item', 'Organization ID', 'Box Number' ]
+            items = list( maker.iter_item_dicts(xml_path) )
+            self.assertEqual( {'row_MODID': '1', 'row_RECORDID': '1', 'Organization ID': 'HH_1', 'Box Number': '2', 'Item': 'an item'}, items[0] )
+            self.assertEqual( ['row_MODID', 'row_RECORDID', 'Organization ID', 'Box Number', 'Item'], list(items[0].keys()) )
+            self.assertEqual( [{'Item': 'an item', 'Organization ID': 'HH_1'}], project_rows(items, ['Item', 'Organization ID']) )
+            maker.fields = [ 'Item', 'Not A Field' ]
+            with self.assertRaises( Exception ) as context:
+                list( maker.iter_item_dicts(xml_path) )
+            self.assertIn( 'Not A Field', str(context.exception) )
+
+    def test_row_filter_skips_rows_during_parse( self ):
+        """ Tests that row-filters (orgs, Record ID ranges, Type) skip rows before conversion, and that make_csv_100 on the xml matches its output on the json. """
+        rows = [ (str(i), {'Organization ID': f'HH_0{30652 + i % 3}', 'Record ID': str(i), 'Type': 'Book' if i % 2 else 'Folder', 'Box Number': str(10 - i)}) for i in range(1, 10) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml(rows) )
+            maker = SourceDictMaker()
+            converted_ids = []
+            original_process_row = maker._process_row
+            def tracking_process_row( row, field_schema ):
+                converted_ids.append( row.attrib['RECORDID'] )
+                return original_process_row( row, field_schema )
+            maker._process_row = tracking_process_row
+            maker.row_filter = RowFilter( include_orgs={'HH_030652', 'HH_030653'}, record_id_ranges=[(1, 3), (7, 9)] )
+            self.assertEqual( ['1', '3', '7', '9'], [item['row_RECORDID'] for item in maker.iter_item_dicts(xml_path)] )
+            self.assertEqual( ['1', '3', '7', '9'], converted_ids )  # the others never reached the dict-building
+            maker.row_filter = RowFilter( exclude_orgs={'HH_030652'}, types={'Folder'} )
+            self.assertEqual( ['2', '4', '8'], [item['row_RECORDID'] for item in maker.iter_item_dicts(xml_path)] )
+            ## make_csv_100 reads the xml directly, with the same output as from the converted json
+            json_path = os.path.join( temp_dir, 'output.json' )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            ( json_dir, xml_dir ) = ( os.path.join(temp_dir, 'from_json'), os.path.join(temp_dir, 'from_xml') )
+            os.makedirs( json_dir )
+            os.makedirs( xml_dir )
+            make_csv_100.make_csv_from_fmpro_json( json_path, json_dir )
+            make_csv_100.make_csv_from_fmpro_json( xml_path, xml_dir )
+            tsv_texts = []
+            for output_dir in ( json_dir, xml_dir ):
+                with open( os.path.join(output_dir, os.listdir(output_dir)[0]), 'r' ) as f:
+                    tsv_texts.append( f.read() )
+        self.assertEqual( tsv_texts[0], tsv_texts[1] )
+        self.assertEqual( 4, tsv_texts[1].count('\n') )  # header, and the 3 rows of the one target org
+
+    def test_convert_normalizes_text( self ):
+        """ Tests NFC-normalization, whitespace-collapsing, and line-separator conversion of DATA values. """
+        xml = make_export_xml( [
+            ('1', {'Item': '  Cafe\u0301   records\t(1970) ', 'Notes': 'line one  &#13;&#10;  line two&#13;line three'}),
+            ('2', {'Item': '  Cafe\u0301   records\t(1970) '}) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            maker = SourceDictMaker()
+            items = { item['row_RECORDID']: item for item in maker.iter_item_dicts(xml_path) }
+        self.assertEqual( 'Caf\u00e9 records (1970)', items['1']['Item'] )
+        self.assertEqual( 'line one\nline two\nline three', items['1']['Notes'] )
+        self.assertEqual( 'a\nb', maker.text_normalizer.normalize('a \x0b b') )  # filemaker's vertical-tab line-separator
+        stats = maker.text_normalizer.stats()
+        self.assertEqual( 1, stats['hits'] )  # the repeated Item value, across the two rows
+        self.assertEqual( 3, stats['changed_values'] )
+
+    def test_chunked_conversion_resumes( self ):
+        """ Tests that a chunked conversion killed partway resumes at the first unfinished chunk, and merges to the same items as a plain conversion. """
+        xml = make_export_xml( [ (str(i), {'Item': f'item {i}', 'Record ID': str(i % 4)}) for i in range(1, 12) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            parts_dir = os.path.join( temp_dir, 'parts' )
+            ( plain_path, chunked_path ) = ( os.path.join(temp_dir, 'plain.json'), os.path.join(temp_dir, 'chunked.json') )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, plain_path )
+            ## first run dies while saving the third part
+            maker = SourceDictMaker()
+            original_save_part = maker._save_part
+            def failing_save_part( chunk, parts_dir_arg, manifest ):
+                if len( manifest['parts'] ) == 2:
+                    raise Exception( 'simulated crash' )
+                original_save_part( chunk, parts_dir_arg, manifest )
+            maker._save_part = failing_save_part
+            with self.assertRaises( Exception ):
+                maker.convert_fmproxml_to_json_chunked( xml_path, parts_dir, chunked_path, chunk_size=4 )
+            with open( os.path.join(parts_dir, 'checkpoint.json'), 'r' ) as f:
+                self.assertEqual( [4, 4], [part['row_count'] for part in json.loads(f.read())['parts']] )
+            ## second run converts only the remaining rows
+            maker = SourceDictMaker()
+            converted_ids = []
+            original_process_row = maker._process_row
+            def tracking_process_row( row, field_schema ):
+                converted_ids.append( row.attrib['RECORDID'] )
+                return original_process_row( row, field_schema )
+            maker._process_row = tracking_process_row
+            maker.convert_fmproxml_to_json_chunked( xml_path, parts_dir, chunked_path, chunk_size=4 )
+            self.assertEqual( ['9', '10', '11'], converted_ids )
+            self.assertEqual( [], os.listdir(parts_dir) )  # parts removed once merged
+            with open( plain_path, 'r' ) as f:
+                plain = json.loads( f.read() )
+            with open( chunked_path, 'r' ) as f:
+                chunked = json.loads( f.read() )
+        self.assertEqual( plain['items'], chunked['items'] )
+        self.assertEqual( plain['__meta__']['duplicate_groups'], chunked['__meta__']['duplicate_groups'] )
+
+    def test_batch_conversion_skips_up_to_date( self ):
+        """ Tests that batch mode converts each export, then skips the unchanged ones on a re-run, by mtime and by hash. """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( input_dir, output_dir ) = ( os.path.join(temp_dir, 'exports'), os.path.join(temp_dir, 'jsons') )
+            os.makedirs( input_dir )
+            for ( name, row_count ) in ( ('small', 2), ('large', 6) ):
+                with open( os.path.join(input_dir, f'{name}.xml'), 'w' ) as f:
+                    f.write( make_export_xml([ (str(i), {'Item': f'{name} {i}'}) for i in range(1, row_count + 1) ]) )
+            summary = convert_batch( input_dir, output_dir, workers=2 )
+            self.assertEqual( (2, 0, 0, 8), (summary['converted'], summary['skipped'], summary['failed'], summary['items']) )
+            with open( os.path.join(output_dir, 'large.json'), 'r' ) as f:
+                self.assertEqual( 6, json.loads(f.read())['__meta__']['count'] )
+            self.assertEqual( 2, convert_batch(input_dir, output_dir, workers=2)['skipped'] )
+            ## a changed export is re-converted by the hash-check, even with an older mtime
+            small_path = os.path.join( input_dir, 'small.xml' )
+            with open( small_path, 'w' ) as f:
+                f.write( make_export_xml([('1', {'Item': 'changed'})]) )
+            os.utime( small_path, (0, 0) )
+            summary = convert_batch( input_dir, output_dir, workers=2, up_to_date_check='hash' )
+            self.assertEqual( (1, 1), (summary['converted'], summary['skipped']) )
+            ## an edit to any module shaping the output (not just the converter-file) re-converts everything, by either check
+            module_names = [ os.path.relpath(path, os.path.dirname(convert_fmproxml_to_json.__file__)) for path in convert_fmproxml_to_json.converter_source_paths() ]
+            self.assertTrue( {'row_filters.py', os.path.join('hh_xml', 'text_normalizer.py'), os.path.join('hh_xml', 'fm_rows.py'), os.path.join('hh_xml', 'serializer.py')} <= set(module_names) )
+            helper_path = os.path.join( temp_dir, 'helper_module.py' )
+            with open( helper_path, 'w' ) as f:
+                f.write( 'VERSION = 1\n' )
+            with mock.patch( 'convert_fmproxml_to_json.converter_source_paths', return_value=[helper_path] ):
+                self.assertEqual( 2, convert_batch(input_dir, output_dir, workers=2, up_to_date_check='hash')['converted'] )
+                self.assertEqual( 2, convert_batch(input_dir, output_dir, workers=2, up_to_date_check='hash')['skipped'] )
+                with open( helper_path, 'w' ) as f:
+                    f.write( 'VERSION = 2\n' )
+                self.assertEqual( 2, convert_batch(input_dir, output_dir, workers=2, up_to_date_check='hash')['converted'] )
+                os.utime( helper_path, (time.time() + 60, time.time() + 60) )  # newer than the outputs
+                self.assertEqual( 2, convert_batch(input_dir, output_dir, workers=2)['converted'] )
+
+    def test_convert_saves_org_rollups( self ):
+        """ Tests the per-org aggregates computed during conversion, and that a reused maker starts each conversion's rollups afresh. """
+        xml = make_export_xml(
+            [ ('1', {'Organization ID': 'HH_1', 'Box Number': '78B', 'Barcode 1': '31', 'Barcode 2': '32', 'Number of Folders': '2', 'Organization::Name': 'org one'}),
+              ('2', {'Organization ID': 'HH_1', 'Box Number': '78B', 'Number of Folders': '3', 'Organization::Name': 'org one'}),
+              ('3', {'Organization ID': 'HH_2', 'Box Number': 'M-47'}),
+              ('4', {'Item': 'no org'}) ],
+            field_types={'Number of Folders': 'NUMBER'} )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            rollup_path = os.path.join( temp_dir, 'rollups.json' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            maker = SourceDictMaker()
+            maker.convert_fmproxml_to_json( xml_path, os.path.join(temp_dir, 'output.json'), ROLLUP_OUTPUT_PATH=rollup_path )
+            with open( rollup_path, 'r' ) as f:
+                rollup_data = json.loads( f.read() )
+            ## a reused maker (as in batch mode) doesn't carry the previous conversion's rollups
+            maker.convert_fmproxml_to_json( xml_path, os.path.join(temp_dir, 'output.json') )
+            self.assertIsNone( maker.org_rollup )
+            maker.convert_fmproxml_to_json( xml_path, os.path.join(temp_dir, 'output.json'), ROLLUP_OUTPUT_PATH=rollup_path )
+            with open( rollup_path, 'r' ) as f:
+                self.assertEqual( rollup_data['orgs'], json.loads(f.read())['orgs'] )
+        self.assertEqual(
+            {'item_count': 2, 'box_count': 1, 'boxes': ['78B'], 'barcode_count': 2, 'folder_total': 5, 'names': ['org one'], 'record_ids': ['1', '2']},
+            rollup_data['orgs']['HH_1'] )
+        self.assertEqual( ['HH_1', 'HH_2'], list(rollup_data['orgs'].keys()) )
+        self.assertEqual( ['4'], rollup_data['__meta__']['items_without_org'] )
+
+    def test_compressed_input_and_output( self ):
+        """ Tests that compressed exports convert like plain ones, that a .gz output reads back (also lazily), and that a compressed parallel tsv decompresses to the plain one. """
+        xml = make_export_xml( [ (str(i), {'Organization ID': f'HH_{i % 3}', 'Item': f'item “{i}”'}) for i in range(1, 8) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            plain_xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( plain_xml_path, 'w', encoding='utf-8' ) as f:
+                f.write( xml )
+            plain_json_path = os.path.join( temp_dir, 'plain.json' )
+            SourceDictMaker().convert_fmproxml_to_json( plain_xml_path, plain_json_path )
+            plain_items = load_items( plain_json_path )
+            for ( codec, module ) in ( ('.gz', gzip), ('.bz2', bz2), ('.xz', lzma) ):
+                xml_path = os.path.join( temp_dir, f'export_misnamed{codec}' if codec == '.xz' else f'export.xml{codec}' )  # .xz is detected by its magic bytes
+                with module.open( xml_path, 'wt', encoding='utf-8' ) as f:
+                    f.write( xml )
+                json_path = os.path.join( temp_dir, f'output{codec}.json.gz' )
+                SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+                with open( json_path, 'rb' ) as f:
+                    self.assertEqual( b'\x1f\x8b', f.read(2) )
+                self.assertEqual( plain_items, load_items(json_path) )
+            lazy_items = open_lazy_items( json_path )
+            self.assertEqual( plain_items['3'], lazy_items['3'] )
+            lazy_items.close()
+            rows = list( plain_items.values() )
+            with open( write_tsv(rows, temp_dir), 'rb' ) as f:
+                plain_tsv = f.read()
+            with gzip.open( write_tsv_parallel(rows, 2, temp_dir, compression='gzip'), 'rb' ) as f:
+                self.assertEqual( plain_tsv, f.read() )
+
 ## end class TestConvertXml()
 
 
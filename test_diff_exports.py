@@ -0,0 +1,49 @@
+""" 
+Tests the diff_exports.py script.
+"""
+
+import json, logging, os, tempfile, unittest
+
+from convert_fmproxml_to_json import SourceDictMaker
+from diff_exports import diff_exports
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestDiffExports( unittest.TestCase ):
+    """ Tests the diff_exports.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_diff_exports( self ):
+        """ Tests the change-feed between a converted json file and a later xml export, with the xml externally sorted in several runs. """
+        old_rows = [ (str(i), {'Item': f'item {i}', 'Box Number': '1'}) for i in range(1, 13) ]
+        new_rows = [ (str(i), {'Item': f'item {i}', 'Box Number': '2' if i == 9 else '1'}) for i in range(12, 0, -1) if i != 4 ] + [ ('13', {'Item': 'new item'}) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( old_xml_path, new_xml_path ) = ( os.path.join(temp_dir, 'old.xml'), os.path.join(temp_dir, 'new.xml') )
+            ( json_path, feed_path ) = ( os.path.join(temp_dir, 'old.json'), os.path.join(temp_dir, 'changes.jsonl') )
+            for ( path, rows ) in ( (old_xml_path, old_rows), (new_xml_path, new_rows) ):
+                with open( path, 'w' ) as f:
+                    f.write( make_export_xml(rows) )
+            SourceDictMaker().convert_fmproxml_to_json( old_xml_path, json_path )
+            counts = diff_exports( json_path, new_xml_path, feed_path, run_size=5 )
+            with open( feed_path, 'r' ) as f:
+                changes = [ json.loads(line) for line in f ]
+        self.assertEqual( {'added': 1, 'removed': 1, 'modified': 1, 'unchanged': 10}, counts )
+        self.assertEqual( [('removed', '4'), ('modified', '9'), ('added', '13')], [(change['change'], change['key']) for change in changes] )  # numeric RECORDID order
+        self.assertEqual( {'Box Number': {'old': '1', 'new': '2'}}, changes[1]['fields'] )
+        self.assertEqual( 'new item', changes[2]['item']['Item'] )
+
+## end class TestDiffExports()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Shared fixtures for the test-modules.
+
+Importing it also configures logging, as each test-module used to.
+"""
+
+import logging
+
+from validate_fmpro_export import DEFAULT_SCHEMA
+
+
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
+    datefmt='%d/%b/%Y %H:%M:%S' )
+log = logging.getLogger( __name__ )
+
+
+def make_export_xml( rows: list, field_names: list = None, field_types: dict = None ) -> str:
+    """ Returns a small filemaker-pro xml export string.
+        `rows` is a list of ( RECORDID, {field-name: value-or-list-of-values} ) tuples; unlisted fields are empty.
+        `field_types` maps field-names to a TYPE other than TEXT.
+        Called by the test-modules. """
+    field_names = field_names if field_names is not None else [ f['NAME'] for f in DEFAULT_SCHEMA ]
+    field_types = field_types if field_types is not None else {}
+    parts = [ '<?xml version="1.0" encoding="UTF-8" ?>',
+        '<FMPXMLRESULT xmlns="http://www.filemaker.com/fmpxmlresult"><ERRORCODE>0</ERRORCODE>',
+        '<DATABASE DATEFORMAT="M/d/yyyy" LAYOUT="" NAME="HH.fmp12" RECORDS="1" TIMEFORMAT="h:mm:ss a"/><METADATA>' ]
+    for name in field_names:
+        max_repeat = '2' if '::' in name else '1'
+        parts.append( f'<FIELD EMPTYOK="YES" MAXREPEAT="{max_repeat}" NAME="{name}" TYPE="{field_types.get(name, "TEXT")}"/>' )
+    parts.append( f'</METADATA><RESULTSET FOUND="{len(rows)}">' )
+    for ( record_id, values ) in rows:
+        parts.append( f'<ROW MODID="1" RECORDID="{record_id}">' )
+        for name in field_names:
+            value = values.get( name )
+            value_list = value if type(value) == list else ( [value] if value is not None else [] )
+            parts.append( '<COL>' + ''.join( f'<DATA>{v}</DATA>' for v in value_list ) + '</COL>' )
+        parts.append( '</ROW>' )
+    parts.append( '</RESULTSET></FMPXMLRESULT>' )
+    return ''.join( parts )
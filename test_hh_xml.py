@@ -0,0 +1,173 @@
+""" 
+Tests the hh_xml package's converted_data.py, serializer.py, progress_reporter.py and logging_setup.py modules.
+"""
+
+import json, logging, os, tempfile, unittest
+from unittest import mock
+
+from convert_fmproxml_to_json import SourceDictMaker
+from hh_xml import serializer
+from hh_xml.converted_data import PICKLE_MAGIC, load_converted_data, load_items, open_lazy_items
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestConvertedData( unittest.TestCase ):
+    """ Tests the hh_xml/converted_data.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_lazy_items_match_json( self ):
+        """ Tests that the lazy, index-backed view of the output returns the same items as a full json load. """
+        xml = make_export_xml( [ (str(i), {'Item': f'item “{i}”', 'Organization::Name': ['org a', 'org b']}) for i in range(1, 6) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            json_path = os.path.join( temp_dir, 'output.json' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            with open( json_path, 'r' ) as f:
+                expected = json.loads( f.read() )['items']
+            for _ in range( 2 ):  # second pass uses the saved index
+                lazy_items = open_lazy_items( json_path )
+                self.assertTrue( os.path.exists(f'{json_path}.idx') )
+                self.assertEqual( sorted(expected.keys()), list(lazy_items.keys()) )
+                self.assertEqual( expected['3'], lazy_items['3'] )
+                self.assertEqual( expected, dict(lazy_items.items()) )
+                lazy_items.close()
+
+    def test_snapshot_matches_json( self ):
+        """ Tests that a snapshot round-trips to the same dict as the json, that the format is auto-detected, and that lazy keys survive canonical-mode `\\uXXXX` escapes. """
+        rows = [ ('1', {'Item': 'plain'}), ('café', {'Item': 'naïve “quoted”'}), ('€5', {'Item': 'euro'}) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w', encoding='utf-8' ) as f:
+                f.write( make_export_xml(rows) )
+            for canonical_json in ( False, True ):
+                ( json_path, snapshot_path ) = ( os.path.join(temp_dir, f'output_{canonical_json}.json'), os.path.join(temp_dir, f'output_{canonical_json}.pickle') )
+                maker = SourceDictMaker()
+                maker.canonical_json = canonical_json
+                maker.convert_fmproxml_to_json( xml_path, json_path, snapshot_path )
+                with open( snapshot_path, 'rb' ) as f:
+                    self.assertEqual( PICKLE_MAGIC, f.read(2) )
+                with open( json_path, 'rb' ) as f:
+                    self.assertEqual( canonical_json, b'\\u00e9' in f.read() )  # canonical mode ascii-escapes
+                json_data = load_converted_data( json_path )
+                self.assertEqual( json_data, load_converted_data(snapshot_path) )
+                self.assertEqual( ['1', 'café', '€5'], sorted(load_items(snapshot_path)) )
+                lazy_items = open_lazy_items( json_path )
+                self.assertEqual( json_data['items'], dict(lazy_items.items()) )
+                lazy_items.close()
+
+## end class TestConvertedData()
+
+
+class TestSerializer( unittest.TestCase ):
+    """ Tests the hh_xml/serializer.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    @unittest.skipUnless( isinstance(serializer.BACKEND, serializer.OrjsonBackend), 'orjson not installed' )
+    def test_serializer_backends_match( self ):
+        """ Tests that orjson and stdlib encode the same bytes (including int dict-keys, without a fallback), and that canonical mode is byte-stable. """
+        data = { '__meta__': {'count': 2, 'duplicate_groups': {7: ['1', '4'], 12: ['3']}}, 'items': {'1': {'Item': 'Café “quoted”', 'Number': 3, 'Date': None, 'List': [None, 1.5]}} }
+        ( orjson_backend, stdlib_backend ) = ( serializer.OrjsonBackend(__import__('orjson')), serializer.StdlibBackend() )
+        with mock.patch.object( orjson_backend.fallback, 'dumps', side_effect=AssertionError('fell back to stdlib') ):
+            orjson_bytes = orjson_backend.dumps( data )
+        self.assertEqual( stdlib_backend.dumps(data), orjson_bytes )
+        self.assertEqual( stdlib_backend.dumps(data, pretty=True), orjson_backend.dumps(data, pretty=True) )
+        self.assertEqual( stdlib_backend.loads(orjson_bytes), orjson_backend.loads(orjson_bytes) )
+        reordered = { 'items': data['items'], '__meta__': data['__meta__'] }
+        canonical: bytes = serializer.dumps( data, canonical=True )
+        self.assertEqual( canonical, serializer.dumps(reordered, canonical=True) )
+        self.assertTrue( canonical.startswith(b'{\n  "__meta__": {\n    "count": 2,\n    "duplicate_groups": {\n      "7": [') )
+        self.assertIn( b'"Item": "Caf\\u00e9 \\u201cquoted\\u201d"', canonical )  # ascii-escaped, as the older output files are
+
+## end class TestSerializer()
+
+
+class TestProgressReporter( unittest.TestCase ):
+    """ Tests the hh_xml/progress_reporter.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_progress_reporter_interval( self ):
+        """ Tests that progress logs at most once per interval, with the rate and eta, and once more on finish. """
+        now: list = [ 100.0 ]
+        logger = mock.Mock()
+        logger.isEnabledFor.return_value = True
+        progress = ProgressReporter( 'rows', total=100, interval_seconds=5.0, logger=logger, clock=lambda: now[0] )
+        for _ in range( 10 ):
+            now[0] += 0.4
+            progress.update()
+        self.assertEqual( 0, logger.log.call_count )  # 4s in; interval not yet reached
+        now[0] += 1.0
+        progress.update( 15 )
+        self.assertEqual( 1, logger.log.call_count )
+        self.assertEqual( 'rows: 25/100 (25.0%); 5 rows/s; eta 15.0s', logger.log.call_args.args[1] )
+        now[0] += 4.9
+        progress.update()
+        self.assertEqual( 1, logger.log.call_count )  # the next interval runs from the last report, not from the start
+        now[0] += 0.1
+        progress.update( 4 )
+        self.assertEqual( 2, logger.log.call_count )
+        progress.finish()
+        self.assertEqual( 'rows: 30/100 (30.0%); 3 rows/s; eta 23.3s; done', logger.log.call_args.args[1] )
+        logger.isEnabledFor.return_value = False
+        quiet = ProgressReporter( 'rows', interval_seconds=0.0, logger=logger, clock=lambda: now[0] )
+        quiet.update()
+        quiet.finish()
+        self.assertEqual( ( 3, 1 ), (logger.log.call_count, quiet.count) )
+
+## end class TestProgressReporter()
+
+
+class TestLoggingSetup( unittest.TestCase ):
+    """ Tests the hh_xml/logging_setup.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_configure_logging_level_names( self ):
+        """ Tests that LOGLEVEL is case-insensitive, and that an unknown value falls back to DEBUG with a warning rather than a KeyError. """
+        for ( env_value, expected_level ) in ( ('info', logging.INFO), (' Warning ', logging.WARNING), ('', logging.DEBUG) ):
+            with mock.patch.dict( os.environ, {'LOGLEVEL': env_value} ), mock.patch( 'logging.basicConfig' ) as basic_config:
+                configure_logging()
+            self.assertEqual( expected_level, basic_config.call_args.kwargs['level'] )
+        with mock.patch.dict( os.environ, {'LOGLEVEL': 'verbose'} ), mock.patch( 'logging.basicConfig' ) as basic_config, self.assertLogs( 'hh_xml.logging_setup', logging.WARNING ) as logged:
+            configure_logging()
+        self.assertEqual( logging.DEBUG, basic_config.call_args.kwargs['level'] )
+        self.assertIn( 'VERBOSE', logged.output[0] )
+
+## end class TestLoggingSetup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+""" 
+Tests the join_scan_manifest.py script.
+"""
+
+import json, logging, os, tempfile, unittest
+
+from convert_fmproxml_to_json import SourceDictMaker
+from join_scan_manifest import join_scan_manifest
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestJoinScanManifest( unittest.TestCase ):
+    """ Tests the join_scan_manifest.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_join_scan_manifest( self ):
+        """ Tests the manifest join: exact matches (barcode; org + box), the org-only fallback, and unmatched rows (including a box number without its org). """
+        rows = [
+            ( '1', {'Organization ID': 'HH_1', 'Box Number': '5', 'Barcode 1': '31236000000001'} ),
+            ( '2', {'Organization ID': 'HH_1', 'Box Number': '6'} ),
+            ( '3', {'Organization ID': 'HH_2', 'Box Number': '5'} ) ]
+        manifest = [
+            ( 'scan_a', '31236000000001', '', '' ),  # barcode
+            ( 'scan_b', '', '6', 'HH_1' ),  # org + box
+            ( 'scan_c', '', '', 'HH_2' ),  # org alone
+            ( 'scan_d', '', '5', '' ),  # box alone: ambiguous across orgs
+            ( 'scan_e', '99999', '', '' ),  # unknown barcode
+            ( 'scan_f', '', '7', 'HH_1' ) ]  # no such box in the org
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( xml_path, json_path ) = ( os.path.join(temp_dir, 'export.xml'), os.path.join(temp_dir, 'output.json') )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml(rows) )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            manifest_path = os.path.join( temp_dir, 'scans.tsv' )
+            with open( manifest_path, 'w' ) as f:
+                f.write( 'scan_id\tbarcode\tbox_number\torganization_id\n' + ''.join('\t'.join(row) + '\n' for row in manifest) )
+            ( pages_path, unmatched_path ) = ( os.path.join(temp_dir, 'pages.json'), os.path.join(temp_dir, 'unmatched.tsv') )
+            counts = join_scan_manifest( json_path, manifest_path, pages_path, unmatched_path )
+            with open( pages_path, 'r' ) as f:
+                pages = json.loads( f.read() )['pages']
+            with open( unmatched_path, 'r' ) as f:
+                unmatched_scan_ids = [ line.split('\t')[0] for line in f.read().splitlines()[1:] ]
+        self.assertEqual( {'1': ['scan_a'], '2': ['scan_b'], '3': ['scan_c']}, pages )
+        self.assertEqual( ['scan_d', 'scan_e', 'scan_f'], unmatched_scan_ids )
+        self.assertEqual( {'barcode': 1, 'org_box': 1, 'org': 1}, counts['matched_by'] )
+        self.assertEqual( 0, counts['items_without_scans'] )
+
+## end class TestJoinScanManifest()
+
+
+if __name__ == '__main__':
+    unittest.main()
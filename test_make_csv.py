@@ -0,0 +1,134 @@
+""" 
+Tests the make_csv_100.py and make_csv_rest.py scripts, and the box_numbers.py and record_grouping.py modules they sort with.
+"""
+
+import logging, os, tempfile, unittest
+from unittest import mock
+
+import make_csv_100, make_csv_rest
+from box_numbers import box_sort_key
+from hh_xml import serializer
+from hh_xml.fm_rows import FieldSpec
+from make_csv_rest import write_tsv, write_tsv_parallel
+from record_grouping import group_rows_by_key
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestBoxNumbers( unittest.TestCase ):
+    """ Tests the box_numbers.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_box_sort_key_order( self ):
+        """ Tests archival box-number collation. """
+        boxes = [ 'M-47', '213B', None, '78B', 'Oversize', '9', 'M-2', '78', '', '12-10', 'm-39', '12-9' ]
+        self.assertEqual(
+            ['9', '12-9', '12-10', '78', '78B', '213B', 'M-2', 'm-39', 'M-47', 'Oversize', None, ''],
+            sorted(boxes, key=box_sort_key) )
+
+    def test_box_sort_key_list_value( self ):
+        """ Tests that a repeating box-field's list sorts by its first non-empty box, rather than failing as unhashable. """
+        self.assertEqual( box_sort_key('78B'), box_sort_key(['', '78B', '9']) )
+        self.assertEqual( box_sort_key(None), box_sort_key([None, '']) )
+        self.assertEqual( ['9', ['78B', '9'], 'M-2', []], sorted(['M-2', [], ['78B', '9'], '9'], key=box_sort_key) )
+
+## end class TestBoxNumbers()
+
+
+class TestRecordGrouping( unittest.TestCase ):
+    """ Tests the record_grouping.py module. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_group_rows_matches_sorted( self ):
+        """ Tests that bucketed grouping gives the old full-sort's order: orgs sorted, None-org rows last, each org's rows stable (or by box, with secondary keys). """
+        rows = [ {'Organization ID': [None, 'HH_2', 'HH_10', 'HH_1'][i % 4], 'Item': f'item {i}', 'Box Number': [None, '78B', '9', 'M-2', ['213B']][i % 5], 'Box Number 3': str(i % 3)} for i in range(60) ]
+        rows.append( {'Organization ID': 'HH_1', 'Item': 'no box fields'} )  # secondary fields missing, not just None
+        rows_with_org: list = [ row for row in rows if row['Organization ID'] is not None ]  # the original sort can't order a None org-id
+        self.assertEqual( make_csv_100.sort_dicts_by_key(rows_with_org, 'Organization ID'), group_rows_by_key(rows_with_org, 'Organization ID') )
+        old_order: list = sorted( rows, key=lambda row: (row['Organization ID'] is None, row['Organization ID'] or '', box_sort_key(row.get('Box Number')), box_sort_key(row.get('Box Number 3'))) )
+        self.assertEqual( old_order, group_rows_by_key(rows, 'Organization ID', secondary_key=['Box Number', 'Box Number 3']) )
+        self.assertEqual( [row['Item'] for row in rows if row['Organization ID'] is None], [row['Item'] for row in group_rows_by_key(rows, 'Organization ID')[-15:]] )
+
+## end class TestRecordGrouping()
+
+
+class TestMakeCsv( unittest.TestCase ):
+    """ Tests the make_csv_100.py and make_csv_rest.py scripts. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_parallel_tsv_matches_serial( self ):
+        """ Tests that the worker-process tsv is identical to the single-process tsv. """
+        rows = [ {'Organization ID': f'HH_{i % 7}', 'Item': f'item {i}', 'Box Number': None if i % 5 else str(i), 'Number of Folders': i} for i in range(103) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            serial_dir = os.path.join( temp_dir, 'serial' )
+            parallel_dir = os.path.join( temp_dir, 'parallel' )
+            os.mkdir( serial_dir )
+            os.mkdir( parallel_dir )
+            with open( write_tsv(rows, serial_dir), 'rb' ) as f:
+                serial_bytes = f.read()
+            with open( write_tsv_parallel(rows, 3, parallel_dir), 'rb' ) as f:
+                parallel_bytes = f.read()
+            self.assertEqual( 1, len(os.listdir(parallel_dir)) )  # chunk-files cleaned up
+        self.assertEqual( serial_bytes, parallel_bytes )
+
+    def test_make_csv_fields_projected_during_xml_parse( self ):
+        """ Tests that, from a raw xml input, make_csv's `fields` reach the parse: a column neither output nor needed for grouping is never decoded. """
+        target_org: str = make_csv_100.make_starting_orgs_list()[0]
+        rows = [ (str(i), {'Organization ID': target_org, 'Item': f'item {i}', 'Box Number': str(9 - i), 'Notes': f'unread note {i}'}) for i in range(1, 4) ]
+        decoded_fields: set = set()
+        original_convert = FieldSpec.convert
+        def tracking_convert( field_spec, text ):
+            decoded_fields.add( field_spec.name )
+            return original_convert( field_spec, text )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'source.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml(rows) )
+            with mock.patch.object( FieldSpec, 'convert', tracking_convert ):
+                make_csv_100.make_csv_from_fmpro_json( xml_path, temp_dir, fields=['Item', 'Organization ID'] )
+            [ tsv_name ] = [ name for name in os.listdir(temp_dir) if name.endswith('.tsv') ]
+            with open( os.path.join(temp_dir, tsv_name), 'r' ) as f:
+                tsv_lines: list = f.read().splitlines()
+        self.assertEqual( {'Item', 'Organization ID', 'Box Number'}, decoded_fields )  # 'Box Number' for the default sort; 'Notes' never read
+        self.assertEqual( ['Item\tOrganization ID', f'item 3\t{target_org}', f'item 2\t{target_org}', f'item 1\t{target_org}'], tsv_lines )
+
+    def test_make_csv_rest_tab_check_ignores_workers( self ):
+        """ Tests that a tab anywhere in the data stops make_csv_rest with or without workers -- even in a row the output excludes. """
+        target_org: str = make_csv_rest.make_starting_orgs_list()[0]
+        items = { str(i): {'Organization ID': target_org if i == 0 else f'HH_9{i}', 'Item': 'tab\there' if i == 0 else f'item {i}', 'Box Number': None} for i in range(6) }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join( temp_dir, 'input.json' )
+            serializer.dump_to_path( {'items': items}, input_path )
+            for workers in ( 1, 2 ):
+                with self.assertRaisesRegex( Exception, 'tab-character found' ):
+                    make_csv_rest.make_csv_from_fmpro_json( input_path, temp_dir, workers=workers )
+            self.assertEqual( ['input.json'], os.listdir(temp_dir) )
+
+## end class TestMakeCsv()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+Performance-regression tests: time and peak-memory budgets for the main scripts' entry-points.
+
+Each case runs on a synthetic export (see `synthetic_export.py`), written once per test-run, so it works offline and without the real export.
+A case is run twice -- once timed, once under `tracemalloc` (which slows python down, so isn't timed) -- and both numbers are scaled to 100K rows.
+The test fails if either exceeds its baseline in `performance_baselines.json` by more than the margin.
+
+Command startup is checked too: `python -m hh_xml lookup` (a fresh interpreter, importing only what the lookup needs) must finish within `STARTUP_BUDGET_SECONDS`, without loading lxml or configuring logging at import.
+
+The full timed cases compare absolute wall-clock numbers against the reference machine's, so they're skipped unless asked for.
+A default test-run still gates the converter's speed, machine-relatively: on a small fixture, its time is divided by that of a fixed pure-python reference loop, timed alongside it, and the ratio is checked against the baseline file's `relative_cases` (with the looser `relative_margin`, since the ratio varies somewhat between machines). It also checks that imports stay side-effect free.
+
+Settings (env-vars):
+- `RUN_PERF_TESTS=1`: runs the absolute timed cases (skipped otherwise).
+- `PERF_ROW_COUNT`: fixture size (default 10000).
+- `PERF_MARGIN`: allowed excess over a baseline, as a fraction (default: the baseline file's `margin`).
+- `PERF_UPDATE_BASELINES=1`: saves this run's measurements as the new baselines, instead of checking them; for after an intended change, on the reference machine. Implies `RUN_PERF_TESTS=1`.
+
+Usage:
+(venv) $ python -m unittest test_performance  # the machine-relative case, and the import check
+(venv) $ RUN_PERF_TESTS=1 python -m unittest test_performance
+(venv) $ PERF_UPDATE_BASELINES=1 python -m unittest test_performance
+"""
+
+import logging, os, subprocess, sys, tempfile, time, tracemalloc, unittest
+
+import make_csv_100, make_csv_rest
+from convert_fmproxml_to_json import SourceDictMaker
+from hh_xml.serializer import dump_to_path, load_from_path
+from pretty_print import pretty_print_xml
+from synthetic_export import write_synthetic_export
+from unique_orgs import get_collection_info
+
+
+logging.getLogger().setLevel( logging.WARNING )  # the scripts' debug-logging would otherwise be part of what's timed
+log = logging.getLogger( __name__ )
+
+
+BASELINES_PATH: str = os.path.join( os.path.dirname(os.path.abspath(__file__)), 'performance_baselines.json' )
+ROW_COUNT: int = int( os.environ.get('PERF_ROW_COUNT', '10000') )
+UPDATE_BASELINES: bool = os.environ.get( 'PERF_UPDATE_BASELINES' ) == '1'
+RUN_PERF_TESTS: bool = os.environ.get( 'RUN_PERF_TESTS' ) == '1' or UPDATE_BASELINES
+STARTUP_BUDGET_SECONDS: float = 0.5  # c.0.15s measured, of which c.0.09s is the bare interpreter
+RELATIVE_ROW_COUNT: int = 2000  # the machine-relative case's fixture; small, so it can run by default
+RELATIVE_ROUNDS: int = 5  # interleaved reference/case timings; the best of each is used, so a momentary stall affects neither
+
+
+def measure( function, *args ) -> dict:
+    """ Runs `function(*args)` timed, then again under tracemalloc; returns seconds and peak MB, each per 100K rows. """
+    start = time.perf_counter()
+    function( *args )
+    seconds: float = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        function( *args )
+        ( _current, peak ) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    scale: float = 100000 / ROW_COUNT
+    return { 'seconds_per_100K_rows': round(seconds * scale, 2), 'peak_MB_per_100K_rows': round(peak / 1e6 * scale, 1) }
+
+
+def reference_loop() -> None:
+    """ A fixed pure-python workload, like the scripts' own (string-cleanup, dict-building, sorting); its time is the unit for the machine-relative case. """
+    rows: list = []
+    for i in range( 20000 ):
+        text = f'  Item {i} of box {i % 97}  '
+        rows.append( {'key': str(i), 'text': ' '.join(text.split()).casefold(), 'box': i % 97} )
+    rows.sort( key=lambda row: (row['box'], row['key']) )
+    return
+
+
+def load_baselines() -> dict:
+    return load_from_path( BASELINES_PATH ) if os.path.exists( BASELINES_PATH ) else { 'margin': 0.5, 'cases': {} }
+
+
+def save_baselines( section: str, measured: dict, **settings ) -> None:
+    """ Merges this run's measurements into one section of the baselines file, keeping the other sections; for PERF_UPDATE_BASELINES. """
+    baselines: dict = load_baselines()
+    baselines.update( settings )
+    baselines[section] = dict( baselines.get(section, {}), **measured )
+    dump_to_path( baselines, BASELINES_PATH, pretty=True )
+    log.warning( f'baselines ``{section}`` saved to ``{BASELINES_PATH}``' )
+    return
+
+
+class TestRelativePerformance( unittest.TestCase ):
+    """ Checks the converter's time, in units of reference_loop(), so the budget holds on any machine; always run. """
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.xml_path = os.path.join( cls.temp_dir.name, 'synthetic.xml' )
+        write_synthetic_export( cls.xml_path, RELATIVE_ROW_COUNT )
+        cls.baselines: dict = load_baselines()
+        cls.margin: float = float( cls.baselines.get('relative_margin', 1.0) )
+        cls.measured: dict = {}
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.temp_dir.cleanup()
+        if UPDATE_BASELINES:
+            save_baselines( 'relative_cases', cls.measured, relative_margin=cls.margin, relative_row_count=RELATIVE_ROW_COUNT )
+
+    def test_convert_fmproxml_to_json_relative( self ):
+        output_path = os.path.join( self.temp_dir.name, 'converted.json' )
+        reference_loops: float = self.time_relative( lambda: SourceDictMaker().convert_fmproxml_to_json(self.xml_path, output_path) )
+        self.measured['convert_fmproxml_to_json'] = { 'reference_loops': round(reference_loops, 2) }
+        if UPDATE_BASELINES:
+            return
+        baseline: dict = self.baselines.get( 'relative_cases', {} ).get( 'convert_fmproxml_to_json' )
+        if baseline is None:
+            self.skipTest( 'no relative baseline; run with PERF_UPDATE_BASELINES=1' )
+        budget: float = baseline['reference_loops'] * ( 1 + self.margin )
+        self.assertLessEqual( reference_loops, budget, f'converter takes ``{reference_loops:.2f}`` reference-loops; baseline ``{baseline["reference_loops"]}``, budget ``{budget:.2f}``' )
+
+    @staticmethod
+    def time_relative( function ) -> float:
+        """ Returns `function`'s best time over the best time of reference_loop(), timed in alternation. """
+        ( reference_times, case_times ) = ( [], [] )
+        for _ in range( RELATIVE_ROUNDS ):
+            for ( timed_function, times ) in ( (reference_loop, reference_times), (function, case_times) ):
+                start = time.perf_counter()
+                timed_function()
+                times.append( time.perf_counter() - start )
+        return min( case_times ) / min( reference_times )
+
+    ## end class TestRelativePerformance()
+
+
+@unittest.skipUnless( RUN_PERF_TESTS, 'wall-clock budgets; set RUN_PERF_TESTS=1 to run' )
+class TestPerformance( unittest.TestCase ):
+    """ Checks each entry-point against its time and memory budget. """
+
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.xml_path = os.path.join( cls.temp_dir.name, 'synthetic.xml' )
+        cls.json_path = os.path.join( cls.temp_dir.name, 'synthetic.json' )
+        write_synthetic_export( cls.xml_path, ROW_COUNT )
+        SourceDictMaker().convert_fmproxml_to_json( cls.xml_path, cls.json_path )  # the csv-cases' input; untimed
+        cls.baselines: dict = load_baselines()
+        cls.margin: float = float( os.environ.get('PERF_MARGIN', cls.baselines['margin']) )
+        cls.measured: dict = {}
+
+    @classmethod
+    def tearDownClass( cls ):
+        cls.temp_dir.cleanup()
+        if UPDATE_BASELINES:
+            save_baselines( 'cases', cls.measured, margin=cls.baselines['margin'], row_count=ROW_COUNT )
+
+    def check_budget( self, case: str, measurement: dict ) -> None:
+        """ Fails if a measurement exceeds its baseline by more than the margin; with PERF_UPDATE_BASELINES, records it instead. """
+        self.measured[case] = measurement
+        if UPDATE_BASELINES:
+            return
+        baseline: dict = self.baselines['cases'].get( case )
+        if baseline is None:
+            self.skipTest( f'no baseline for ``{case}``; run with PERF_UPDATE_BASELINES=1' )
+        for ( metric, value ) in measurement.items():
+            budget: float = baseline[metric] * ( 1 + self.margin )
+            self.assertLessEqual( value, budget, f'``{case}`` {metric} is ``{value}``; baseline ``{baseline[metric]}``, budget ``{budget:.2f}``' )
+
+    def test_convert_fmproxml_to_json( self ):
+        output_path = os.path.join( self.temp_dir.name, 'converted.json' )
+        self.check_budget( 'convert_fmproxml_to_json', measure(SourceDictMaker().convert_fmproxml_to_json, self.xml_path, output_path) )
+
+    def test_make_csv_100( self ):
+        self.check_budget( 'make_csv_100', measure(make_csv_100.make_csv_from_fmpro_json, self.json_path, self.temp_dir.name) )
+
+    def test_make_csv_rest( self ):
+        self.check_budget( 'make_csv_rest', measure(make_csv_rest.make_csv_from_fmpro_json, self.json_path, self.temp_dir.name) )
+
+    def test_get_collection_info( self ):
+        self.check_budget( 'get_collection_info', measure(get_collection_info, self.xml_path) )
+
+    def test_pretty_print_xml( self ):
+        output_path = os.path.join( self.temp_dir.name, 'synthetic_formatted.xml' )
+        self.check_budget( 'pretty_print_xml', measure(pretty_print_xml, self.xml_path, output_path) )
+
+    def test_lookup_startup( self ):
+        command = [ sys.executable, '-m', 'hh_xml', 'lookup', '--input_path', self.json_path, '1' ]
+        run = lambda: subprocess.run( command, capture_output=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, LOGLEVEL='WARNING') )
+        self.assertEqual( 0, run().returncode )  # also builds the json's index, so the timed runs measure startup, not indexing
+        seconds: float = min( self.time_call(run) for _ in range(3) )
+        self.assertLessEqual( seconds, STARTUP_BUDGET_SECONDS, f'lookup startup is ``{seconds:.2f}s``' )
+
+    @staticmethod
+    def time_call( function ) -> float:
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+    ## end class TestPerformance()
+
+
+class TestImports( unittest.TestCase ):
+    """ Checks that startup stays cheap in ways that don't depend on the machine's speed; always run. """
+
+    def test_imports_are_side_effect_free( self ):
+        code = 'import logging, sys, hh_xml.cli, make_csv_100, query_service; assert not logging.getLogger().handlers; assert "lxml" not in sys.modules'
+        result = subprocess.run( [sys.executable, '-c', code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)) )
+        self.assertEqual( 0, result.returncode, result.stderr )
+
+    ## end class TestImports()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+""" 
+Tests the query_service.py script.
+"""
+
+import http.client, json, logging, os, tempfile, threading, unittest
+
+from convert_fmproxml_to_json import SourceDictMaker
+from query_service import ConvertedDataStore, make_server
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestQueryService( unittest.TestCase ):
+    """ Tests the query_service.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_query_service( self ):
+        """ Tests the http record- and org-lookups. """
+        xml = make_export_xml( [ ('1', {'Organization ID': 'HH_1', 'Item': 'first'}), ('2', {'Organization ID': 'HH_1'}), ('3', {'Organization ID': 'HH_2'}) ] )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            json_path = os.path.join( temp_dir, 'output.json' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            store = ConvertedDataStore( json_path )
+            server = make_server( store, port=0 )
+            threading.Thread( target=server.serve_forever, daemon=True ).start()
+            connection = http.client.HTTPConnection( '127.0.0.1', server.server_address[1] )
+            responses = {}
+            for path in ( '/record/1', '/org/HH_1', '/orgs/top?k=1', '/record/99', '/record/1' ):
+                connection.request( 'GET', path )
+                response = connection.getresponse()
+                responses[path] = ( response.status, json.loads(response.read()) )
+            connection.close()
+            server.shutdown()
+            server.server_close()
+            store.items.close()
+        self.assertEqual( (200, 'first'), (responses['/record/1'][0], responses['/record/1'][1]['Item']) )
+        self.assertEqual( ['1', '2'], responses['/org/HH_1'][1]['record_ids'] )
+        self.assertEqual( [{'org_id': 'HH_1', 'item_count': 2, 'names': []}], responses['/orgs/top?k=1'][1] )
+        self.assertEqual( 404, responses['/record/99'][0] )
+        self.assertEqual( 1, store.response.cache_info().hits )  # the repeated /record/1
+
+## end class TestQueryService()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+""" 
+Tests the run_pipeline.py script.
+"""
+
+import asyncio, logging, os, tempfile, unittest
+from unittest import mock
+
+from convert_fmproxml_to_json import SourceDictMaker
+from hh_xml.converted_data import load_items
+from hh_xml.text_normalizer import TextNormalizer
+from run_pipeline import run_pipeline
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestRunPipeline( unittest.TestCase ):
+    """ Tests the run_pipeline.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_pipeline_outputs( self ):
+        """ Tests that the single-parse pipeline writes the converter's json and both tsvs, with no staging files left. """
+        rows = [ (str(i), {'Organization ID': f'HH_0{30652 + i % 3}', 'Item': f'item {i}', 'Box Number': str(i)}) for i in range(1, 10) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml(rows) )
+            ( converter_json_path, pipeline_json_path ) = ( os.path.join(temp_dir, 'converter.json'), os.path.join(temp_dir, 'pipeline.json') )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, converter_json_path )
+            tsv_dir = os.path.join( temp_dir, 'tsv' )
+            os.mkdir( tsv_dir )
+            asyncio.run( run_pipeline(xml_path, pipeline_json_path, tsv_dir) )
+            self.assertEqual( load_items(converter_json_path), load_items(pipeline_json_path) )
+            self.assertEqual( ['output_100', 'output_rest'], sorted(name.split('_2')[0] for name in os.listdir(tsv_dir)) )  # ie no `.partial-` leftovers
+            self.assertEqual( ['converter.json', 'export.xml', 'pipeline.json', 'tsv'], sorted(os.listdir(temp_dir)) )
+
+    def test_pipeline_failure_keeps_previous_outputs( self ):
+        """ Tests that a parse error past the validation sample leaves the previous json in place, and writes no tsv. """
+        rows = [ (str(i), {'Organization ID': 'HH_030652', 'Item': f'item {i}'}) for i in range(1, 1101) ]
+        xml = make_export_xml( rows )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( xml[:xml.rindex('<ROW ')] )  # truncated after row 1099; validation checks only the first 1000
+            json_path = os.path.join( temp_dir, 'output.json' )
+            with open( json_path, 'w' ) as f:
+                f.write( '{"previous": "run"}' )
+            tsv_dir = os.path.join( temp_dir, 'tsv' )
+            os.mkdir( tsv_dir )
+            with self.assertRaises( Exception ):
+                asyncio.run( run_pipeline(xml_path, json_path, tsv_dir) )
+            with open( json_path, 'r' ) as f:
+                self.assertEqual( '{"previous": "run"}', f.read() )
+            self.assertEqual( [], os.listdir(tsv_dir) )
+            self.assertEqual( ['export.xml', 'output.json', 'tsv'], sorted(os.listdir(temp_dir)) )
+
+    def test_pipeline_tab_check_covers_every_row( self ):
+        """ Tests that a tab in any parsed row fails the pipeline, as it fails the make_csv scripts -- during the parse, before any consumer's final write. """
+        rows = [ (str(i), {'Organization ID': 'HH_030652', 'Item': f'item {i}'}) for i in range(1, 4) ] + [ ('4', {'Organization ID': 'HH_030652', 'Item': 'tab\there'}) ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            xml_path = os.path.join( temp_dir, 'export.xml' )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml(rows) )
+            tsv_dir = os.path.join( temp_dir, 'tsv' )
+            os.mkdir( tsv_dir )
+            with mock.patch( 'hh_xml.fm_rows.TextNormalizer', lambda: TextNormalizer(steps=()) ), mock.patch.object( SourceDictMaker, '_save_json' ) as save_json:  # the default steps collapse a tab to a space
+                with self.assertRaisesRegex( Exception, 'tab-character found' ):
+                    asyncio.run( run_pipeline(xml_path, os.path.join(temp_dir, 'output.json'), tsv_dir) )
+            self.assertFalse( save_json.called )
+            self.assertEqual( ( [], ['export.xml', 'tsv'] ), (os.listdir(tsv_dir), sorted(os.listdir(temp_dir))) )
+
+## end class TestRunPipeline()
+
+
+if __name__ == '__main__':
+    unittest.main()
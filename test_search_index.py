@@ -0,0 +1,56 @@
+""" 
+Tests the search_index.py script.
+"""
+
+import logging, os, tempfile, unittest
+
+from convert_fmproxml_to_json import SourceDictMaker
+from search_index import SearchIndex, build_index, decode_postings, encode_postings, tokenize
+from test_helpers import make_export_xml
+
+
+log = logging.getLogger( __name__ )
+
+
+class TestSearchIndex( unittest.TestCase ):
+    """ Tests the search_index.py script. """
+
+    def setUp( self ):
+        """ Sets up the test harness. """
+        self.maxDiff = None
+
+    def tearDown( self ):
+        """ Tears down the test harness. """
+        pass
+
+    def test_search_index( self ):
+        """ Tests tokenizing, the varint posting round-trip, and AND, prefix (including multi-token prefix), and empty queries, across several index blocks. """
+        self.assertEqual( ['o', 'brien', 'cafe', 'zurich', '1970s'], tokenize("O'Brien CAFÉ Zürich, 1970s") )
+        doc_numbers = [ 0, 1, 127, 128, 300, 16384, 2**31 ]
+        self.assertEqual( doc_numbers, list(decode_postings(encode_postings(doc_numbers))) )
+        self.assertEqual( [], list(decode_postings(encode_postings([]))) )
+        titles = { '1': "O'Brien family papers", '2': 'Feminist newsletter, Minnesota', '3': 'Feminists of Ohio', '4': 'Ohio bridge records' }
+        titles.update( (str(i), f'filler {i}') for i in range(5, 2500) )  # several doc-blocks, and posting-blocks
+        with tempfile.TemporaryDirectory() as temp_dir:
+            ( xml_path, json_path, index_path ) = ( os.path.join(temp_dir, 'export.xml'), os.path.join(temp_dir, 'output.json'), os.path.join(temp_dir, 'search.idx') )
+            with open( xml_path, 'w' ) as f:
+                f.write( make_export_xml([(key, {'Item': title}) for (key, title) in titles.items()]) )
+            SourceDictMaker().convert_fmproxml_to_json( xml_path, json_path )
+            build_index( json_path, index_path )
+            index = SearchIndex( index_path )
+            run_query = lambda *terms: [ index.doc(doc_number)[0] for doc_number in index.query(list(terms)) ]
+            self.assertEqual( ['2'], run_query('feminist', 'minnesota') )  # AND
+            self.assertEqual( ['2', '3'], run_query('femin*') )
+            self.assertEqual( ['1'], run_query("o'bri*") )  # 'o' exact, 'bri' prefix; not 'ohio bridge'
+            self.assertEqual( ['1', '3', '4'], run_query("o*") )
+            self.assertEqual( [], run_query('feminist', 'ohio') )
+            self.assertEqual( [], run_query('nonexistent*') )
+            index = SearchIndex( index_path )
+            self.assertEqual( ('2499', 'filler 2499'), index.doc(index.query(['2499'])[0]) )
+            self.assertEqual( ([2], 3), (list(index.doc_blocks), len(index.doc_block_offsets) - 1) )  # only the result's doc-block, of 3, was decompressed
+
+## end class TestSearchIndex()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ Note: the count appears to be 'boxes' not 'items'.
 
 Usage:
     python unique_collections.py --input_path "/path/to/file.xml"
+    python unique_collections.py --rollup_path "/path/to/rollups.json"  # instant; uses the converter's org-rollups instead of re-parsing the xml
 
 Output:
 (as of 2023-Nov-16)
@@ -21,29 +22,26 @@ Notes:
 - if the number of row-elements (items) is c.177K, and our number of scans is c.800K, then there are an _average_ of c.4.5 pages per item.
 """
 
-import argparse, logging, os, pprint
+import argparse, logging, pprint
 import xml.etree.ElementTree as ET
 
-lglvl: str = os.environ.get( 'LOGLEVEL', 'DEBUG' )
-lglvldct = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO }
-logging.basicConfig(
-    level=lglvldct[lglvl],  # assigns the level-object to the level-key
-    format='[%(asctime)s] %(levelname)s [%(module)s-%(funcName)s()::%(lineno)d] %(message)s',
-    datefmt='%d/%b/%Y %H:%M:%S' )
+from hh_xml.compressed_io import open_input
+from hh_xml.fm_xml import NAMESPACES
+from hh_xml.logging_setup import configure_logging
+from hh_xml.progress_reporter import ProgressReporter
+from org_rollups import load_rollups
+
 log = logging.getLogger( __name__ )
-log.debug( 'logging working' )
 
 
 def get_collection_info( source_filepath: str ) -> None:
 
-    ## load file
-    with open( source_filepath, 'r' ) as f:
-        source_xml_string: str = f.read()
+    ## load file (decompressing a .gz/.bz2/.xz export as it's read)
+    with open_input( source_filepath ) as f:
+        source_xml_string: bytes = f.read()  # bytes; the parser honors the xml-declaration's encoding
 
     ## define and register namespace ( needed for find() and findall() )
-    ns = {'fmp': 'http://www.filemaker.com/fmpxmlresult'}
+    ns = NAMESPACES
     ET.register_namespace('', ns['fmp'])  # can be done before or after making the xml-object
 
     ## instantiate xml object
@@ -59,7 +57,9 @@ def get_collection_info( source_filepath: str ) -> None:
     assert type( row_elements[0] ) == ET.Element
 
     ## iterate through each ROW element
+    progress = ProgressReporter( 'counting orgs', total=len(row_elements), logger=log )
     for row_element in row_elements:
+        progress.update()
         ## Get first COL/DATA element (the org-id)
         data_element = row_element.find('.//fmp:COL/fmp:DATA', ns)  # type(data_element) == ET.Element
         # log.debug( f'data_element: ``{data_element}``')
@@ -68,24 +68,49 @@ def get_collection_info( source_filepath: str ) -> None:
             unique_organization_ids.add(org_id)
             ## increment org count
             items_per_organization[org_id] = items_per_organization.get(org_id, 0) + 1
+    progress.finish()
 
     ## output results
-    log.info( f'len(unique_organization_ids), ``{len(unique_organization_ids)}``' )
-    orgs_sorted_by_count = sorted(items_per_organization.items(), key=lambda x: x[1], reverse=True)
-    log.info( f'orgs sorted by count: {pprint.pformat(orgs_sorted_by_count)}' )
+    log_org_counts( items_per_organization )
+
+    return
 
+
+def get_collection_info_from_rollups( rollup_path: str ) -> None:
+    """ Outputs the same org-counts as get_collection_info(), from a rollup file (see org_rollups.py) rather than the xml.
+        Called by dundermain. """
+    rollup_data: dict = load_rollups( rollup_path )
+    items_per_organization: dict = { org_id: org['item_count'] for (org_id, org) in rollup_data['orgs'].items() }
+    log_org_counts( items_per_organization )
     return
 
 
+def log_org_counts( items_per_organization: dict ) -> list:
+    """ Logs the number of unique orgs, and the orgs sorted by count.
+        Returns the sorted list of ( org_id, count ) tuples.
+        Called by get_collection_info(), and by run_pipeline.py """
+    log.info( f'len(unique_organization_ids), ``{len(items_per_organization)}``' )
+    orgs_sorted_by_count = sorted(items_per_organization.items(), key=lambda x: x[1], reverse=True)
+    if log.isEnabledFor( logging.INFO ):  # the full pformat is large; skip it when it won't be shown
+        log.info( f'orgs sorted by count: {pprint.pformat(orgs_sorted_by_count)}' )
+    return orgs_sorted_by_count
+
+
 if __name__ == '__main__':
+    configure_logging()
     ## set up argparser
     parser = argparse.ArgumentParser(description='Outputs unique organization-IDs, with counts')
     parser.add_argument('--input_path', type=str, help='Path to the input file')
+    parser.add_argument('--rollup_path', type=str, help='Path to an org-rollups json file (see org_rollups.py); used instead of the input xml')
     args = parser.parse_args()
     log.debug( f'args: {args}' )
-    ## get input path
-    input_path = args.input_path if args.input_path else "../source_xml_files/2023-11-10_items_xml_export_formatted.xml"
-    log.debug( f'input_path: {input_path}' )
-    ## get to work
-    get_collection_info( input_path )
+    if args.rollup_path:
+        ## get to work, from rollups
+        get_collection_info_from_rollups( args.rollup_path )
+    else:
+        ## get input path
+        input_path = args.input_path if args.input_path else "../source_xml_files/2023-11-10_items_xml_export_formatted.xml"
+        log.debug( f'input_path: {input_path}' )
+        ## get to work
+        get_collection_info( input_path )
     log.debug( 'done' )
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Pre-flight check of a FileMaker Pro xml export, before the (slow) conversion.
+
+Streams the file, so memory-use stays flat no matter the export size:
+- compares the METADATA <FIELD> elements against a declared schema (field names, field-count, and -- where declared -- TYPE and MAXREPEAT).
+- counts the <COL> elements of a sample of <ROW> elements (or all of them).
+
+Fails as soon as the METADATA block is read if the fields are wrong, so a bad export is caught in seconds rather than after minutes of parsing.
+
+The declared schema is either the built-in DEFAULT_SCHEMA (field names only), or a json file saved from a known-good export via `--save_schema_path`.
+
+Usage:
+(venv) $ python ./validate_fmpro_export.py --input_path "/path/to/source.xml"
+(venv) $ python ./validate_fmpro_export.py --input_path "/path/to/source.xml" --max_rows 0  # checks every row
+(venv) $ python ./validate_fmpro_export.py --input_path "/path/to/good_source.xml" --save_schema_path "/path/to/schema.json"
+(venv) $ python ./validate_fmpro_export.py --input_path "/path/to/source.xml" --schema_path "/path/to/schema.json"
+"""
+
+import argparse, logging
+from typing import Optional
+
+from hh_xml.fm_xml import FIELD_TAG, METADATA_TAG, ROW_TAG, clear_element, iterparse
+from hh_xml.logging_setup import configure_logging
+from hh_xml.serializer import dump_to_path, load_from_path
+
+
+log = logging.getLogger( __name__ )
+
+
+MAX_REPORTED_PROBLEMS: int = 10
+
+## as of 2023-11-10 export; TYPE and MAXREPEAT aren't declared here, so aren't checked
+DEFAULT_SCHEMA: list = [ {'NAME': name} for name in [
+    'Organization ID',
+    'Barcode 1',
+    'Barcode 2',
+    'Barcode 3',
+    'Book_Author',
+    'Book_Date',
+    'Book_ISBN',
+    'Book_LC',
+    'Book_Publisher',
+    'Box 1 Folder #',
+    'Box Number',
+    'Box Number 2',
+    'Box Number 3',
+    'Item',
+    'Notes',
+    'Number of Folders',
+    'Organization::Name',
+    'Organization::Record Type',
+    'PartDesignation',
+    'PartI_BoxNumber',
+    'PartI_HHNumber_LeadingZeros',
+    'PartI_MsNumber',
+    'Record ID',
+    'Type' ] ]
+
+
+## manager function -------------------------------------------------
+def validate_export( input_path: str, schema: Optional[list] = None, max_rows: Optional[int] = 1000 ) -> dict:
+    """ Validates the export's fields against `schema`, and the column-count of up to `max_rows` rows (all rows if None).
+        Raises exception on the first problem-block found (METADATA problems are raised before any row is read).
+        Returns summary-dict of the fields found and the number of rows checked.
+        Called by dundermain, and by SourceDictMaker.convert_fmproxml_to_json() """
+    schema = schema if schema is not None else DEFAULT_SCHEMA
+    fields: list = []
+    rows_checked: int = 0
+    problems: list = []
+    context = iterparse( input_path, tag=(FIELD_TAG, METADATA_TAG, ROW_TAG) )  # a .gz/.bz2/.xz export is decompressed as it streams
+    for _event, elem in context:
+        if elem.tag == FIELD_TAG:
+            fields.append( dict(elem.attrib) )
+        elif elem.tag == METADATA_TAG:
+            check_fields( fields, schema )  # raises exception on mismatch
+        else:  # ROW
+            col_count = len( elem )
+            if col_count != len( fields ):
+                problems.append( f'ROW RECORDID ``{elem.get("RECORDID")}`` has ``{col_count}`` COL elements; expected ``{len(fields)}``' )
+            rows_checked += 1
+            clear_element( elem )
+            if len( problems ) >= MAX_REPORTED_PROBLEMS or ( max_rows and rows_checked >= max_rows ):
+                break
+    context.close()  # closes the file now, rather than at garbage-collection, after an early break
+    if not fields:
+        problems.append( 'no METADATA <FIELD> elements found' )
+    if problems:
+        msg = f'export ``{input_path}`` failed validation: {problems}'
+        log.error( msg )
+        raise Exception( msg )
+    log.info( f'export ``{input_path}`` passed validation; fields, ``{len(fields)}``; rows_checked, ``{rows_checked}``' )
+    return { 'fields': fields, 'rows_checked': rows_checked }
+
+
+## helper functions START -------------------------------------------
+
+
+def check_fields( fields: list, schema: list ) -> None:
+    """ Compares the FIELD-attribute dicts against the declared schema.
+        Raises exception listing every mismatch.
+        Called by validate_export() """
+    problems: list = []
+    if len( fields ) != len( schema ):
+        problems.append( f'field-count is ``{len(fields)}``; expected ``{len(schema)}``' )
+    found_by_name: dict = { f.get('NAME'): f for f in fields }
+    expected_names: set = { s['NAME'] for s in schema }
+    missing: list = [ s['NAME'] for s in schema if s['NAME'] not in found_by_name ]
+    unexpected: list = [ f.get('NAME') for f in fields if f.get('NAME') not in expected_names ]
+    if missing:
+        problems.append( f'missing fields, ``{missing}``' )
+    if unexpected:
+        problems.append( f'unexpected fields, ``{unexpected}``' )
+    for declared in schema:
+        found = found_by_name.get( declared['NAME'] )
+        if found is None:
+            continue
+        for attribute in ( 'TYPE', 'MAXREPEAT' ):
+            if attribute in declared and found.get( attribute ) != declared[attribute]:
+                problems.append( f'field ``{declared["NAME"]}`` has {attribute} ``{found.get(attribute)}``; expected ``{declared[attribute]}``' )
+    if problems:
+        msg = f'METADATA does not match schema: {problems}'
+        log.error( msg )
+        raise Exception( msg )
+    log.debug( 'METADATA matches schema' )
+    return
+
+
+def load_schema( schema_path: str ) -> list:
+    """ Loads a schema saved by save_schema().
+        Called by dundermain """
+    schema: list = load_from_path( schema_path )
+    assert type(schema) == list, type(schema)
+    return schema
+
+
+def save_schema( input_path: str, schema_path: str ) -> None:
+    """ Saves the NAME/TYPE/MAXREPEAT of each field of a known-good export, for use as a declared schema.
+        Reads only the METADATA block.
+        Called by dundermain """
+    fields: list = []
+    context = iterparse( input_path, tag=(FIELD_TAG, METADATA_TAG) )
+    for _event, elem in context:
+        if elem.tag == METADATA_TAG:
+            break
+        fields.append( {key: elem.attrib[key] for key in ('NAME', 'TYPE', 'MAXREPEAT') if key in elem.attrib} )
+    context.close()
+    dump_to_path( fields, schema_path, pretty=True )  # indented; it's meant to be read, and edited
+    log.info( f'schema of ``{len(fields)}`` fields saved to ``{schema_path}``' )
+    return
+
+
+## helper functions END ---------------------------------------------
+
+
+if __name__ == '__main__':
+    configure_logging()
+    ## set up argparser
+    parser = argparse.ArgumentParser( description='Validates a filemaker-pro xml export against a declared schema.' )
+    parser.add_argument( '--input_path', type=str, help='path to source xml file' )
+    parser.add_argument( '--schema_path', type=str, help='optional path to a schema json file; defaults to the built-in schema' )
+    parser.add_argument( '--save_schema_path', type=str, help='if given, saves the input-file\'s schema to this path instead of validating' )
+    parser.add_argument( '--max_rows', type=int, default=1000, help='number of rows to check; 0 checks all rows (default 1000)' )
+    args = parser.parse_args()
+    log.debug( f'args: {args}' )
+    ## get to work
+    if args.save_schema_path:
+        save_schema( args.input_path, args.save_schema_path )
+    else:
+        schema = load_schema( args.schema_path ) if args.schema_path else None
+        validate_export( args.input_path, schema=schema, max_rows=( args.max_rows or None ) )
+    log.debug( 'done' )